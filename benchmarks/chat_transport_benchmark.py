@@ -0,0 +1,131 @@
+"""
+问答传输基准测试
+在本地模拟 SSE 服务上对比每轮单独 requests.post（原有做法）与共用 Session 的
+首个回答片段到达时间（TTFT）和建立的连接数；--handshake-delay 模拟远程服务的握手开销。
+另外测量长回答经 ChatChannel 读取的速度（片段/秒），并检查多轮对话沿用同一个
+conversation_id、清空对话（reset）后开始新会话
+
+用法:
+    python benchmarks/chat_transport_benchmark.py --turns 20 --handshake-delay 0.03
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from chat_transport_module import ChatTransport, ChatChannel
+from mock_sse_server import MockDifyServer
+
+
+def bare_turn(url, query):
+    """原有做法：每轮新建连接，返回 (TTFT, 总耗时)"""
+    start = time.perf_counter()
+    first = None
+    response = requests.post(url, json={"inputs": {}, "query": query, "response_mode": "streaming",
+                                        "conversation_id": "", "user": "bench"}, stream=True)
+    for line in response.iter_lines():
+        if line.startswith(b"data:") and 'answer' in json.loads(line[5:]) and first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def session_turn(transport, query):
+    start = time.perf_counter()
+    first = None
+    for data in transport.stream_chat(query):
+        if 'answer' in data and first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def channel_throughput(server, chunks):
+    """让模拟服务推送 chunks 个片段的长回答，经 ChatChannel 读取，返回 (片段数, 耗时)"""
+    server.chunks = chunks
+    received = [0]
+    done = threading.Event()
+
+    def deliver(kind, value):
+        if kind == 'answer':
+            received[0] += 1
+        elif kind == 'done':
+            done.set()
+
+    channel = ChatChannel(deliver, transport=ChatTransport(api_url=server.url))
+    start = time.perf_counter()
+    channel.submit("长回答")
+    done.wait()
+    elapsed = time.perf_counter() - start
+    channel.close()
+    return received[0], elapsed
+
+
+def channel_conversations(server, turns):
+    """经 ChatChannel 连续发送 turns 条消息，reset 后再发一条，返回各请求的 conversation_id"""
+    server.requests.clear()
+    finished = threading.Semaphore(0)
+
+    def deliver(kind, value):
+        if kind == 'done':
+            finished.release()
+
+    channel = ChatChannel(deliver, transport=ChatTransport(api_url=server.url))
+    for i in range(turns):
+        channel.submit(f"第{i + 1}轮")
+    for _ in range(turns):
+        finished.acquire()
+    channel.reset()
+    channel.submit("新会话")
+    finished.acquire()
+    channel.close()
+    return [request['conversation_id'] for request in server.requests]
+
+
+def report(name, results, connections):
+    ttft = [first * 1000 for first, _ in results]
+    total = [elapsed * 1000 for _, elapsed in results]
+    later = ttft[1:] or ttft
+    print(f"{name:<8} 首轮TTFT {ttft[0]:7.2f} ms  后续TTFT 中位数 {statistics.median(later):7.2f} ms  "
+          f"总耗时中位数 {statistics.median(total):7.2f} ms  连接数 {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="问答传输基准测试")
+    parser.add_argument('--turns', type=int, default=20, help="对话轮数")
+    parser.add_argument('--chunks', type=int, default=50, help="每个回答的片段数")
+    parser.add_argument('--handshake-delay', type=float, default=0.03,
+                        help="每个新连接的额外延迟（秒），模拟 TLS 握手")
+    parser.add_argument('--long-chunks', type=int, default=5000, help="长回答的片段数")
+    args = parser.parse_args()
+
+    server = MockDifyServer(chunks=args.chunks, handshake_delay=args.handshake_delay).start()
+    print(f"模拟服务: {server.url}  轮数 {args.turns}  每轮 {args.chunks} 个片段  "
+          f"握手延迟 {args.handshake_delay * 1000:.0f} ms")
+
+    results = [bare_turn(server.url, f"问题{i}") for i in range(args.turns)]
+    report("bare", results, server.connections)
+
+    server.connections = 0
+    transport = ChatTransport(api_url=server.url)
+    results = [session_turn(transport, f"问题{i}") for i in range(args.turns)]
+    report("session", results, server.connections)
+    transport.close()
+
+    count, elapsed = channel_throughput(server, args.long_chunks)
+    print(f"长回答   {count} 个片段  {elapsed * 1000:.1f} ms  {count / elapsed:.0f} 片段/秒")
+
+    server.chunks = args.chunks
+    ids = channel_conversations(server, 3)
+    reused = ids[0] == "" and len(set(ids[1:-1])) == 1 and ids[1] != "" and ids[-1] == ""
+    print(f"多轮会话 请求中的 conversation_id: {['(新)' if not i else i[:8] for i in ids]}  "
+          f"{'沿用正确' if reused else '未正确沿用'}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
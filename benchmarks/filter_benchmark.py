@@ -0,0 +1,84 @@
+"""
+逐文件过滤开销基准测试
+对比旧写法（每个文件读取设置、重建映射表、构造 Path）
+与搜索开始时固定下来的 SearchPlan（frozenset 查找）
+
+用法:
+    python benchmarks/filter_benchmark.py --names 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_engine_module import SearchPlan, FILE_TYPES
+
+EXTENSIONS = ['.txt', '.py', '.jpg', '.mp4', '.docx', '.log', '.json', '.bin', '', '.tar.gz']
+
+
+class Setting:
+    """模拟每次调用都要读取的 Tk 变量"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def legacy_match_file_type(file_type_var, file_path):
+    file_type = file_type_var.get()
+    if file_type == "所有文件":
+        return True
+
+    ext = Path(file_path).suffix.lower()
+    type_mapping = {
+        "文本文件(.txt)": ['.txt'],
+        "文档文件(.doc,.docx,.pdf)": ['.doc', '.docx', '.pdf', '.rtf'],
+        "图片文件(.jpg,.png,.gif)": ['.jpg', '.jpeg', '.png', '.gif', '.bmp'],
+        "音频文件(.mp3,.wav)": ['.mp3', '.wav', '.flac', '.aac'],
+        "视频文件(.mp4,.avi)": ['.mp4', '.avi', '.mov', '.mkv']
+    }
+    return ext in type_mapping.get(file_type, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐文件过滤开销基准测试")
+    parser.add_argument('--names', type=int, default=500000)
+    parser.add_argument('--type', default="文本文件(.txt)", choices=list(FILE_TYPES))
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    paths = [f"/data/dir{rng.randrange(1000)}/file_{i}{rng.choice(EXTENSIONS)}"
+             for i in range(args.names)]
+    names = [os.path.basename(path) for path in paths]
+
+    setting = Setting(args.type)
+    start = time.perf_counter()
+    legacy = 0
+    for path in paths:
+        if legacy_match_file_type(setting, path):
+            legacy += 1
+    legacy_time = time.perf_counter() - start
+
+    plan = SearchPlan('/data', None, FILE_TYPES[args.type], 1, None, None)
+    match_type = plan.match_type
+    start = time.perf_counter()
+    planned = 0
+    for name in names:
+        if match_type(name):
+            planned += 1
+    plan_time = time.perf_counter() - start
+
+    assert legacy == planned, (legacy, planned)
+    for label, elapsed in (("逐文件重建", legacy_time), ("SearchPlan", plan_time)):
+        print(f"{label:<10} {elapsed:6.3f}s  {elapsed / len(paths) * 1e9:7.0f} ns/文件")
+    print(f"加速 {legacy_time / plan_time:.1f}x（{planned} 个文件通过过滤）")
+
+
+if __name__ == "__main__":
+    main()
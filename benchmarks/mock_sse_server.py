@@ -0,0 +1,131 @@
+"""
+模拟 Dify 对话接口的本地 SSE 服务
+按 Dify 的流式格式推送 message / message_end 事件，支持 HTTP/1.1 长连接，
+像 Dify 一样为空的 conversation_id 分配新会话、对不存在的会话返回404，
+可以给每个新连接加上固定延迟来模拟远程服务的 TCP/TLS 握手开销，
+并统计建立过的连接数，供问答相关的基准测试使用
+
+用法:
+    python benchmarks/mock_sse_server.py --port 8089 --chunks 200 --chunk-delay 0.005
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockDifyServer(ThreadingHTTPServer):
+    """模拟服务；port 为0时自动分配端口，url 属性为对话接口地址"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, chunks=50, chunk_text="字", chunk_delay=0.0,
+                 first_token_delay=0.0, handshake_delay=0.0):
+        self.chunks = chunks
+        self.chunk_text = chunk_text
+        self.chunk_delay = chunk_delay
+        self.first_token_delay = first_token_delay
+        self.handshake_delay = handshake_delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []  # 收到的请求体，便于检查 conversation_id 等字段
+        self.conversations = {}  # conversation_id -> 该会话收到的消息数
+        super().__init__(('127.0.0.1', port), MockDifyHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat-messages"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class MockDifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持长连接
+    disable_nagle_algorithm = True  # 与 nginx 等反向代理一致，小片段立即发出
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        if self.server.handshake_delay:
+            time.sleep(self.server.handshake_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        conversation_id = body.get('conversation_id') or str(uuid.uuid4())
+        with server.lock:
+            server.requests.append(body)
+            known = conversation_id in server.conversations
+            if known or not body.get('conversation_id'):
+                server.conversations[conversation_id] = server.conversations.get(conversation_id, 0) + 1
+        if not known and body.get('conversation_id'):
+            self.send_json(404, {'code': 'not_found', 'message': 'Conversation Not Exists.', 'status': 404})
+            return
+        message_id = str(uuid.uuid4())
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        try:
+            if server.first_token_delay:
+                time.sleep(server.first_token_delay)
+            for _ in range(server.chunks):
+                self.send_event({'event': 'message', 'conversation_id': conversation_id,
+                                 'message_id': message_id, 'answer': server.chunk_text})
+                if server.chunk_delay:
+                    time.sleep(server.chunk_delay)
+            self.send_event({'event': 'message_end', 'conversation_id': conversation_id,
+                             'message_id': message_id})
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # 客户端中途放弃了回答
+
+    def send_json(self, status, data):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_event(self, data):
+        payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+        self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 Dify 对话接口的本地 SSE 服务")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--chunks', type=int, default=50, help="每个回答推送的 message 事件数")
+    parser.add_argument('--chunk-text', default="字")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="事件之间的间隔（秒）")
+    parser.add_argument('--first-token-delay', type=float, default=0.0, help="第一个事件前的延迟（秒）")
+    parser.add_argument('--handshake-delay', type=float, default=0.0,
+                        help="每个新连接的额外延迟（秒），模拟 TLS 握手")
+    args = parser.parse_args()
+
+    server = MockDifyServer(args.port, args.chunks, args.chunk_text, args.chunk_delay,
+                            args.first_token_delay, args.handshake_delay)
+    print(f"模拟服务已启动: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+边输入边搜索延迟基准测试
+向文件名索引写入合成的条目，模拟逐字输入，对比每次都查询索引与
+在上一次结果中缩小范围两种方式每个按键的耗时：界面先判断 TYPEAHEAD_PREVIEW
+行并给出匹配数的估计（按键的固定开销），其余的行在后台继续判断（后台耗时）。
+另外单独测量索引查询（三元组索引与逐行扫描）读到第一行和读完全部行的耗时
+
+用法:
+    python benchmarks/typeahead_benchmark.py --entries 1000000 --typed quarterly_report
+"""
+import argparse
+import os
+import queue
+import random
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_index_module import FileIndex, split_ext
+from query_module import CompiledQuery, FileMeta
+from ranking_module import Scorer, RankedResults
+from result_view_module import Hit
+from file_search_module import SearchWindow
+
+PREVIEW = SearchWindow.TYPEAHEAD_PREVIEW
+
+WORDS = ["quarterly", "report", "data", "final", "draft", "image", "notes", "backup",
+         "项目", "报告", "会议", "总结", "budget", "log", "test", "config"]
+EXTENSIONS = ['.txt', '.docx', '.pdf', '.py', '.jpg', '.md', '.xlsx', '.log']
+
+
+def build_index(root, entries):
+    """直接写入合成行，跳过磁盘遍历"""
+    index = FileIndex(root, cache_dir=root)
+    if index.file_count() >= entries:
+        return index
+    rng = random.Random(0)
+    now = time.time()
+    with closing(index._connect()) as conn:
+        conn.execute("DELETE FROM files")
+        rows = []
+        for i in range(entries):
+            name = '_'.join(rng.sample(WORDS, 2)) + f"_{i}" + rng.choice(EXTENSIONS)
+            directory = os.path.join(root, f"d{i % 997}", f"s{i % 31}")
+            rows.append((os.path.join(directory, name), directory, name, name.lower(),
+                         rng.randrange(1 << 20), now - rng.randrange(10 ** 8), split_ext(name)))
+        conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('updated_at', ?)", (str(now),))
+        conn.commit()
+    return index
+
+
+def run(query, rows, population, root):
+    """按界面中的流程处理一次按键
+
+    判断完 PREVIEW 行时按 population() 给出的总行数估计匹配数，与搜索引擎一致。
+    返回 (预览耗时, 估计的匹配数, 总耗时, 匹配数, 保留的完整结果)，
+    结果不足 PREVIEW 行时预览即为完整结果。
+    """
+    start = time.perf_counter()
+    results = RankedResults(queue.Queue(), Scorer(query, [root]), SearchWindow.RESULT_LIMIT,
+                            SearchWindow.NARROW_KEEP)
+    preview = None
+    for examined, (name, path, size, mtime) in enumerate(rows, 1):
+        if examined == PREVIEW:
+            preview = (time.perf_counter() - start, round(results.total * population() / examined))
+        if query.match_meta(name, lambda: FileMeta(size, mtime)):
+            results.put(Hit(path, size, mtime, query.meta_reason))
+    total = time.perf_counter() - start
+    if preview is None:
+        preview = (total, results.total)
+    return preview + (total, results.total, results.matched)
+
+
+def time_query(index, keyword):
+    """只读取索引查询的结果行，返回 (首行耗时, 总耗时, 行数)"""
+    start = time.perf_counter()
+    rows = index.query(keyword)
+    count = 0 if next(rows, None) is None else 1
+    first = time.perf_counter() - start
+    count += sum(1 for _ in rows)
+    return first, time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="边输入边搜索延迟基准测试")
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--typed', default="quarterly_report")
+    parser.add_argument('--min-chars', type=int, default=2)
+    parser.add_argument('--keywords', default="zzz,_12345,报告_会议,quarterly_report,quarterly",
+                        help="单独测量索引查询的关键词，逗号分隔")
+    args = parser.parse_args()
+
+    root = os.path.join(tempfile.gettempdir(), f"typeahead_bench_{args.entries}")
+    os.makedirs(root, exist_ok=True)
+    index = build_index(root, args.entries)
+    print(f"索引: {index.db_path} ({index.file_count()} 条)")
+    print(f"{'输入':<18}{'方式':<8}{'按键':>10}{'估计':>10}{'后台':>10}{'匹配数':>10}")
+
+    base = None
+    for length in range(args.min_chars, len(args.typed) + 1):
+        text = args.typed[:length]
+        query = CompiledQuery(text)
+        if base is not None and query.narrows(base[0]):
+            hits = base[1]
+            rows = ((os.path.basename(h.path), h.path, h.size, h.mtime) for h in hits)
+            outcome = run(query, rows, lambda: len(hits), root)
+            mode = "缩小"
+        else:
+            literal = query.required_literal()
+            keyword = literal.text if literal is not None and query.name_capable(literal) else ''
+            rows = index.query(keyword, query.case_sensitive)
+            outcome = run(query, rows, lambda: index.estimate(keyword, query.case_sensitive), root)
+            mode = "索引"
+        preview, estimate, total, count, matched = outcome
+        base = None if matched is None else (query, matched)
+        print(f"{text:<18}{mode:<8}{preview * 1000:>8.1f}ms{estimate:>10}"
+              f"{(total - preview) * 1000:>8.1f}ms{count:>10}")
+
+    print(f"\n{'关键词':<18}{'方式':<8}{'首行':>10}{'总耗时':>10}{'行数':>10}")
+    name_fts = index.name_fts
+    for keyword in args.keywords.split(','):
+        for use_fts in ([True, False] if name_fts else [False]):
+            index.name_fts = use_fts
+            first, total, count = time_query(index, keyword)
+            print(f"{keyword:<18}{'三元组' if use_fts else '扫描':<8}{first * 1000:>8.1f}ms"
+                  f"{total * 1000:>9.1f}ms{count:>10}")
+    index.name_fts = name_fts
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+目录遍历基准测试
+对比原来的 os.walk + os.stat 遍历与 file_walker_module.walk_files 并行遍历
+
+用法:
+    python benchmarks/walk_benchmark.py --files 1000000 --workers 1 4 16 32
+    python benchmarks/walk_benchmark.py --root D:\\share   # 使用已有目录
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_walker_module import walk_files, DEFAULT_WORKERS
+
+
+def build_tree(root, total_files, files_per_dir=200, dirs_per_level=50):
+    """生成合成目录树：两级目录，每个叶子目录放 files_per_dir 个空文件"""
+    marker = os.path.join(root, '.tree_done')
+    if os.path.exists(marker):
+        return
+    created = 0
+    top = 0
+    while created < total_files:
+        top_dir = os.path.join(root, f"d{top:04d}")
+        for sub in range(dirs_per_level):
+            if created >= total_files:
+                break
+            leaf = os.path.join(top_dir, f"s{sub:03d}")
+            os.makedirs(leaf, exist_ok=True)
+            for i in range(min(files_per_dir, total_files - created)):
+                with open(os.path.join(leaf, f"file_{i:04d}.txt"), 'wb'):
+                    pass
+            created += files_per_dir
+        top += 1
+        print(f"\r生成文件: {min(created, total_files)}/{total_files}", end='', flush=True)
+    print()
+    with open(marker, 'w'):
+        pass
+
+
+def bench_os_walk(root):
+    """原实现：os.walk 列举，再对每个文件调用 os.stat"""
+    count = 0
+    total_size = 0
+    for dir_path, dirs, files in os.walk(root):
+        for name in files:
+            total_size += os.stat(os.path.join(dir_path, name)).st_size
+            count += 1
+    return count, total_size
+
+
+def bench_walk_files(root, workers):
+    """新实现：并行 scandir，复用 DirEntry 的 stat 结果"""
+    count = 0
+    total_size = 0
+    for entry in walk_files(root, workers=workers):
+        total_size += entry.stat().st_size
+        count += 1
+    return count, total_size
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目录遍历基准测试")
+    parser.add_argument('--root', help="使用已有目录，不生成合成目录树")
+    parser.add_argument('--files', type=int, default=1000000, help="合成目录树的文件数")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, DEFAULT_WORKERS])
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    root = args.root
+    if not root:
+        root = os.path.join(tempfile.gettempdir(), f"walk_bench_{args.files}")
+        os.makedirs(root, exist_ok=True)
+        build_tree(root, args.files)
+
+    print(f"目录: {root}")
+    for _ in range(args.repeat):
+        elapsed, (count, _) = timed(bench_os_walk, root)
+        print(f"os.walk + os.stat        {elapsed:8.2f}s  {count / elapsed:12.0f} 文件/秒")
+        for workers in args.workers:
+            elapsed, (count, _) = timed(bench_walk_files, root, workers)
+            print(f"walk_files(workers={workers:<3d})  {elapsed:8.2f}s  {count / elapsed:12.0f} 文件/秒")
+
+
+if __name__ == "__main__":
+    main()
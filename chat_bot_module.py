@@ -6,6 +6,61 @@ import tkinter as tk
 from tkinter import scrolledtext
 import threading
 import time
+from collections import deque
+from chat_transport_module import ChatChannel
+
+
+class TkBridge:
+    """把后台线程产生的事件交给 Tk 主线程处理
+
+    事件先放进队列，同一时间最多只有一个待执行的 after 回调，且两次回调
+    至少间隔一帧（FRAME_MS）；回调中按到达顺序处理队列中的全部事件，
+    相邻的 answer 片段合并为一次显示，界面开销只取决于帧率而不是片段数。
+    """
+
+    FRAME_MS = 16
+
+    def __init__(self, widget, handler):
+        self.widget = widget
+        self.handler = handler
+        self.events = deque()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.last_flush = 0.0
+
+    def put(self, *event):
+        """可以从任意线程调用"""
+        with self.lock:
+            self.events.append(event)
+            if self.scheduled:
+                return
+            self.scheduled = True
+            # 距上次刷新不足一帧时等到下一帧，否则立即刷新
+            elapsed_ms = (time.perf_counter() - self.last_flush) * 1000
+            delay = max(0, int(self.FRAME_MS - elapsed_ms))
+        try:
+            self.widget.after(delay, self.flush)
+        except (RuntimeError, tk.TclError):
+            pass  # 窗口已经关闭
+
+    def flush(self):
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+            self.scheduled = False
+            self.last_flush = time.perf_counter()
+        pending = []
+        for kind, value in events:
+            if kind == 'answer':
+                pending.append(value)
+                continue
+            if pending:
+                self.handler('answer', ''.join(pending))
+                pending = []
+            self.handler(kind, value)
+        if pending:
+            self.handler('answer', ''.join(pending))
+
 
 class ChatWindow:
     def __init__(self):
@@ -16,6 +71,12 @@ class ChatWindow:
         self.window.configure(bg='#ECF0F1')
         
         self.chat_history = []
+        self.reply = None  # 正在接收的回答在 chat_history 中的记录
+        self.discarding = False  # 清空对话后、会话重置完成前收到的旧回答不再显示
+        self.bridge = TkBridge(self.window, self.on_chat_event)
+        # 网络请求在共用的事件循环线程中按发送顺序逐条处理
+        self.channel = ChatChannel(self.bridge.put)
+        self.window.bind('<Destroy>', self.on_destroy)
         self.setup_ui()
         
     def setup_ui(self):
@@ -38,6 +99,9 @@ class ChatWindow:
                                 bd=1,
                                 state='disabled')
         self.chat_display.pack(fill='both', expand=True)
+        # 消息样式只需配置一次
+        self.chat_display.tag_config("user", foreground="#2980B9", font=('微软雅黑', 10, 'bold'))
+        self.chat_display.tag_config("assistant", foreground="#27AE60", font=('微软雅黑', 10))
         
         # 输入区域
         input_frame = tk.Frame(self.window, bg='#ECF0F1')
@@ -82,24 +146,28 @@ class ChatWindow:
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def add_message(self, sender, message):
-        """添加消息到聊天记录"""
+        """添加消息到聊天记录，返回该消息的记录"""
         self.chat_display.config(state='normal') # 允许编辑
         
         timestamp = time.strftime('%H:%M:%S')
         
+        # 回答仍在接收时，新消息要排在 reply_end 标记之后，后续片段仍追加在回答末尾
+        if self.reply is not None:
+            self.chat_display.mark_gravity("reply_end", "left")
         if sender == "用户":
-            self.chat_display.insert(tk.END, f"\n[{timestamp}] 您: {message}\n")
-            self.chat_display.tag_add("user", "end-2l", "end-1l")
-            self.chat_display.tag_config("user", foreground="#2980B9", font=('微软雅黑', 10, 'bold'))
+            self.chat_display.insert(tk.END, f"\n[{timestamp}] 您: {message}\n", "user")
         else:
-            self.chat_display.insert(tk.END, f"\n[{timestamp}] 助手: {message}\n")
-            self.chat_display.tag_add("assistant", "end-2l", "end-1l")
-            self.chat_display.tag_config("assistant", foreground="#27AE60", font=('微软雅黑', 10))
+            self.chat_display.insert(tk.END, f"\n[{timestamp}] 助手: {message}\n", "assistant")
+        if self.reply is not None:
+            self.chat_display.mark_gravity("reply_end", "right")
         
-        self.chat_history.append({"sender": sender, "message": message, "timestamp": timestamp}) # 保存到内存
+        # 保存到内存；内容以片段列表保存，需要时才拼接
+        chat = {"sender": sender, "parts": [message], "timestamp": timestamp}
+        self.chat_history.append(chat)
         
         self.chat_display.config(state='disabled') # 禁止编辑
         self.chat_display.see(tk.END) # 滚动到最后
+        return chat
     
     def send_message(self, event=None):
         """发送消息"""
@@ -114,100 +182,63 @@ class ChatWindow:
         self.generate_response(message)
 
     def generate_response(self, user_message):
-        """生成AI回复（调用Dify API实现智能回答）"""
-        def respond():
-            import requests
-            import json
-            import time
-            
-            # Dify API配置
-            api_key = "app-sa19QdxtZJsz6I1rI7RVNsZ2"  # 请替换为实际的API密钥
-            api_url = "http://localhost/v1/chat-messages"
-            
-            # 构建请求数据
-            payload = {
-                "inputs": {},
-                "query": user_message,
-                "response_mode": "streaming",
-                "conversation_id": "",
-                "user": "cyn"
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            try:
-                # 调用Dify API，启用流式响应
-                response = requests.post(api_url, headers=headers, 
-                                    json=payload, stream=True)
-                
-                if response.status_code == 200:
-                    # 初始化时添加一个空的助手消息
-                    self.window.after(0, lambda: self.add_message("助手", ""))
-                    # 流式处理响应
-                    for line in response.iter_lines():
-                        if line:
-                            decoded_line = line.decode('utf-8')
-                            # 处理SSE数据
-                            if decoded_line.startswith("data: "):
-                                try:
-                                    data = json.loads(decoded_line[6:])  # 去掉"data: "前缀
-                                    if 'answer' in data:
-                                        # 直接获取answer字段作为新增内容
-                                        new_content = data['answer']
-                                        # 实时更新显示（传入新增内容）
-                                        self.window.after(0, lambda text=new_content: 
-                                                        self.append_to_last_message("助手", text))
-                                        # 添加小延迟以获得更好的流式效果
-                                        time.sleep(0.02)
-                                except json.JSONDecodeError:
-                                    continue
-                else:
-                    error_msg = f"API调用失败，状态码：{response.status_code}"
-                    self.window.after(0, lambda: self.append_to_last_message("助手", error_msg))
-                    
-            except Exception as e:
-                error_msg = f"请求过程中出现错误：{str(e)}"
-                self.window.after(0, lambda: self.append_to_last_message("助手", error_msg))
-        
-        threading.Thread(target=respond, daemon=True).start()
+        """生成AI回复（调用Dify API实现智能回答）
+
+        消息进入本窗口的队列，前一条的回答完整返回后才发送，回答按发送顺序出现。
+        """
+        self.channel.submit(user_message)
 
-    def append_to_last_message(self, sender, new_text):
-        """向最后一条消息追加内容（用于流式输出）"""
-        if not self.chat_history:  # 没有聊天记录
+    def on_chat_event(self, kind, value):
+        """处理 ChatChannel 的事件，在 Tk 主线程中调用"""
+        if kind == 'reset':
+            self.discarding = False
+            return
+        if self.discarding:
+            return
+        if kind == 'start':
+            # 轮到这条消息时添加一个空的助手消息，回答片段追加在 reply_end 标记处
+            self.reply = self.add_message("助手", "")
+            self.chat_display.mark_set("reply_end", "end-1c")
+        elif kind in ('answer', 'error'):
+            self.append_to_reply(value)
+        elif kind == 'done':
+            self.reply = None
+
+    def on_destroy(self, event):
+        if event.widget is self.window:
+            self.channel.close()
+
+    def append_to_reply(self, new_text):
+        """向正在接收的回答追加内容（用于流式输出）
+
+        每次追加的开销与回答已有长度无关：片段加入列表，文本带着标签插入到
+        reply_end 标记处；回答期间用户发送的新消息显示在回答之后。
+        """
+        if self.reply is None:
             return
         
         # 更新内存中的聊天记录
-        last_msg = self.chat_history[-1]
-        if last_msg["sender"] == sender:
-            last_msg["message"] += new_text
+        self.reply["parts"].append(new_text)
         
         # 更新显示界面
         self.chat_display.config(state='normal')
-        
-        # 插入新文本
-        self.chat_display.insert("end-1c", new_text)
-        
-        # 重新为助手消息应用标签样式
-        if sender == "助手":
-            # 获取最后一段消息的起始和结束位置
-            last_line_start = self.chat_display.index("end-2l linestart")
-            last_line_end = self.chat_display.index("end-1c")
-            # 为最后一行应用助手标签样式
-            self.chat_display.tag_add("assistant", last_line_start, last_line_end)
-            self.chat_display.tag_config("assistant", foreground="#27AE60", font=('微软雅黑', 10))
-        elif sender == "用户":
-            # 为最后一行应用用户标签样式
-            self.chat_display.tag_add("user", "end-2l", "end-1l")
-            self.chat_display.tag_config("user", foreground="#2980B9", font=('微软雅黑', 10, 'bold'))
-        
+        self.chat_display.insert("reply_end", new_text, "assistant")
         self.chat_display.config(state='disabled')  # 禁止编辑
         self.chat_display.see(tk.END)  # 滚动到最后
 
+    @staticmethod
+    def message_text(chat):
+        """一条聊天记录的完整内容，拼接结果缓存在片段列表中"""
+        parts = chat["parts"]
+        if len(parts) > 1:
+            parts[:] = [''.join(parts)]
+        return parts[0] if parts else ""
+
     def clear_chat(self):
-        """清空聊天记录"""
+        """清空聊天记录，之后的消息在新会话中发送"""
+        self.channel.reset()
+        self.discarding = True
+        self.reply = None
         self.chat_display.config(state='normal')
         self.chat_display.delete(1.0, tk.END)
         self.chat_display.config(state='disabled')
@@ -237,7 +268,7 @@ class ChatWindow:
                     f.write(f"导出时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
                     
                     for chat in self.chat_history:
-                        f.write(f"[{chat['timestamp']}] {chat['sender']}: {chat['message']}\n\n")
+                        f.write(f"[{chat['timestamp']}] {chat['sender']}: {self.message_text(chat)}\n\n")
                 
                 tk.messagebox.showinfo("成功", f"聊天记录已保存到：\n{file_path}")
             except Exception as e:
@@ -0,0 +1,234 @@
+"""
+问答传输模块
+负责与 Dify 对话接口之间的网络通信：整个程序共用一个 requests.Session，
+连接池保持长连接，第一轮之后的对话不再重新建立 TCP/TLS 连接；
+请求带有连接和读取超时，连接失败和网关错误时按指数退避有限次重试。
+程序内只有一个后台线程运行 asyncio 事件循环，负责调度所有对话请求，
+阻塞的流式读取交给它的线程池执行；每个对话窗口通过 ChatChannel 排队发送消息，
+回答按发送顺序逐条返回，同一窗口的多轮对话沿用服务端分配的 conversation_id
+"""
+import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Dify API配置
+API_KEY = "app-sa19QdxtZJsz6I1rI7RVNsZ2"  # 请替换为实际的API密钥
+API_URL = "http://localhost/v1/chat-messages"
+USER = "cyn"
+
+CONNECT_TIMEOUT = 5  # 建立连接的超时（秒）
+READ_TIMEOUT = 60  # 两次收到数据之间的最长等待，模型思考较久时也不会误判
+RETRIES = 3
+BACKOFF = 0.3  # 第 n 次重试前等待 BACKOFF * 2^(n-1) 秒
+RETRY_STATUS = (429, 502, 503, 504)  # 服务端尚未处理请求的状态码，可以安全重试
+POOL_SIZE = 4
+
+_chat_loop = None
+_transport = None
+_singleton_lock = threading.Lock()
+
+
+class ChatError(Exception):
+    """对话请求失败，消息可以直接显示给用户；status 为HTTP状态码（不是状态码错误时为None）"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ChatTransport:
+    """对话接口客户端，持有带连接池的 Session，可在多个线程中共用
+
+    只在连接失败和 RETRY_STATUS 状态码时重试：这两种情况下服务端都还没有
+    处理这条消息，重发不会产生重复回答；请求发出后的读取错误不重试。
+    """
+
+    def __init__(self, api_url=API_URL, api_key=API_KEY, user=USER,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=RETRIES, backoff=BACKOFF):
+        self.api_url = api_url
+        self.user = user
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+        retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                      backoff_factor=backoff, status_forcelist=RETRY_STATUS,
+                      allowed_methods=frozenset({'POST'}), raise_on_status=False,
+                      respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def stream_chat(self, query, conversation_id=""):
+        """发送一条消息，逐个产出服务端推送的 SSE 事件（dict）
+
+        回答正常读完后连接自动归还连接池；调用方提前关闭生成器时连接被丢弃。
+        网络错误、非200状态码和服务端的 error 事件都抛出 ChatError。
+        """
+        payload = {
+            "inputs": {},
+            "query": query,
+            "response_mode": "streaming",
+            "conversation_id": conversation_id,
+            "user": self.user
+        }
+        try:
+            response = self.session.post(self.api_url, json=payload, stream=True, timeout=self.timeout)
+            with response:
+                if response.status_code != 200:
+                    raise ChatError(f"API调用失败，状态码：{response.status_code}", response.status_code)
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue  # 空行、注释和 event: 行
+                    try:
+                        data = json.loads(line[5:])
+                    except json.JSONDecodeError:
+                        continue
+                    if data.get("event") == "error":
+                        raise ChatError(f"服务端返回错误：{data.get('message', '')}")
+                    yield data
+        except requests.Timeout:
+            raise ChatError("请求超时，请检查服务是否正常运行") from None
+        except requests.RequestException as e:
+            raise ChatError(f"请求过程中出现错误：{e}") from None
+
+    def close(self):
+        self.session.close()
+
+
+class ChatLoop:
+    """后台事件循环线程，负责调度程序内的所有问答请求
+
+    阻塞的网络读取在 executor 的线程中执行，同时进行的请求数不超过 POOL_SIZE。
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='chat-io')
+        self.thread = threading.Thread(target=self._run, name='chat-loop', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call(self, func, *args):
+        """在事件循环线程中调用 func，可以从任意线程调用，按调用顺序执行"""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    async def run_blocking(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+
+class ChatChannel:
+    """一个对话窗口的消息队列
+
+    消息按发送顺序逐条请求，前一条的回答完整返回后才发送下一条。
+    回答以事件的形式交给 deliver(kind, value)，deliver 在后台线程中调用：
+    ('start', 消息)、('answer', 文本片段)、('error', 错误信息)、('done', None)，
+    调用 reset() 后另有 ('reset', None)。
+    第一轮回答中服务端分配的 conversation_id 会被记住，之后的消息都在同一会话中发送。
+    """
+
+    def __init__(self, deliver, transport=None, chat_loop=None):
+        self.deliver = deliver
+        self.transport = transport or get_transport()
+        self.chat_loop = chat_loop or get_chat_loop()
+        self.queue = None
+        self.worker = None
+        self.conversation_id = ""  # 只在事件循环线程中读写
+        # 读取线程送出片段前持有此锁并检查 stopped，reset() 之后不会再有旧回答的片段
+        self.deliver_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.chat_loop.call(self._start)
+
+    def _start(self):
+        self.queue = asyncio.Queue()
+        self.stopped = threading.Event()
+        self.worker = asyncio.ensure_future(self._run())
+
+    def submit(self, query):
+        """排队发送一条消息，可以从任意线程调用"""
+        self.chat_loop.call(lambda: self.queue.put_nowait(query))
+
+    async def _run(self):
+        while True:
+            query = await self.queue.get()
+            await self._respond(query)
+
+    async def _respond(self, query):
+        self.deliver('start', query)
+        try:
+            try:
+                await self._stream(query)
+            except ChatError as e:
+                if e.status != 404 or not self.conversation_id:
+                    raise
+                # 会话已在服务端失效（被删除或过期），改为开始新会话重发
+                self.conversation_id = ""
+                await self._stream(query)
+        except ChatError as e:
+            self.deliver('error', str(e))
+        except Exception as e:
+            self.deliver('error', f"请求过程中出现错误：{str(e)}")
+        self.deliver('done', None)
+
+    async def _stream(self, query):
+        conversation_id = await self.chat_loop.run_blocking(
+            self._read_answer, query, self.conversation_id, self.stopped)
+        if conversation_id:
+            self.conversation_id = conversation_id
+
+    def _read_answer(self, query, conversation_id, stopped):
+        """在读取线程中流式接收一条回答，返回服务端分配的 conversation_id"""
+        for data in self.transport.stream_chat(query, conversation_id):
+            if not conversation_id and data.get('conversation_id'):
+                conversation_id = data['conversation_id']
+            if 'answer' in data:
+                # 全速读取，合并显示由界面一侧按帧完成
+                with self.deliver_lock:
+                    if stopped.is_set():
+                        break
+                    self.deliver('answer', data['answer'])
+        return conversation_id
+
+    def reset(self):
+        """开始新会话：丢弃排队中和正在接收的回答，完成后送出 ('reset', None)"""
+        self.chat_loop.call(self._reset)
+
+    def _reset(self):
+        self._stop()
+        self.conversation_id = ""
+        self._start()
+        self.deliver('reset', None)
+
+    def close(self):
+        """停止处理，丢弃尚未发送的消息"""
+        self.chat_loop.call(self._stop)
+
+    def _stop(self):
+        with self.deliver_lock:
+            self.stopped.set()
+        if self.worker is not None:
+            self.worker.cancel()
+
+
+def get_chat_loop():
+    """程序内共用的 ChatLoop，首次调用时启动"""
+    global _chat_loop
+    with _singleton_lock:
+        if _chat_loop is None:
+            _chat_loop = ChatLoop()
+        return _chat_loop
+
+
+def get_transport():
+    """程序内共用的 ChatTransport，首次调用时创建"""
+    global _transport
+    with _singleton_lock:
+        if _transport is None:
+            _transport = ChatTransport()
+        return _transport
@@ -0,0 +1,227 @@
+"""
+内容索引模块
+负责为搜索根目录下的文本文件建立倒排索引（三字组 + 中文二字组），
+内容搜索时只需读取索引给出的候选文件进行确认
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import time
+from contextlib import closing
+from file_index_module import get_cache_dir
+from content_match_module import match_encodings
+
+# 中日韩统一表意文字范围，用于额外生成二字组
+CJK_RUN = re.compile('[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]{2,}')
+
+
+def extract_grams(text):
+    """提取文本的索引词元：所有三字组，以及连续汉字中的二字组"""
+    text = text.lower()
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    for run in CJK_RUN.findall(text):
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+def query_grams(keyword):
+    """关键词对应的查询词元，无法利用索引剪枝时返回None"""
+    keyword = keyword.lower()
+    if len(keyword) >= 3:
+        return {keyword[i:i + 3] for i in range(len(keyword) - 2)}
+    if len(keyword) == 2 and CJK_RUN.fullmatch(keyword):
+        return {keyword}
+    return None
+
+
+class ContentIndex:
+    """单个搜索根目录的文本内容倒排索引
+
+    词元统一转为小写，所以区分大小写的搜索同样可以用它缩小候选范围，
+    最终匹配仍由调用方读取候选文件确认。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS docs (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE,
+            size INTEGER,
+            mtime REAL,
+            indexed INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS grams (
+            gram TEXT,
+            doc INTEGER,
+            PRIMARY KEY (gram, doc)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS grams_doc ON grams(doc);
+    """
+
+    MAX_INDEX_BYTES = 4 * 1024 * 1024  # 超过此大小的文件不建词元，始终作为候选
+    COMMIT_EVERY = 200
+    VERSION = '3'  # 2: 按识别出的编码解码建立词元；3: 编码无法确定时按各常见编码分别解码
+
+    def __init__(self, root, cache_dir=None):
+        self.root = os.path.abspath(root)
+        key = os.path.normcase(self.root).encode('utf-8', 'surrogateescape')
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        self.db_path = os.path.join(cache_dir or get_cache_dir(), f"content_{digest}.sqlite")
+
+        with closing(self._connect()) as conn:
+            conn.executescript(self.SCHEMA)
+            row = conn.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+            if row is None or row[0] != self.VERSION:
+                # 旧版本的词元可能来自错误的解码，整体重建
+                conn.execute("DELETE FROM grams")
+                conn.execute("DELETE FROM docs")
+                conn.execute("DELETE FROM meta")
+                conn.execute("INSERT INTO meta(key, value) VALUES ('version', ?)", (self.VERSION,))
+            conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def is_built(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM meta WHERE key='updated_at'").fetchone() is not None
+
+    def read_texts(self, path, encoding='utf-8'):
+        """按文件的编码读取文本用于建立索引
+
+        编码无法确定时（开头只有 ASCII）与内容匹配一样按各常见编码分别解码，
+        返回去重后的文本列表。
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        return list({data.decode(codec, errors='ignore') for codec in match_encodings(encoding)})
+
+    def update(self, paths, progress=None, cancel=None, encoding_of=None):
+        """根据文件列表增量更新索引，返回 (文件总数, 重新索引数)
+
+        只有大小或修改时间变化的文件会被重新读取，消失的文件会被移除。
+        encoding_of(path, stat) 给出文件编码，未提供时按 utf-8 读取。
+        progress(已检查数, 总数) 会被周期性调用。
+        cancel 被取消时提前返回，已索引的文件保留，索引不标记为已建立。
+        """
+        paths = list(paths)
+        total = len(paths)
+        reindexed = 0
+        with closing(self._connect()) as conn:
+            existing = {path: (doc_id, size, mtime) for doc_id, path, size, mtime
+                        in conn.execute("SELECT id, path, size, mtime FROM docs")}
+            seen = set()
+
+            for checked, path in enumerate(paths, 1):
+                if cancel is not None and cancel.cancelled:
+                    conn.commit()
+                    return total, reindexed
+                if checked % self.COMMIT_EVERY == 0:
+                    conn.commit()
+                    if progress:
+                        progress(checked, total)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+
+                old = existing.get(path)
+                if old is not None and old[1] == st.st_size and old[2] == st.st_mtime:
+                    continue
+                if old is not None:
+                    conn.execute("DELETE FROM grams WHERE doc=?", (old[0],))
+                    conn.execute("DELETE FROM docs WHERE id=?", (old[0],))
+                self._index_file(conn, path, st, encoding_of(path, st) if encoding_of else 'utf-8')
+                reindexed += 1
+
+            for path, (doc_id, _, _) in existing.items():
+                if path not in seen:
+                    conn.execute("DELETE FROM grams WHERE doc=?", (doc_id,))
+                    conn.execute("DELETE FROM docs WHERE id=?", (doc_id,))
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('updated_at', ?)",
+                         (str(time.time()),))
+            conn.commit()
+
+        if progress:
+            progress(total, total)
+        return total, reindexed
+
+    def apply_events(self, events, encoding_of):
+        """把文件监视事件增量应用到索引
+
+        encoding_of(path) 给出文本文件的编码，返回None的文件不建立索引。
+        """
+        with closing(self._connect()) as conn:
+            for event in events:
+                if event.kind in ('deleted', 'moved'):
+                    self._remove(conn, event.path, event.is_dir)
+                if event.kind in ('created', 'modified', 'moved') and not event.is_dir:
+                    target = event.dest if event.kind == 'moved' else event.path
+                    self._remove(conn, target, False)
+                    try:
+                        st = os.stat(target)
+                    except OSError:
+                        continue
+                    encoding = encoding_of(target, st)
+                    if encoding is None:
+                        continue
+                    self._index_file(conn, target, st, encoding)
+            conn.commit()
+
+    def _remove(self, conn, path, is_dir):
+        """删除一个文件（或目录下所有文件）的索引"""
+        if is_dir:
+            prefix = path.rstrip(os.sep) + os.sep
+            upper = prefix[:-1] + chr(ord(os.sep) + 1)
+            rows = conn.execute("SELECT id FROM docs WHERE path>=? AND path<?",
+                                (prefix, upper)).fetchall()
+        else:
+            rows = conn.execute("SELECT id FROM docs WHERE path=?", (path,)).fetchall()
+        for (doc_id,) in rows:
+            conn.execute("DELETE FROM grams WHERE doc=?", (doc_id,))
+            conn.execute("DELETE FROM docs WHERE id=?", (doc_id,))
+
+    def _index_file(self, conn, path, st, encoding):
+        """读取单个文件并写入其词元"""
+        grams = None
+        if st.st_size <= self.MAX_INDEX_BYTES:
+            try:
+                grams = set()
+                for text in self.read_texts(path, encoding or 'utf-8'):
+                    grams |= extract_grams(text)
+            except (OSError, LookupError):
+                grams = None
+
+        cur = conn.execute("INSERT INTO docs(path, size, mtime, indexed) VALUES (?, ?, ?, ?)",
+                           (path, st.st_size, st.st_mtime, 0 if grams is None else 1))
+        if grams:
+            doc_id = cur.lastrowid
+            conn.executemany("INSERT OR IGNORE INTO grams(gram, doc) VALUES (?, ?)",
+                             ((gram, doc_id) for gram in grams))
+
+    def candidates(self, keyword):
+        """返回可能包含关键词的文件路径列表（需要调用方读取确认）"""
+        grams = query_grams(keyword)
+        with closing(self._connect()) as conn:
+            if grams is None:
+                return [path for (path,) in conn.execute("SELECT path FROM docs")]
+
+            grams = sorted(grams)
+            placeholders = ','.join('?' * len(grams))
+            sql = f"""
+                SELECT path FROM docs WHERE id IN (
+                    SELECT doc FROM grams WHERE gram IN ({placeholders})
+                    GROUP BY doc HAVING COUNT(*) = ?
+                )
+                UNION
+                SELECT path FROM docs WHERE indexed = 0
+            """
+            return [path for (path,) in conn.execute(sql, grams + [len(grams)])]
@@ -0,0 +1,237 @@
+"""
+内容匹配模块
+负责在文件内容中查找关键词：把关键词按文件的编码（未知时按常见编码）
+预先编码成字节模式，通过 mmap 或固定大小的分块直接在字节上匹配，
+找到第一处即返回；大批文件可交给线程池或进程池并行匹配
+"""
+import os
+import mmap
+import itertools
+import multiprocessing
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                wait, FIRST_COMPLETED)
+
+# 文件编码未知时尝试的编码；gb2312 是 gbk 的子集，编码结果相同，无需单独列出
+ENCODINGS = ('utf-8', 'gbk', 'latin-1')
+CHUNK_SIZE = 1024 * 1024  # 每次匹配的窗口大小，同时也是非 mmap 读取时的缓冲区大小
+CANCEL_SLOTS = 64  # 进程池中可以分别取消的搜索数，超过后循环使用
+
+_worker_cancel_flags = None  # 工作进程中的共享取消标记，由 init_worker 设置
+
+
+def match_encodings(encoding):
+    """在某种编码的文件中匹配时需要使用的编码
+
+    encoding 为None表示未知，为 'ascii' 表示文件开头只有 ASCII
+    （file_type_module.ASCII），其后的内容仍可能是任意一种常见编码。
+    """
+    if encoding is None or encoding == 'ascii':
+        return ENCODINGS
+    if encoding == 'utf-8-sig':
+        return ('utf-8',)
+    return (encoding,)
+
+
+def iter_windows(f, chunk_size=CHUNK_SIZE, overlap=0):
+    """把已打开的二进制文件切成相互重叠的匹配窗口，产出 (缓冲区, 起点, 终点)
+
+    小文件一次读入；大文件优先 mmap，不复制内容；无法 mmap 时按块读取，
+    每块前面拼上上一块末尾 overlap 个字节，保证跨窗口的匹配不会漏掉。
+    """
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return
+    if size <= chunk_size:
+        data = f.read()
+        yield data, 0, len(data)
+        return
+
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        tail = b''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            data = tail + chunk
+            yield data, 0, len(data)
+            tail = data[-overlap:] if overlap else b''
+
+    with mm:
+        size = len(mm)
+        pos = 0
+        while pos < size:
+            yield mm, pos, min(size, pos + chunk_size + overlap)
+            pos += chunk_size
+
+
+def keyword_variants(keyword, case_sensitive, encodings=ENCODINGS):
+    """关键词在各编码下的字节形式（去重），无法编码时不产生
+
+    字节正则的 IGNORECASE 只折叠 ASCII 字母，所以不区分大小写时
+    额外加入小写、大写和首字母大写形式，覆盖常见的非 ASCII 大小写变化。
+    """
+    texts = [keyword]
+    if not case_sensitive:
+        for text in (keyword.lower(), keyword.upper(), keyword.title()):
+            if text not in texts:
+                texts.append(text)
+
+    variants = []
+    for text in texts:
+        for encoding in encodings:
+            try:
+                data = text.encode(encoding)
+            except UnicodeEncodeError:
+                continue
+            if data and data not in variants:
+                variants.append(data)
+    return variants
+
+
+def init_worker(cancel_flags):
+    """进程池工作进程初始化：保存主进程创建的共享取消标记"""
+    global _worker_cancel_flags
+    _worker_cancel_flags = cancel_flags
+
+
+class SharedCancel:
+    """跨进程的取消标记
+
+    主进程把共享数组中这次搜索的一格置为1，工作进程在匹配每个文件和
+    每个窗口前读取，正在执行的批次不必等到读完就能停下。
+    """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    @property
+    def cancelled(self):
+        return _worker_cancel_flags is not None and _worker_cancel_flags[self.slot] != 0
+
+
+def search_batch(matcher, items, cancel=None):
+    """匹配一批文件，返回 (命中的路径, 实际扫描的字节数)（进程池中执行时必须是模块级函数）
+
+    items 中的每一项是路径，或 (路径, 编码)，或 (路径, 编码, 实际读取的文件)。
+    """
+    hits = []
+    scanned = [0]
+    for item in items:
+        if cancel is not None and cancel.cancelled:
+            break
+        if isinstance(item, tuple):
+            path = item[0]
+            if matcher.search_file(path, cancel, *item[1:], scanned=scanned):
+                hits.append(path)
+        elif matcher.search_file(item, cancel, scanned=scanned):
+            hits.append(item)
+    return hits, scanned[0]
+
+
+class ContentSearchExecutor:
+    """内容匹配的执行后端
+
+    mode 为 'inline'（在调用线程中逐个匹配）、'thread'（线程池）或
+    'process'（进程池，解码和匹配不受GIL限制）。候选文件按批提交，
+    工作者只回传命中的路径。池在第一次使用时创建，之后重复使用。
+    matcher 为 query_module.CompiledQuery，或同样提供
+    search_file(path, cancel, encoding=None, source=None, scanned=None) 的对象，
+    scanned 为单元素列表，用于累计实际扫描的字节数。
+    """
+
+    MODES = ('inline', 'thread', 'process')
+
+    def __init__(self, mode='process', workers=None, batch_size=32):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的执行方式: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.pool = None
+        self.cancel_flags = None  # 进程池共用的取消标记，每次搜索占用其中一格
+        self.runs = itertools.count()
+
+    def _get_pool(self):
+        if self.pool is None:
+            if self.mode == 'process':
+                self.cancel_flags = multiprocessing.RawArray('b', CANCEL_SLOTS)
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                initargs=(self.cancel_flags,))
+            else:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers,
+                                               thread_name_prefix='content')
+        return self.pool
+
+    def run(self, matcher, paths, cancel=None, stats=None):
+        """对 paths 中的文件逐批匹配，按完成顺序产出命中的路径
+
+        paths 中的每一项是路径，或 (路径, 编码[, 实际读取的文件])。
+        stats（SearchStats）不为None时把实际扫描的字节数计入 content_bytes。
+        """
+        def hits_of(result):
+            hits, scanned = result
+            if stats is not None:
+                stats.count('content_bytes', scanned)
+            return hits
+
+        if self.mode == 'inline':
+            for item in paths:
+                if cancel is not None and cancel.cancelled:
+                    return
+                yield from hits_of(search_batch(matcher, (item,), cancel))
+            return
+
+        pool = self._get_pool()
+        flags = self.cancel_flags
+        if self.mode == 'process':
+            # CancelToken 无法跨进程传递，改用共享内存中的标记
+            slot = next(self.runs) % CANCEL_SLOTS
+            flags[slot] = 0
+            batch_cancel = SharedCancel(slot)
+        else:
+            batch_cancel = cancel
+        max_in_flight = self.workers * 2
+        in_flight = set()
+        batch = []
+        try:
+            for path in paths:
+                if cancel is not None and cancel.cancelled:
+                    return
+                batch.append(path)
+                if len(batch) < self.batch_size:
+                    continue
+                in_flight.add(pool.submit(search_batch, matcher, batch, batch_cancel))
+                batch = []
+
+                # 先收取已完成的批次，队列过长时等待，同时检查取消
+                done = {future for future in in_flight if future.done()}
+                while len(in_flight) - len(done) >= max_in_flight:
+                    if cancel is not None and cancel.cancelled:
+                        return
+                    done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    yield from hits_of(future.result())
+
+            if batch:
+                in_flight.add(pool.submit(search_batch, matcher, batch, batch_cancel))
+            while in_flight:
+                if cancel is not None and cancel.cancelled:
+                    return
+                done, in_flight = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from hits_of(future.result())
+        finally:
+            if self.mode == 'process':
+                # 搜索结束或被取消，仍在工作进程中执行的批次随即停止
+                flags[batch_cancel.slot] = 1
+            for future in in_flight:
+                future.cancel()
+
+    def shutdown(self, wait=False):
+        """关闭线程池或进程池；程序即将退出时应传入 wait=True，等待工作进程结束"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
@@ -0,0 +1,530 @@
+"""
+文档文本提取模块
+负责从 .docx / .pdf / .rtf 等文档中提取纯文本供内容搜索使用：提取在独立的
+进程池中进行，每个文件有时间和内存上限；结果按 路径+修改时间+大小 缓存在
+磁盘上，同一文档只解析一次
+"""
+import os
+import re
+import zlib
+import time
+import signal
+import hashlib
+import zipfile
+import glob
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from file_index_module import get_cache_dir, split_ext
+
+MAX_TEXT_CHARS = 16 * 1024 * 1024  # 单个文档最多保留的文本长度
+
+
+def extract_docx(path):
+    """docx：读取 word/document.xml 中的段落文字"""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo('word/document.xml')
+        if info.file_size > 256 * 1024 * 1024:
+            raise ValueError("document.xml 过大")
+        pieces = []
+        with archive.open(info) as f:
+            for _, element in ET.iterparse(f):
+                tag = element.tag.rpartition('}')[2]
+                if tag == 't' and element.text:
+                    pieces.append(element.text)
+                elif tag == 'tab':
+                    pieces.append('\t')
+                elif tag in ('p', 'br', 'cr'):
+                    pieces.append('\n')
+                if tag == 'p':
+                    element.clear()
+        return ''.join(pieces)
+
+
+# ---------- PDF ----------
+
+PDF_OBJECT = re.compile(rb'\d+\s+\d+\s+obj(.*?)endobj', re.S)
+PDF_OPERATOR = re.compile(rb"[A-Za-z'\"*]+")
+PDF_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+PDF_ESCAPES = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b',
+               ord('f'): b'\f', ord('('): b'(', ord(')'): b')', ord('\\'): b'\\'}
+PDF_HEX_PAIR = re.compile(rb'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>')
+PDF_HEX_RANGE = re.compile(rb'<([0-9A-Fa-f]+)>\s*<([0-9A-Fa-f]+)>\s*(<[0-9A-Fa-f]+>|\[[^\]]*\])')
+
+
+def pdf_streams(data):
+    """依次产出 PDF 中各对象的流内容（已按 FlateDecode 解压，图片等流跳过）"""
+    for m in PDF_OBJECT.finditer(data):
+        body = m.group(1)
+        start = body.find(b'stream')
+        if start < 0:
+            continue
+        header = body[:start]
+        if b'/Image' in header:
+            continue
+        start += len(b'stream')
+        if body[start:start + 2] == b'\r\n':
+            start += 2
+        elif body[start:start + 1] in (b'\n', b'\r'):
+            start += 1
+        end = body.rfind(b'endstream')
+        stream = body[start:end if end >= 0 else len(body)]
+        if b'/FlateDecode' in header:
+            try:
+                stream = zlib.decompressobj().decompress(stream)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            continue
+        yield stream
+
+
+def parse_cmap(data, cmap):
+    """解析 ToUnicode CMap 中的 bfchar / bfrange 映射"""
+    for block in re.findall(rb'beginbfchar(.*?)endbfchar', data, re.S):
+        for src, dst in PDF_HEX_PAIR.findall(block):
+            cmap[bytes.fromhex(src.decode())] = bytes.fromhex(dst.decode()).decode('utf-16-be', 'ignore')
+    for block in re.findall(rb'beginbfrange(.*?)endbfrange', data, re.S):
+        for lo, hi, dst in PDF_HEX_RANGE.findall(block):
+            width = len(lo) // 2
+            lo, hi = int(lo, 16), int(hi, 16)
+            if hi < lo or hi - lo > 0xFFFF:
+                continue
+            if dst.startswith(b'['):
+                targets = [bytes.fromhex(h.decode()).decode('utf-16-be', 'ignore')
+                           for h in re.findall(rb'<([0-9A-Fa-f]+)>', dst)]
+                for k, text in enumerate(targets[:hi - lo + 1]):
+                    cmap[(lo + k).to_bytes(width, 'big')] = text
+                continue
+            base = bytes.fromhex(dst[1:-1].decode()).decode('utf-16-be', 'ignore')
+            if not base:
+                continue
+            for k in range(hi - lo + 1):
+                cmap[(lo + k).to_bytes(width, 'big')] = base[:-1] + chr(min(0x10FFFF, ord(base[-1]) + k))
+
+
+def decode_pdf_string(raw, cmap):
+    """按 CMap（两字节或单字节编码）解码字符串，无法映射时按 latin-1"""
+    if cmap:
+        if len(raw) % 2 == 0:
+            codes = [raw[i:i + 2] for i in range(0, len(raw), 2)]
+            if all(code in cmap for code in codes):
+                return ''.join(cmap[code] for code in codes)
+        codes = [raw[i:i + 1] for i in range(len(raw))]
+        if all(code in cmap for code in codes):
+            return ''.join(cmap[code] for code in codes)
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', 'ignore')
+    return raw.decode('latin-1')
+
+
+def read_literal(content, i):
+    """读取从 content[i] == '(' 开始的字面字符串，返回 (字节, 结束位置)"""
+    out = bytearray()
+    depth = 1
+    i += 1
+    n = len(content)
+    while i < n:
+        c = content[i]
+        if c == 0x5C:  # 反斜杠
+            i += 1
+            if i >= n:
+                break
+            c = content[i]
+            if 0x30 <= c <= 0x37:
+                digits = content[i:i + 3]
+                m = re.match(rb'[0-7]{1,3}', digits)
+                out.append(int(m.group(), 8) & 0xFF)
+                i += len(m.group())
+                continue
+            if c in (0x0A, 0x0D):  # 续行
+                i += 1
+                continue
+            out += PDF_ESCAPES.get(c, bytes((c,)))
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), i + 1
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    return bytes(out), n
+
+
+def pdf_content_text(content, cmap):
+    """从页面内容流中提取文字显示操作（Tj / TJ / ' / "）的文本"""
+    pieces = []
+    pending = []
+    i = 0
+    n = len(content)
+    while i < n:
+        c = content[i]
+        if c == 0x28:  # (
+            raw, i = read_literal(content, i)
+            pending.append(decode_pdf_string(raw, cmap))
+        elif c == 0x3C and content[i + 1:i + 2] != b'<':  # <hex>
+            end = content.find(b'>', i)
+            if end < 0:
+                break
+            hex_text = re.sub(rb'\s', b'', content[i + 1:end])
+            if len(hex_text) % 2:
+                hex_text += b'0'
+            try:
+                pending.append(decode_pdf_string(bytes.fromhex(hex_text.decode()), cmap))
+            except ValueError:
+                pass
+            i = end + 1
+        elif c == 0x25:  # % 注释
+            end = content.find(b'\n', i)
+            i = n if end < 0 else end + 1
+        elif c in b'+-.0123456789':
+            m = PDF_NUMBER.match(content, i)
+            if m is None:
+                i += 1
+                continue
+            # TJ 数组中较大的负间距通常表示词间空格
+            if pending and float(m.group()) <= -250:
+                pending.append(' ')
+            i = m.end()
+        elif (0x41 <= c <= 0x5A) or (0x61 <= c <= 0x7A) or c in b'\'"*':
+            m = PDF_OPERATOR.match(content, i)
+            op = m.group()
+            i = m.end()
+            if op in (b'Tj', b'TJ', b"'", b'"'):
+                if op in (b"'", b'"'):
+                    pieces.append('\n')
+                pieces.extend(pending)
+            elif op in (b'T*', b'ET'):
+                pieces.append('\n')
+            elif op in (b'Td', b'TD', b'Tm'):
+                pieces.append(' ')
+            pending = []
+        else:
+            i += 1
+    return ''.join(pieces)
+
+
+def extract_pdf(path):
+    """pdf：提取文本层（不做OCR）
+
+    所有 ToUnicode CMap 合并为一张映射表使用，多数只嵌入一两种字体的中文
+    文档可以正确还原；扫描件和加密文档得不到文本。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    streams = list(pdf_streams(data))
+    cmap = {}
+    for stream in streams:
+        if b'begincmap' in stream:
+            parse_cmap(stream, cmap)
+    pieces = []
+    for stream in streams:
+        if b'begincmap' not in stream and b'BT' in stream:
+            pieces.append(pdf_content_text(stream, cmap))
+    return '\n'.join(pieces)
+
+
+# ---------- RTF ----------
+
+RTF_TOKEN = re.compile(rb"\\([a-zA-Z]+)(-?\d+)? ?|\\'([0-9a-fA-F]{2})|\\([^a-zA-Z])|([{}])|([^\\{}\r\n]+)|[\r\n]+")
+RTF_SKIP_DESTINATIONS = frozenset({
+    b'fonttbl', b'colortbl', b'stylesheet', b'info', b'pict', b'object', b'themedata',
+    b'colorschememapping', b'datastore', b'xmlnstbl', b'listtable', b'listoverridetable',
+    b'rsidtbl', b'generator', b'latentstyles', b'fldinst', b'header', b'footer'
+})
+RTF_SPECIALS = {b'par': '\n', b'line': '\n', b'tab': '\t', b'row': '\n', b'cell': '\t',
+                b'emdash': '\u2014', b'endash': '\u2013', b'bullet': '\u2022',
+                b'lquote': '\u2018', b'rquote': '\u2019', b'ldblquote': '\u201c', b'rdblquote': '\u201d'}
+
+
+def extract_rtf(path):
+    """rtf：去掉控制字和非正文组，按 \\ansicpg 代码页解码 \\'hh 字节"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    codepage = 'cp1252'
+    m = re.search(rb'\\ansicpg(\d+)', data[:4096])
+    if m:
+        codepage = f'cp{int(m.group(1))}'
+        try:
+            ''.encode(codepage)
+        except LookupError:
+            codepage = 'cp1252'
+
+    pieces = []
+    hex_bytes = bytearray()
+    stack = []
+    skip = False
+    uc = 1  # \uN 之后需要跳过的替代字符数
+    to_skip = 0
+    for m in RTF_TOKEN.finditer(data):
+        word, arg, hex_byte, symbol, brace, text = m.groups()
+        if hex_byte is None and hex_bytes:
+            if not skip:
+                pieces.append(hex_bytes.decode(codepage, 'ignore'))
+            hex_bytes.clear()
+
+        if brace == b'{':
+            stack.append((skip, uc))
+        elif brace == b'}':
+            if stack:
+                skip, uc = stack.pop()
+            to_skip = 0
+        elif word is not None:
+            if word in RTF_SKIP_DESTINATIONS:
+                skip = True
+            elif word == b'uc' and arg is not None:
+                uc = int(arg)
+            elif word == b'u' and arg is not None:
+                if not skip:
+                    code = int(arg)
+                    pieces.append(chr(code + 65536 if code < 0 else code))
+                to_skip = uc
+            elif not skip and word in RTF_SPECIALS:
+                pieces.append(RTF_SPECIALS[word])
+        elif hex_byte is not None:
+            if to_skip:
+                to_skip -= 1
+            else:
+                hex_bytes.append(int(hex_byte, 16))
+        elif symbol is not None:
+            if symbol == b'*':
+                skip = True
+            elif not skip and symbol in (b'\\', b'{', b'}'):
+                pieces.append(symbol.decode())
+            elif not skip and symbol == b'~':
+                pieces.append('\u00a0')
+        elif text is not None:
+            if to_skip:
+                skipped = min(to_skip, len(text))
+                text = text[skipped:]
+                to_skip -= skipped
+            if text and not skip:
+                pieces.append(text.decode(codepage, 'ignore'))
+    if hex_bytes and not skip:
+        pieces.append(hex_bytes.decode(codepage, 'ignore'))
+    return ''.join(pieces)
+
+
+# 扩展名 -> 提取函数。提取在工作进程中执行，自定义提取器需要在模块导入时注册
+EXTRACTORS = {
+    '.docx': extract_docx,
+    '.pdf': extract_pdf,
+    '.rtf': extract_rtf,
+}
+
+
+def register_extractor(ext, func):
+    """注册一种文档的提取函数 func(path) -> str"""
+    EXTRACTORS[ext.lower()] = func
+
+
+def limit_worker_memory(memory_limit):
+    """工作进程初始化：限制地址空间，超限的解析以 MemoryError 失败"""
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def on_time_limit(signum, frame):
+    raise TimeoutError("文档解析超时")
+
+
+def extract_to_file(path, target, time_limit):
+    """在工作进程中提取一个文档并写入缓存文件，返回缓存文件
+
+    解析出错时写入空文本，避免每次搜索都重新解析同一个坏文件；超时或内存
+    不足可能只是机器繁忙，不写缓存，返回None由主进程记录失败稍后重试。
+    """
+    timer = hasattr(signal, 'setitimer')
+    if timer:
+        signal.signal(signal.SIGALRM, on_time_limit)
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        text = EXTRACTORS[split_ext(os.path.basename(path))](path)[:MAX_TEXT_CHARS]
+    except (TimeoutError, MemoryError):
+        return None
+    except Exception:
+        text = ''
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    temp = target + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp, target)
+    return target
+
+
+class DocumentExtractor:
+    """文档文本提取和缓存
+
+    缓存文件名由路径摘要、修改时间和大小组成，文档变化后旧缓存在
+    写入新缓存时删除。提取出的文本统一为 UTF-8。
+    解析超时或内存不足的文档在缓存旁留下 .failed 标记，RETRY_FAILED 秒内
+    不再解析，之后重试。
+    cache_hits / extracted 累计直接使用缓存和提交提取的文档数。
+    """
+
+    TIME_LIMIT = 20  # 单个文档的解析时间上限（秒）
+    KILL_GRACE = 5  # 超过 TIME_LIMIT 这么多秒仍未完成时由主进程终止工作进程（没有 SIGALRM 的平台靠它限时）
+    MEMORY_LIMIT = 1024 * 1024 * 1024  # 工作进程的地址空间上限，仅在支持 RLIMIT_AS 的平台生效
+    MAX_DOCUMENT_BYTES = 200 * 1024 * 1024  # 超过此大小的文档不解析
+    RETRY_FAILED = 3600  # 解析超时或内存不足的文档多久后重试（秒）
+
+    def __init__(self, cache_dir=None, workers=None):
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(), 'extracts')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        self.pool = None
+        self.lock = threading.Lock()  # 计数器可能由多个搜索线程同时更新
+        self.cache_hits = 0
+        self.extracted = 0
+
+    def can_extract(self, name):
+        return split_ext(name) in EXTRACTORS
+
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            initializer=limit_worker_memory,
+                                            initargs=(self.MEMORY_LIMIT,))
+        return self.pool
+
+    def _cache_prefix(self, path):
+        key = os.path.abspath(path).encode('utf-8', 'surrogateescape')
+        return os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest())
+
+    def cache_path(self, path, stat):
+        return f"{self._cache_prefix(path)}_{stat.st_mtime_ns}_{stat.st_size}.txt"
+
+    @staticmethod
+    def failed_path(target):
+        return target[:-len('.txt')] + '.failed'
+
+    def _prepare(self, path):
+        """返回 (缓存文件, 是否已缓存)，文档过大、无法访问或最近解析失败时返回None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size > self.MAX_DOCUMENT_BYTES:
+            return None
+        target = self.cache_path(path, stat)
+        if os.path.exists(target):
+            return target, True
+        failed = self.failed_path(target)
+        try:
+            if time.time() - os.stat(failed).st_mtime < self.RETRY_FAILED:
+                return None
+        except OSError:
+            pass
+        # 删除同一文档旧版本的缓存和失败标记
+        prefix = glob.escape(self._cache_prefix(path))
+        for old in glob.glob(prefix + '_*.txt') + glob.glob(prefix + '_*.failed'):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        return target, False
+
+    def _mark_failed(self, target):
+        try:
+            with open(self.failed_path(target), 'w'):
+                pass
+        except OSError:
+            pass
+
+    def _submit(self, path, target):
+        try:
+            return self._get_pool().submit(extract_to_file, path, target, self.TIME_LIMIT)
+        except BrokenProcessPool:
+            self.pool = None
+            return self._get_pool().submit(extract_to_file, path, target, self.TIME_LIMIT)
+
+    def _kill_pool(self):
+        """终止所有工作进程：正在进行的解析无法在进程内打断时只能这样收回"""
+        pool, self.pool = self.pool, None
+        if pool is None:
+            return
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, paths, cancel=None):
+        """按完成顺序产出 (文档路径, 文本文件路径)，已缓存的文档立即产出
+
+        同时提交的文档不超过工作进程数，提交后即开始解析，超过
+        TIME_LIMIT + KILL_GRACE 秒未完成的由主进程终止。
+        """
+        in_flight = {}  # future -> (文档路径, 缓存文件, 提交时间)
+        try:
+            for path in paths:
+                if cancel is not None and cancel.cancelled:
+                    return
+                prepared = self._prepare(path)
+                if prepared is None:
+                    continue
+                target, cached = prepared
+                if cached:
+                    with self.lock:
+                        self.cache_hits += 1
+                    yield path, target
+                    continue
+                with self.lock:
+                    self.extracted += 1
+                in_flight[self._submit(path, target)] = (path, target, time.monotonic())
+                while len(in_flight) >= self.workers:
+                    if cancel is not None and cancel.cancelled:
+                        return
+                    yield from self._collect(in_flight, timeout=0.05)
+            while in_flight:
+                if cancel is not None and cancel.cancelled:
+                    return
+                yield from self._collect(in_flight, timeout=0.05)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def _collect(self, in_flight, timeout):
+        """产出已完成的文档，并终止超时的解析"""
+        done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, target, _ = in_flight.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                # 工作进程异常退出（例如被系统杀掉），下次使用时重建
+                self.pool = None
+                continue
+            except Exception:
+                continue
+            if result is None:
+                self._mark_failed(target)
+                continue
+            yield path, result
+
+        deadline = time.monotonic() - self.TIME_LIMIT - self.KILL_GRACE
+        expired = [future for future, (_, _, submitted) in in_flight.items() if submitted < deadline]
+        if not expired:
+            return
+        for future in expired:
+            self._mark_failed(in_flight.pop(future)[1])
+        self._kill_pool()
+        # 同一进程池中其余的文档随之中断，在新的进程池中重新提交
+        for future, (path, target, _) in list(in_flight.items()):
+            del in_flight[future]
+            in_flight[self._submit(path, target)] = (path, target, time.monotonic())
+
+    def shutdown(self, wait=False):
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
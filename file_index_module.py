@@ -0,0 +1,380 @@
+"""
+文件索引模块
+负责把目录中的文件名、路径、大小、修改时间和扩展名持久化到本地SQLite索引，
+文件名另建 FTS5 三元组（trigram）索引，子串查询无需扫描整张表；
+查询时直接读取索引，刷新时通过比较目录修改时间做增量更新
+"""
+import os
+import sqlite3
+import hashlib
+import time
+from contextlib import closing
+
+
+def get_cache_dir():
+    """获取（并创建）用户缓存目录"""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+        cache_dir = os.path.join(base, 'FloatingBall', 'cache')
+    elif hasattr(os, 'uname') and os.uname().sysname == 'Darwin':
+        cache_dir = os.path.expanduser('~/Library/Caches/FloatingBall')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        cache_dir = os.path.join(base, 'floating_ball')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def format_age(seconds):
+    """把秒数格式化为“N分钟前”之类的文字"""
+    if seconds is None:
+        return "尚未建立"
+    if seconds < 60:
+        return "刚刚"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} 分钟前"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} 小时前"
+    return f"{int(seconds // 86400)} 天前"
+
+
+def split_ext(name):
+    """取文件扩展名（小写，含点），比 Path.suffix 便宜"""
+    dot = name.rfind('.')
+    if dot <= 0:
+        return ''
+    return name[dot:].lower()
+
+
+class FileIndex:
+    """单个搜索根目录的持久化文件名索引
+
+    目录修改时间只在目录的直接子项增删改名时变化，所以增量刷新时
+    未变化目录下的文件行直接沿用，只重新列举变化过的目录。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            dir TEXT,
+            name TEXT,
+            name_lower TEXT,
+            size INTEGER,
+            mtime REAL,
+            ext TEXT
+        );
+        CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+    """
+
+    # 文件名的三元组索引，由触发器与 files 表保持同步；SQLite 不支持 FTS5 时不建立
+    NAME_FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+            name, content='files', content_rowid='rowid', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+            INSERT INTO files_fts(rowid, name) VALUES (new.rowid, new.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+            INSERT INTO files_fts(files_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE ON files BEGIN
+            INSERT INTO files_fts(files_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+            INSERT INTO files_fts(rowid, name) VALUES (new.rowid, new.name);
+        END;
+    """
+
+    TRIGRAM = 3  # 三元组索引只能查找不短于3个字符的子串
+    FETCH_SIZE = 1000  # 查询结果每次从游标取出的行数
+    SAMPLE_RANGES = 8  # estimate() 抽样的 rowid 段数
+    SAMPLE_SPAN = 2500  # 每段包含的 rowid 数
+
+    COMMIT_EVERY = 500  # 每处理多少个目录提交一次
+
+    def __init__(self, root, cache_dir=None):
+        self.root = os.path.abspath(root)
+        key = os.path.normcase(self.root).encode('utf-8', 'surrogateescape')
+        digest = hashlib.sha1(key).hexdigest()[:16]
+        self.db_path = os.path.join(cache_dir or get_cache_dir(), f"index_{digest}.sqlite")
+
+        with closing(self._connect()) as conn:
+            conn.executescript(self.SCHEMA)
+            conn.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('root', ?)", (self.root,))
+            conn.commit()
+            self.name_fts = self._ensure_name_fts(conn)
+
+    def _connect(self):
+        """每次操作使用独立连接，WAL模式下刷新和查询互不阻塞"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE 隐式删除的旧行也要触发删除触发器，三元组索引才能保持同步
+        conn.execute("PRAGMA recursive_triggers=ON")
+        return conn
+
+    def _ensure_name_fts(self, conn):
+        """建立文件名三元组索引，旧版本留下的索引库首次打开时按现有行重建"""
+        try:
+            conn.executescript(self.NAME_FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False  # SQLite 未编译 FTS5 或版本低于 3.34，查询退化为扫描
+        row = conn.execute("SELECT value FROM meta WHERE key='name_fts'").fetchone()
+        if row is None:
+            conn.execute("INSERT INTO files_fts(files_fts) VALUES ('rebuild')")
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('name_fts', '1')")
+            conn.commit()
+        return True
+
+    def updated_at(self):
+        """索引最后一次完整刷新的时间戳，未建立时返回None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key='updated_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def age(self):
+        """索引年龄（秒），未建立时返回None"""
+        updated = self.updated_at()
+        if updated is None:
+            return None
+        return max(0.0, time.time() - updated)
+
+    def is_built(self):
+        return self.updated_at() is not None
+
+    def scope_matches(self, fingerprint=''):
+        """索引是否按同样的排除规则（SearchScope.fingerprint）建立"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key='scope'").fetchone()
+        return (row[0] if row else '') == fingerprint
+
+    def refresh(self, progress=None, cancel=None, scan_filter=None):
+        """增量刷新索引，返回 (扫描目录数, 重新列举的目录数)
+
+        progress(已检查目录数, 已重新列举目录数) 会被周期性调用。
+        cancel 被取消时提前返回，已处理的目录保留，索引时间不更新。
+        scan_filter（search_scope_module.ScanFilter）排除的子树从索引中删除，
+        已经从其他路径进入过的目录（绑定挂载等）同样不收录。
+        """
+        checked = 0
+        rescanned = 0
+        fingerprint = scan_filter.fingerprint if scan_filter is not None else ''
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key='scope'").fetchone()
+            if (row[0] if row else '') != fingerprint:
+                # 排除规则变化：之前被排除的子目录没有登记，所有目录都要重新列举
+                conn.execute("UPDATE dirs SET mtime=-1")
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('scope', ?)", (fingerprint,))
+                conn.commit()
+
+            stack = [(self.root, None)]
+            while stack:
+                if cancel is not None and cancel.cancelled:
+                    conn.commit()
+                    return checked, rescanned
+                dir_path, parent = stack.pop()
+                if scan_filter is not None and parent is not None and not scan_filter.keep_dir(dir_path):
+                    self._delete_subtree(conn, dir_path)
+                    continue
+                try:
+                    st = os.stat(dir_path)
+                except OSError:
+                    self._delete_subtree(conn, dir_path)
+                    continue
+                if scan_filter is not None and not scan_filter.enter(dir_path, st):
+                    self._delete_subtree(conn, dir_path)
+                    continue
+                mtime = st.st_mtime_ns
+
+                checked += 1
+                row = conn.execute("SELECT mtime FROM dirs WHERE path=?", (dir_path,)).fetchone()
+                if row is not None and row[0] == mtime:
+                    # 目录未变化，沿用已知的子目录继续向下检查
+                    for (sub,) in conn.execute("SELECT path FROM dirs WHERE parent=?", (dir_path,)):
+                        stack.append((sub, dir_path))
+                else:
+                    rescanned += 1
+                    for sub in self._rescan_dir(conn, dir_path, parent, mtime, scan_filter):
+                        stack.append((sub, dir_path))
+
+                if checked % self.COMMIT_EVERY == 0:
+                    conn.commit()
+                    if progress:
+                        progress(checked, rescanned)
+
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('updated_at', ?)",
+                         (str(time.time()),))
+            conn.commit()
+
+        if progress:
+            progress(checked, rescanned)
+        return checked, rescanned
+
+    def _rescan_dir(self, conn, dir_path, parent, mtime, scan_filter=None):
+        """重新列举一个目录，更新其文件行和子目录行，返回子目录列表"""
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if scan_filter is None or scan_filter.keep_dir(entry.path):
+                                subdirs.append(entry.path)
+                        elif entry.is_file():
+                            if scan_filter is not None and not scan_filter.keep_file(entry.path):
+                                continue
+                            st = entry.stat()
+                            files.append((entry.path, dir_path, entry.name, entry.name.lower(),
+                                          st.st_size, st.st_mtime, split_ext(entry.name)))
+                    except OSError:
+                        continue
+        except OSError:
+            subdirs = []
+
+        conn.execute("DELETE FROM files WHERE dir=?", (dir_path,))
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files)
+
+        # 清理已经消失的子目录
+        known = {p for (p,) in conn.execute("SELECT path FROM dirs WHERE parent=?", (dir_path,))}
+        for gone in known.difference(subdirs):
+            self._delete_subtree(conn, gone)
+        # 新出现的子目录以 mtime=-1 登记，保证随后会被列举
+        conn.executemany("INSERT OR IGNORE INTO dirs(path, parent, mtime) VALUES (?, ?, -1)",
+                         [(sub, dir_path) for sub in subdirs])
+
+        conn.execute("INSERT OR REPLACE INTO dirs(path, parent, mtime) VALUES (?, ?, ?)",
+                     (dir_path, parent, mtime))
+        return subdirs
+
+    def _delete_subtree(self, conn, dir_path):
+        """删除某个目录及其所有子孙目录的索引记录"""
+        prefix = dir_path.rstrip(os.sep) + os.sep
+        # 利用前缀范围查询，避免LIKE的转义问题
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        conn.execute("DELETE FROM files WHERE dir=? OR (dir>=? AND dir<?)", (dir_path, prefix, upper))
+        conn.execute("DELETE FROM dirs WHERE path=? OR (path>=? AND path<?)", (dir_path, prefix, upper))
+
+    def apply_events(self, events, scan_filter=None):
+        """把文件监视事件（fs_watch_module.FsEvent）增量应用到索引
+
+        事件应当已经按 scan_filter 过滤，新出现的目录树在列举时按它剪枝。
+        """
+        with closing(self._connect()) as conn:
+            for event in events:
+                if event.kind in ('deleted', 'moved'):
+                    if event.is_dir:
+                        self._delete_subtree(conn, event.path)
+                    else:
+                        conn.execute("DELETE FROM files WHERE path=?", (event.path,))
+                if event.kind in ('created', 'modified', 'moved'):
+                    target = event.dest if event.kind == 'moved' else event.path
+                    if event.is_dir:
+                        self._index_subtree(conn, target, scan_filter)
+                    else:
+                        self._upsert_file(conn, target)
+            conn.commit()
+
+    def _upsert_file(self, conn, path):
+        """更新单个文件的索引行，文件已不存在时删除"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            conn.execute("DELETE FROM files WHERE path=?", (path,))
+            return
+        name = os.path.basename(path)
+        conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (path, os.path.dirname(path), name, name.lower(),
+                      st.st_size, st.st_mtime, split_ext(name)))
+
+    def _index_subtree(self, conn, dir_path, scan_filter=None):
+        """完整列举一个新出现的目录树"""
+        stack = [(dir_path, os.path.dirname(dir_path))]
+        while stack:
+            path, parent = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            for sub in self._rescan_dir(conn, path, parent, mtime, scan_filter):
+                stack.append((sub, path))
+
+    def file_count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def paths(self):
+        """返回索引中的全部文件路径"""
+        with closing(self._connect()) as conn:
+            return [path for (path,) in conn.execute("SELECT path FROM files")]
+
+    def _name_filter(self, keyword, case_sensitive, extensions):
+        """query() 和 estimate() 共用的查询条件，返回 (FROM 及 WHERE 子句, 参数, 排序所依据的 rowid 列)"""
+        column = 'name' if case_sensitive else 'name_lower'
+        needle = keyword if case_sensitive else keyword.lower()
+        if self.name_fts and len(keyword) >= self.TRIGRAM:
+            # 三元组索引本身不区分大小写，精确比较由 instr 完成
+            clause = ("FROM files_fts JOIN files f ON f.rowid = files_fts.rowid "
+                      f"WHERE files_fts MATCH ? AND instr(f.{column}, ?) > 0")
+            params = ['"' + keyword.replace('"', '""') + '"', needle]
+            rowid = 'files_fts.rowid'
+        elif keyword:
+            clause = f"FROM files f WHERE instr(f.{column}, ?) > 0"
+            params = [needle]
+            rowid = 'f.rowid'
+        else:
+            clause = "FROM files f WHERE 1"
+            params = []
+            rowid = 'f.rowid'
+        if extensions is not None:
+            exts = sorted(extensions)
+            clause += f" AND f.ext IN ({','.join('?' * len(exts))})"
+            params.extend(exts)
+        return clause, params, rowid
+
+    def query(self, keyword, case_sensitive=False, extensions=None):
+        """按文件名关键词查询，逐行产出 (name, path, size, mtime)
+
+        关键词不短于3个字符时先由三元组索引找出候选行，再精确比较子串；
+        更短的关键词只能逐行扫描。结果通过游标分批读取，不在内存中攒成列表。
+        extensions 为扩展名集合（小写含点）时只返回这些类型的文件。
+        """
+        if extensions is not None and not extensions:
+            return
+        clause, params, _ = self._name_filter(keyword, case_sensitive, extensions)
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(f"SELECT f.name, f.path, f.size, f.mtime {clause}", params)
+            while True:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+                if not rows:
+                    return
+                yield from rows
+
+    def estimate(self, keyword, case_sensitive=False, extensions=None):
+        """估计 query() 返回的行数，不读取全部结果
+
+        只在均匀分布的 SAMPLE_RANGES 段 rowid 中计数，再按 rowid 范围放大；
+        索引不大时直接精确计数。
+        """
+        if extensions is not None and not extensions:
+            return 0
+        clause, params, rowid = self._name_filter(keyword, case_sensitive, extensions)
+        span = self.SAMPLE_RANGES * self.SAMPLE_SPAN
+        with closing(self._connect()) as conn:
+            last = conn.execute("SELECT max(rowid) FROM files").fetchone()[0] or 0
+            if last <= span:
+                return conn.execute(f"SELECT count(*) {clause}", params).fetchone()[0]
+            sql = f"SELECT count(*) {clause} AND {rowid} BETWEEN ? AND ?"
+            step = last // self.SAMPLE_RANGES
+            found = 0
+            for start in range(1, step * self.SAMPLE_RANGES, step):
+                found += conn.execute(sql, params + [start, start + self.SAMPLE_SPAN - 1]).fetchone()[0]
+        return round(found * last / span)
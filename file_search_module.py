@@ -1,15 +1,38 @@
 """
 文件搜索模块
-负责在指定目录中搜索文件名和文件内容
+负责检索窗口的界面：收集搜索设置、显示和实时更新结果，
+实际的搜索和索引维护由 search_engine_module.SearchEngine 完成
 """
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
+import queue
 import os
 import time
-from pathlib import Path
+import functools
+from result_view_module import Hit, ResultStore, VirtualResultList
+from file_index_module import format_age
+from file_walker_module import CancelToken, DEFAULT_WORKERS
+from query_module import CompiledQuery, QueryError
+from fs_watch_module import DirectoryWatcher, native_watch_available
+from ranking_module import Scorer, RankedResults
+from search_scope_module import SearchScope, DEFAULT_EXCLUDES
+from result_export_module import export_results, load_result_set, EXPORT_FORMATS, RESULT_SET_EXT
+from search_engine_module import SearchEngine, FILE_TYPES
+from search_stats_module import SearchStats, default_log_path
+
 
 class SearchWindow:
+    DRAIN_BUDGET = 0.008  # 每次取结果最多占用主循环的时间（秒）
+    DRAIN_INTERVAL_MS = 16  # 取结果的间隔（毫秒）
+    CONTENT_MODES = {"进程池": 'process', "线程池": 'thread', "单线程": 'inline'}
+    RESULT_LIMIT = 1000  # 只保留并显示相关度最高的结果数
+    NARROW_KEEP = 200000  # 完整保留不超过此数量的匹配结果，供边输入边搜索时缩小范围
+    TYPEAHEAD_DELAY_MS = 150  # 停止输入多久后开始搜索
+    TYPEAHEAD_MIN_CHARS = 2
+    INDEX_MAX_AGE = 300  # 未实时监视时，索引早于此秒数就在搜索前按目录修改时间增量刷新
+    TYPEAHEAD_PREVIEW = 2000  # 边输入边搜索先判断这么多行就估计匹配数，其余的行在后台继续
+    
     def __init__(self):
         self.window = tk.Toplevel()
         self.window.title("智能检索")
@@ -17,8 +40,28 @@ class SearchWindow:
         self.window.attributes('-alpha', 0.95)
         self.window.configure(bg='#ECF0F1')
         
-        self.search_directory = ""
-        self.search_results = []
+        self.search_directories = []
+        self.exclude_text = DEFAULT_EXCLUDES
+        self.skip_network = True
+        self.scope = SearchScope([])  # 根目录和排除规则，修改后整体替换
+        self.search_results = ResultStore(self.RESULT_LIMIT)
+        self.ranked_results = None
+        self.result_queue = None
+        self.search_token = None
+        self.refresh_token = None
+        self.drain_job = None
+        self.engine = SearchEngine()
+        self.index_label_job = None
+        self.watchers = []
+        self.live_query = None  # 已完成搜索的条件，用于把文件变化应用到结果列表
+        self.pending_live_query = None
+        self.narrow_base = None  # (上一次完成的搜索条件, 其全部匹配结果)
+        self.loaded_results = None  # 载入的结果集，之后的搜索只在其中筛选
+        self.search_stats = None  # 最近一次搜索的统计数据
+        self.match_estimate = None  # 搜索完成前估计的匹配数
+        self.search_quiet = False  # 当前搜索是否由边输入边搜索发起
+        self.typeahead_job = None
+        self.typeahead_text = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -52,6 +95,27 @@ class SearchWindow:
                                   relief='flat', cursor='hand2')
         select_dir_btn.pack(side='right')
         
+        add_dir_btn = tk.Button(dir_select_frame, text="添加目录",
+                               command=self.add_directory,
+                               bg='#3498DB', fg='white',
+                               font=('微软雅黑', 10),
+                               relief='flat', cursor='hand2')
+        add_dir_btn.pack(side='right', padx=(0, 10))
+        
+        exclude_btn = tk.Button(dir_select_frame, text="排除规则",
+                               command=self.edit_excludes,
+                               bg='#7F8C8D', fg='white',
+                               font=('微软雅黑', 10),
+                               relief='flat', cursor='hand2')
+        exclude_btn.pack(side='right', padx=(0, 10))
+        
+        refresh_index_btn = tk.Button(dir_select_frame, text="更新索引",
+                                     command=self.refresh_index,
+                                     bg='#8E44AD', fg='white',
+                                     font=('微软雅黑', 10),
+                                     relief='flat', cursor='hand2')
+        refresh_index_btn.pack(side='right', padx=(0, 10))
+        
         # 搜索区域
         search_frame = tk.Frame(self.window, bg='#ECF0F1')
         search_frame.pack(pady=10, padx=20, fill='x')
@@ -68,6 +132,7 @@ class SearchWindow:
                                    relief='flat', bd=5)
         self.search_entry.pack(side='left', fill='x', expand=True, padx=(0, 10))
         self.search_entry.bind('<Return>', self.perform_search)
+        self.search_entry.bind('<KeyRelease>', self.on_search_key)
         
         search_btn = tk.Button(search_input_frame, text="搜索",
                              command=self.perform_search,
@@ -76,6 +141,18 @@ class SearchWindow:
                              relief='flat', cursor='hand2')
         search_btn.pack(side='right')
         
+        stop_btn = tk.Button(search_input_frame, text="停止",
+                           command=self.stop_search,
+                           bg='#E74C3C', fg='white',
+                           font=('微软雅黑', 12),
+                           relief='flat', cursor='hand2')
+        stop_btn.pack(side='right', padx=(0, 10))
+        
+        tk.Label(search_frame,
+                text='支持 AND / OR / NOT、"短语"、*.py、/正则/、name: content: ext:py size:>10MB modified:<7d',
+                font=('微软雅黑', 8),
+                bg='#ECF0F1', fg='#95A5A6').pack(anchor='w')
+        
         # 搜索选项
         option_frame = tk.Frame(self.window, bg='#ECF0F1')
         option_frame.pack(pady=5, padx=20, fill='x')
@@ -83,6 +160,10 @@ class SearchWindow:
         self.search_filename = tk.BooleanVar(value=True)
         self.search_content = tk.BooleanVar(value=False)
         self.case_sensitive = tk.BooleanVar(value=False)
+        self.use_index = tk.BooleanVar(value=True)
+        # 没有系统通知时只能反复遍历整个目录树，默认关闭，需要时手动开启
+        self.live_watch = tk.BooleanVar(value=native_watch_available())
+        self.typeahead = tk.BooleanVar(value=True)
         
         tk.Checkbutton(option_frame, text="搜索文件名",
                       variable=self.search_filename,
@@ -96,6 +177,19 @@ class SearchWindow:
                       variable=self.case_sensitive,
                       bg='#ECF0F1', font=('微软雅黑', 10)).pack(side='left', padx=(20, 0))
         
+        tk.Checkbutton(option_frame, text="使用索引",
+                      variable=self.use_index,
+                      bg='#ECF0F1', font=('微软雅黑', 10)).pack(side='left', padx=(20, 0))
+        
+        tk.Checkbutton(option_frame, text="实时更新",
+                      variable=self.live_watch,
+                      command=self.restart_watcher,
+                      bg='#ECF0F1', font=('微软雅黑', 10)).pack(side='left', padx=(20, 0))
+        
+        tk.Checkbutton(option_frame, text="边输入边搜索",
+                      variable=self.typeahead,
+                      bg='#ECF0F1', font=('微软雅黑', 10)).pack(side='left', padx=(20, 0))
+        
         # 文件类型过滤
         filter_frame = tk.Frame(self.window, bg='#ECF0F1')
         filter_frame.pack(pady=5, padx=20, fill='x')
@@ -111,6 +205,24 @@ class SearchWindow:
                                       state="readonly", width=20)
         file_type_combo.pack(side='left', padx=(10, 0))
         
+        tk.Label(filter_frame, text="并发数:", 
+                font=('微软雅黑', 10),
+                bg='#ECF0F1', fg='#2C3E50').pack(side='left', padx=(20, 0))
+        
+        self.walk_workers = tk.IntVar(value=DEFAULT_WORKERS)
+        tk.Spinbox(filter_frame, from_=1, to=64, width=4,
+                  textvariable=self.walk_workers,
+                  font=('微软雅黑', 10)).pack(side='left', padx=(10, 0))
+        
+        tk.Label(filter_frame, text="内容匹配:", 
+                font=('微软雅黑', 10),
+                bg='#ECF0F1', fg='#2C3E50').pack(side='left', padx=(20, 0))
+        
+        self.content_mode_var = tk.StringVar(value="进程池")
+        ttk.Combobox(filter_frame, textvariable=self.content_mode_var,
+                    values=list(self.CONTENT_MODES),
+                    state="readonly", width=8).pack(side='left', padx=(10, 0))
+        
         # 进度条和状态
         status_frame = tk.Frame(self.window, bg='#ECF0F1')
         status_frame.pack(pady=5, padx=20, fill='x')
@@ -121,6 +233,31 @@ class SearchWindow:
                                     font=('微软雅黑', 9))
         self.status_label.pack(side='left')
         
+        self.index_label = tk.Label(status_frame, text="",
+                                   bg='#ECF0F1', fg='#7F8C8D',
+                                   font=('微软雅黑', 9))
+        self.index_label.pack(side='right')
+        
+        self.stats_toggle = tk.Button(status_frame, text="统计 ▸",
+                                     command=self.toggle_stats,
+                                     bg='#ECF0F1', fg='#7F8C8D',
+                                     font=('微软雅黑', 9),
+                                     relief='flat', bd=0, cursor='hand2')
+        self.stats_toggle.pack(side='right', padx=(0, 10))
+        
+        # 统计面板，默认折叠
+        self.status_frame = status_frame
+        self.stats_frame = tk.Frame(self.window, bg='#ECF0F1')
+        self.stats_label = tk.Label(self.stats_frame, text="尚无搜索统计",
+                                   justify='left', anchor='w',
+                                   bg='white', fg='#2C3E50',
+                                   font=('Consolas', 9))
+        self.stats_label.pack(fill='x')
+        self.log_stats = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.stats_frame, text=f"记录到统计日志（{default_log_path()}）",
+                      variable=self.log_stats,
+                      bg='#ECF0F1', font=('微软雅黑', 9)).pack(anchor='w')
+        
         # 结果显示区域
         result_frame = tk.Frame(self.window, bg='#ECF0F1')
         result_frame.pack(pady=10, padx=20, fill='both', expand=True)
@@ -137,32 +274,25 @@ class SearchWindow:
                                           bg='#ECF0F1', fg='#7F8C8D')
         self.result_count_label.pack(side='right')
         
-        # 创建树形视图显示结果
-        tree_frame = tk.Frame(result_frame)
-        tree_frame.pack(fill='both', expand=True)
-        
-        columns = ('文件名', '路径', '大小', '修改时间', '类型')
-        self.result_tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
-        
-        # 设置列标题和宽度
-        column_widths = {'文件名': 200, '路径': 250, '大小': 80, '修改时间': 120, '类型': 60}
-        for col in columns:
-            self.result_tree.heading(col, text=col, command=lambda c=col: self.sort_results(c))
-            self.result_tree.column(col, width=column_widths[col])
-        
-        # 添加滚动条
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=self.result_tree.yview)
-        h_scrollbar = ttk.Scrollbar(tree_frame, orient='horizontal', command=self.result_tree.xview)
-        
-        self.result_tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # 布局
-        self.result_tree.grid(row=0, column=0, sticky='nsew')
-        v_scrollbar.grid(row=0, column=1, sticky='ns')
-        h_scrollbar.grid(row=1, column=0, sticky='ew')
-        
-        tree_frame.grid_rowconfigure(0, weight=1)
-        tree_frame.grid_columnconfigure(0, weight=1)
+        tk.Button(result_header, text="载入",
+                 command=self.load_results,
+                 bg='#95A5A6', fg='white',
+                 font=('微软雅黑', 9),
+                 relief='flat', cursor='hand2').pack(side='left', padx=(10, 0))
+        
+        tk.Button(result_header, text="导出",
+                 command=self.export_results,
+                 bg='#95A5A6', fg='white',
+                 font=('微软雅黑', 9),
+                 relief='flat', cursor='hand2').pack(side='left', padx=(5, 0))
+        
+        # 虚拟结果列表：只为可见行创建控件，结果再多内存也保持平稳
+        columns = ('文件名', '路径', '大小', '修改时间', '类型', '相关度')
+        column_widths = {'文件名': 200, '路径': 250, '大小': 80, '修改时间': 120, '类型': 60, '相关度': 60}
+        self.result_list = VirtualResultList(result_frame, columns, column_widths,
+                                             on_sort=self.sort_results)
+        self.result_list.pack(fill='both', expand=True)
+        self.result_tree = self.result_list.tree
         
         # 右键菜单
         self.context_menu = tk.Menu(self.window, tearoff=0)
@@ -180,263 +310,527 @@ class SearchWindow:
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
     
     def select_directory(self):
-        """选择搜索目录"""
+        """选择搜索目录，取代已选择的全部目录"""
         directory = filedialog.askdirectory(title="选择搜索目录")
         if directory:
-            self.search_directory = directory
-            self.dir_label.config(text=directory)
+            self.search_directories = [directory]
+            self.update_scope()
             self.status_label.config(text=f"已选择目录: {os.path.basename(directory)}")
     
-    def perform_search(self, event=None):
-        """执行搜索"""
-        if not self.search_directory:
+    def add_directory(self):
+        """添加一个搜索目录，与已选择的目录一起搜索"""
+        directory = filedialog.askdirectory(title="添加搜索目录")
+        if directory:
+            self.search_directories.append(directory)
+            self.update_scope()
+            self.status_label.config(text=f"已添加目录: {os.path.basename(directory)}，"
+                                          f"共 {len(self.scope.roots)} 个")
+    
+    def edit_excludes(self):
+        """编辑排除规则（gitignore 语法）"""
+        dialog = tk.Toplevel(self.window)
+        dialog.title("排除规则")
+        dialog.geometry("420x360")
+        dialog.configure(bg='#ECF0F1')
+        dialog.transient(self.window)
+        
+        tk.Label(dialog, text="被排除的目录不会被遍历、索引或监视:",
+                font=('微软雅黑', 10),
+                bg='#ECF0F1', fg='#2C3E50').pack(anchor='w', padx=10, pady=(10, 5))
+        
+        text = tk.Text(dialog, font=('Consolas', 10), relief='flat', height=12)
+        text.pack(fill='both', expand=True, padx=10)
+        text.insert('1.0', self.exclude_text)
+        
+        skip_network = tk.BooleanVar(value=self.skip_network)
+        tk.Checkbutton(dialog, text="跳过网络驱动器（NFS、SMB 等挂载点）",
+                      variable=skip_network,
+                      bg='#ECF0F1', font=('微软雅黑', 10)).pack(anchor='w', padx=10, pady=5)
+        
+        def save():
+            self.exclude_text = text.get('1.0', 'end-1c')
+            self.skip_network = skip_network.get()
+            dialog.destroy()
+            self.update_scope()
+            self.status_label.config(text="排除规则已更新，下次搜索时生效")
+        
+        def reset():
+            text.delete('1.0', 'end')
+            text.insert('1.0', DEFAULT_EXCLUDES)
+        
+        button_frame = tk.Frame(dialog, bg='#ECF0F1')
+        button_frame.pack(fill='x', padx=10, pady=(0, 10))
+        tk.Button(button_frame, text="保存", command=save,
+                 bg='#27AE60', fg='white', font=('微软雅黑', 10),
+                 relief='flat', cursor='hand2').pack(side='right')
+        tk.Button(button_frame, text="恢复默认", command=reset,
+                 bg='#95A5A6', fg='white', font=('微软雅黑', 10),
+                 relief='flat', cursor='hand2').pack(side='right', padx=(0, 10))
+    
+    def update_scope(self):
+        """目录或排除规则变化后重建搜索范围；已完成的搜索结果不再实时更新"""
+        self.scope = SearchScope(self.search_directories, self.exclude_text, self.skip_network)
+        self.search_directories = list(self.scope.roots)
+        self.dir_label.config(text=self.scope.label())
+        self.live_query = None
+        self.narrow_base = None
+        self.loaded_results = None
+        self.update_index_label()
+        self.restart_watcher()
+    
+    def restart_watcher(self):
+        """按当前目录和“实时更新”选项重新启动文件监视，每个根目录一个监视线程"""
+        for watcher in self.watchers:
+            watcher.stop()
+        self.watchers = []
+        if self.scope and self.live_watch.get():
+            for root in self.scope.roots:
+                watcher = DirectoryWatcher(root, functools.partial(self.on_fs_events, root),
+                                           scope=self.scope, on_status=self.post_status)
+                watcher.start()
+                self.watchers.append(watcher)
+    
+    def on_fs_events(self, root, events):
+        """文件监视线程回调：增量更新 root 的索引和当前显示的结果"""
+        # 上一次的完整结果已过时，之后的输入不能再在其中缩小范围
+        self.narrow_base = None
+        if any(event.kind == 'overflow' for event in events):
+            # 事件丢失，只能整体增量刷新索引
+            self.window.after(0, self.refresh_index)
+            events = [event for event in events if event.kind != 'overflow']
+        
+        try:
+            self.engine.apply_events(self.scope, root, events)
+        except Exception as e:
+            self.post_status(f"实时更新索引失败：{e}")
+        
+        live = self.live_query
+        if live is None:
+            return
+        
+        removed = set()
+        removed_dirs = []
+        upserts = []
+        for event in events:
+            if event.kind in ('deleted', 'moved'):
+                if event.is_dir:
+                    removed_dirs.append(event.path)
+                else:
+                    removed.add(event.path)
+            if event.kind in ('created', 'modified', 'moved') and not event.is_dir:
+                target = event.dest if event.kind == 'moved' else event.path
+                hit = self.engine.evaluate(live, target)
+                if hit is None:
+                    removed.add(target)
+                else:
+                    removed.discard(target)
+                    upserts.append(hit)
+        
+        if removed or removed_dirs or upserts:
+            self.window.after(0, lambda: self.apply_result_changes(live, removed, removed_dirs, upserts))
+    
+    def apply_result_changes(self, live, removed, removed_dirs, upserts):
+        """在主线程中把文件变化应用到结果列表"""
+        if live is not self.live_query:
+            return
+        self.search_results.remove(removed, removed_dirs)
+        scorer = self.ranked_results.scorer
+        for hit in upserts:
+            self.search_results.upsert(hit._replace(score=scorer(hit)))
+        self.result_list.refresh()
+        self.update_result_count("找到")
+    
+    def update_index_label(self):
+        """刷新索引年龄显示，每30秒自动更新一次"""
+        if self.index_label_job is not None:
+            self.window.after_cancel(self.index_label_job)
+            self.index_label_job = None
+        
+        if not self.scope:
+            self.index_label.config(text="")
+            return
+        
+        try:
+            # 多个根目录时显示最旧的索引
+            age = self.engine.index_age(self.scope)
+            self.index_label.config(text=f"索引: {format_age(age)}")
+        except Exception:
+            self.index_label.config(text="索引不可用")
+        
+        self.index_label_job = self.window.after(30000, self.update_index_label)
+    
+    def refresh_index(self):
+        """手动增量更新索引"""
+        if not self.scope:
             messagebox.showwarning("提示", "请先选择搜索目录")
             return
+        if self.engine.index_refreshing:
+            return
+        
+        scope = self.scope
+        update_content = self.search_content.get()
+        token = CancelToken()
+        self.refresh_token = token
+        self.progress.pack(side='right', padx=(10, 0))
+        self.progress.start()
+        
+        def refresh():
+            try:
+                checked, rescanned = self.engine.build_index(scope, token, self.post_status)
+                # 内容索引只在已建立过或当前需要内容搜索时更新
+                if update_content or self.engine.content_index_built(scope):
+                    self.engine.build_content_index(scope, token, self.post_status)
+                if token.cancelled:
+                    return
+                self.window.after(0, lambda: self.on_index_refreshed(checked, rescanned))
+            except Exception as e:
+                error = str(e)
+                self.window.after(0, lambda: self.show_error(error))
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def on_index_refreshed(self, checked, rescanned):
+        """索引更新完成"""
+        self.refresh_token = None
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.status_label.config(text=f"索引已更新，检查 {checked} 个目录，重新扫描 {rescanned} 个")
+        self.update_index_label()
+    
+    def on_search_key(self, event):
+        """输入框按键：停止输入 TYPEAHEAD_DELAY_MS 毫秒后自动搜索"""
+        if event.keysym == 'Return' or not self.typeahead.get():
+            return
+        if self.typeahead_job is not None:
+            self.window.after_cancel(self.typeahead_job)
+        self.typeahead_job = self.window.after(self.TYPEAHEAD_DELAY_MS, self.run_typeahead)
+    
+    def run_typeahead(self):
+        """边输入边搜索：输入未变化、过短或语句尚不完整时不搜索"""
+        self.typeahead_job = None
+        keyword = self.search_entry.get().strip()
+        if (not self.scope or keyword == self.typeahead_text
+                or len(keyword) < self.TYPEAHEAD_MIN_CHARS):
+            return
+        self.perform_search(quiet=True)
+    
+    def perform_search(self, event=None, quiet=False):
+        """执行搜索；quiet 为真时（边输入边搜索）不弹出提示"""
+        if not self.scope:
+            if not quiet:
+                messagebox.showwarning("提示", "请先选择搜索目录")
+            return
         
         keyword = self.search_entry.get().strip()
         if not keyword:
-            messagebox.showwarning("提示", "请输入搜索关键词")
+            if not quiet:
+                messagebox.showwarning("提示", "请输入搜索关键词")
             return
         
-        # 清空之前的结果
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
+        try:
+            query = CompiledQuery(keyword,
+                                  case_sensitive=self.case_sensitive.get(),
+                                  search_filename=self.search_filename.get(),
+                                  search_content=self.search_content.get())
+        except QueryError as e:
+            if not quiet:
+                messagebox.showwarning("查询语句有误", str(e))
+            return
+        self.typeahead_text = keyword
         
-        self.search_results.clear()
+        try:
+            workers = max(1, self.walk_workers.get())
+        except tk.TclError:
+            workers = DEFAULT_WORKERS
+        plan = self.engine.plan(self.scope, query, FILE_TYPES.get(self.file_type_var.get()), workers)
+        
+        # 新的搜索会取代仍在进行的旧搜索
+        self.cancel_search()
+        token = CancelToken()
+        self.search_token = token
+        self.search_quiet = quiet
+        self.live_query = None
+        self.pending_live_query = plan
+        
+        # 清空之前的结果
+        self.search_results = ResultStore(self.RESULT_LIMIT)
+        self.result_list.set_store(self.search_results)
+        self.result_count_label.config(text="")
+        self.match_estimate = None
+        
+        # 每次搜索使用独立的结果队列，由Tk主循环分批取出显示；
+        # 搜索线程先按相关度过滤，只送出可能进入前 RESULT_LIMIT 名的结果
+        self.result_queue = queue.Queue()
+        results = RankedResults(self.result_queue, Scorer(query, plan.scope.roots),
+                                self.RESULT_LIMIT, self.NARROW_KEEP)
+        self.ranked_results = results
+        if self.drain_job is not None:
+            self.window.after_cancel(self.drain_job)
+        self.drain_job = self.window.after(self.DRAIN_INTERVAL_MS, self.drain_results)
         
         # 显示进度条
         self.progress.pack(side='right', padx=(10, 0))
         self.progress.start()
         self.status_label.config(text="搜索中...")
         
-        def search():
-            try:
-                results = []
-                file_count = 0
-                
-                for root, dirs, files in os.walk(self.search_directory):
-                    for file in files:
-                        file_count += 1
-                        if file_count % 100 == 0:  # 每处理100个文件更新状态
-                            self.window.after(0, lambda: self.status_label.config(text=f"已扫描 {file_count} 个文件..."))
-                        
-                        file_path = os.path.join(root, file)
-                        
-                        # 文件类型过滤
-                        if not self.match_file_type(file_path):
-                            continue
-                        
-                        match_found = False
-                        match_reason = ""
-                        
-                        # 搜索文件名
-                        if self.search_filename.get():
-                            if self.match_text(file, keyword):
-                                match_found = True
-                                match_reason = "文件名匹配"
-                        
-                        # 搜索文件内容
-                        if not match_found and self.search_content.get():
-                            if self.is_text_file(file_path) and self.search_in_file(file_path, keyword):
-                                match_found = True
-                                match_reason = "内容匹配"
-                        
-                        if match_found:
-                            file_info = self.get_file_info(file_path)
-                            file_info['match_reason'] = match_reason
-                            results.append(file_info)
-                
-                self.search_results = results
-                self.window.after(0, lambda: self.show_results(results, file_count))
-                
-            except Exception as e:
-                self.window.after(0, lambda: self.show_error(str(e)))
-        
-        threading.Thread(target=search, daemon=True).start()
-    
-    def match_file_type(self, file_path):
-        """检查文件类型是否匹配过滤条件"""
-        file_type = self.file_type_var.get()
-        if file_type == "所有文件":
-            return True
-        
-        ext = Path(file_path).suffix.lower()
-        type_mapping = {
-            "文本文件(.txt)": ['.txt'],
-            "文档文件(.doc,.docx,.pdf)": ['.doc', '.docx', '.pdf', '.rtf'],
-            "图片文件(.jpg,.png,.gif)": ['.jpg', '.jpeg', '.png', '.gif', '.bmp'],
-            "音频文件(.mp3,.wav)": ['.mp3', '.wav', '.flac', '.aac'],
-            "视频文件(.mp4,.avi)": ['.mp4', '.avi', '.mov', '.mkv']
-        }
-        
-        return ext in type_mapping.get(file_type, [])
-    
-    def match_text(self, text, keyword):
-        """文本匹配"""
-        if self.case_sensitive.get():
-            return keyword in text
-        else:
-            return keyword.lower() in text.lower()
+        # 载入了结果集时只在其中筛选，不访问目录树；新查询比上一次完成的
+        # 搜索更严格时，只在上一次的结果中筛选
+        candidates = self.loaded_results
+        base = self.narrow_base
+        if candidates is None and base is not None and plan.narrows(base[0]):
+            candidates = base[1]
+        
+        content_mode = self.CONTENT_MODES.get(self.content_mode_var.get(), 'process')
+        self.search_stats = SearchStats()
+        stats_log = default_log_path() if self.log_stats.get() else None
+        threading.Thread(target=self.engine.run, args=(plan, results, token),
+                         kwargs={'use_index': self.use_index.get(), 'content_mode': content_mode,
+                                 'candidates': candidates, 'status': self.post_status,
+                                 'stats': self.search_stats, 'stats_log': stats_log,
+                                 'preview': self.TYPEAHEAD_PREVIEW if quiet else None,
+                                 'max_index_age': None if self.watchers else self.INDEX_MAX_AGE},
+                         daemon=True).start()
     
-    def get_file_info(self, file_path):
-        """获取文件信息"""
-        try:
-            stat = os.stat(file_path)
-            size_bytes = stat.st_size
-            
-            # 格式化文件大小
-            if size_bytes < 1024:
-                size_str = f"{size_bytes} B"
-            elif size_bytes < 1024 * 1024:
-                size_str = f"{size_bytes / 1024:.1f} KB"
-            elif size_bytes < 1024 * 1024 * 1024:
-                size_str = f"{size_bytes / (1024 * 1024):.1f} MB"
-            else:
-                size_str = f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
-            
-            return {
-                'name': os.path.basename(file_path),
-                'path': file_path,
-                'size': size_str,
-                'size_bytes': size_bytes,
-                'modified': time.strftime('%Y-%m-%d %H:%M', time.localtime(stat.st_mtime)),
-                'modified_timestamp': stat.st_mtime,
-                'type': Path(file_path).suffix.upper().lstrip('.')
-            }
-        except:
-            return {
-                'name': os.path.basename(file_path),
-                'path': file_path,
-                'size': "未知",
-                'size_bytes': 0,
-                'modified': "未知",
-                'modified_timestamp': 0,
-                'type': Path(file_path).suffix.upper().lstrip('.')
-            }
-    
-    def is_text_file(self, file_path):
-        """检查是否为文本文件"""
-        text_extensions = {'.txt', '.py', '.js', '.html', '.css', '.xml', '.json', 
-                          '.md', '.log', '.ini', '.cfg', '.conf', '.yml', '.yaml',
-                          '.csv', '.sql', '.sh', '.bat', '.c', '.cpp', '.java'}
-        return Path(file_path).suffix.lower() in text_extensions
-    
-    def search_in_file(self, file_path, keyword):
-        """在文件内容中搜索关键词"""
-        try:
-            encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
+    def post_status(self, text):
+        """后台线程报告进度：交给主循环更新状态栏"""
+        self.window.after(0, lambda: self.status_label.config(text=text))
+    
+    def cancel_search(self):
+        """取消正在进行的搜索，后台线程会在下一次检查时退出"""
+        if self.search_token is not None:
+            self.search_token.cancel()
+            self.search_token = None
+    
+    def stop_search(self):
+        """停止按钮：停止当前搜索和索引更新，保留已找到的结果"""
+        if self.refresh_token is not None:
+            self.refresh_token.cancel()
+            self.refresh_token = None
+            if self.search_token is None:
+                self.progress.stop()
+                self.progress.pack_forget()
+                self.status_label.config(text="索引更新已停止")
+        if self.search_token is None:
+            return
+        self.cancel_search()
+        # 排在已产出结果之后，由 drain_results 收尾
+        self.result_queue.put(('stopped', None))
+    
+    def drain_results(self):
+        """从结果队列中分批取出结果插入列表，每次占用主循环不超过 DRAIN_BUDGET 秒"""
+        self.drain_job = None
+        results = self.result_queue
+        deadline = time.perf_counter() + self.DRAIN_BUDGET
+        count_before = self.search_results.total
+        
+        while time.perf_counter() < deadline:
+            try:
+                item = results.get_nowait()
+            except queue.Empty:
+                break
             
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
-                        content = f.read()
-                        return self.match_text(content, keyword)
-                except UnicodeDecodeError:
+            if not isinstance(item, Hit):
+                kind, value = item
+                if kind == 'preview':
+                    self.match_estimate = value
                     continue
-            return False
-        except:
-            return False
+                self.result_list.refresh()
+                self.match_estimate = None
+                if kind == 'done':
+                    self.search_token = None
+                    # 搜索完成后结果列表才跟随文件变化实时更新
+                    self.live_query = self.pending_live_query
+                    matched = self.ranked_results.matched
+                    self.narrow_base = None if matched is None else (self.live_query, matched)
+                    self.show_results(value)
+                elif kind == 'stopped':
+                    self.show_stopped()
+                else:
+                    self.search_token = None
+                    self.show_error(value, quiet=self.search_quiet)
+                self.show_stats()
+                return
+            
+            self.search_results.append(item)
+        
+        if self.search_results.total != count_before:
+            self.result_list.refresh()
+        self.update_result_count("已找到")
+        self.drain_job = self.window.after(self.DRAIN_INTERVAL_MS, self.drain_results)
     
-    def show_results(self, results, total_scanned):
-        """显示搜索结果"""
+    def show_results(self, total_scanned):
+        """搜索结束，显示汇总信息"""
         self.progress.stop()
         self.progress.pack_forget()
+        self.update_index_label()
         
-        if not results:
+        if not self.search_results:
             self.status_label.config(text=f"搜索完成，扫描了 {total_scanned} 个文件，未找到匹配项")
             self.result_count_label.config(text="无结果")
             return
         
-        for result in results:
-            self.result_tree.insert('', 'end', values=(
-                result['name'],
-                result['path'],
-                result['size'],
-                result['modified'],
-                result['type']
-            ))
-        
         self.status_label.config(text=f"搜索完成，扫描了 {total_scanned} 个文件")
-        self.result_count_label.config(text=f"找到 {len(results)} 个匹配文件")
+        self.update_result_count("找到")
+    
+    def update_result_count(self, prefix):
+        """显示匹配总数；结果超过 RESULT_LIMIT 时说明只显示了前面一部分
+
+        边输入边搜索尚未判断完时显示估计的总数。
+        """
+        shown = len(self.search_results)
+        total = max(shown, self.ranked_results.total if self.ranked_results else shown)
+        if self.match_estimate is not None and self.match_estimate > total:
+            text = f"{prefix} 约 {self.match_estimate} 个匹配文件"
+        else:
+            text = f"{prefix} {total} 个匹配文件"
+        if total > shown:
+            text += f"，显示相关度最高的 {shown} 个"
+        if text != self.result_count_label.cget('text'):
+            self.result_count_label.config(text=text)
+    
+    def show_stopped(self):
+        """搜索被停止"""
+        self.progress.stop()
+        self.progress.pack_forget()
+        self.status_label.config(text="搜索已停止")
+        self.update_result_count("找到")
     
-    def show_error(self, error):
-        """显示错误信息"""
+    def show_error(self, error, quiet=False):
+        """显示错误信息；quiet 为真时（边输入边搜索）只显示在状态栏，不打断输入"""
         self.progress.stop()
         self.progress.pack_forget()
+        if quiet:
+            self.status_label.config(text=f"搜索出错：{error}")
+            return
         self.status_label.config(text="搜索出错")
         messagebox.showerror("搜索错误", f"搜索过程中出现错误：{error}")
     
+    def results_for_export(self):
+        """导出的结果：搜索完成且完整保留了全部匹配时导出全部匹配，否则导出列表中的结果"""
+        base = self.narrow_base
+        if (base is None or base[0] is not self.live_query or self.ranked_results is None
+                or len(base[1]) <= len(self.search_results)):
+            return self.search_results
+        scorer = self.ranked_results.scorer
+        store = ResultStore()
+        for hit in base[1]:
+            store.append(hit._replace(score=scorer(hit)))
+        store.sort('相关度')
+        return store
+    
+    def export_results(self):
+        """把结果导出为结果集、CSV 或 JSONL 文件"""
+        if self.search_token is not None:
+            messagebox.showwarning("提示", "请等待搜索完成或停止搜索后再导出")
+            return
+        if not self.search_results:
+            messagebox.showwarning("提示", "没有可导出的结果")
+            return
+        path = filedialog.asksaveasfilename(title="导出搜索结果", defaultextension=RESULT_SET_EXT,
+                                            filetypes=EXPORT_FORMATS)
+        if not path:
+            return
+        
+        store = self.results_for_export()
+        meta = {'query': self.typeahead_text or self.search_entry.get().strip(),
+                'roots': list(self.scope.roots),
+                'total': self.ranked_results.total if self.ranked_results else store.total}
+        try:
+            export_results(store, path, meta)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败：{e}")
+            return
+        self.status_label.config(text=f"已导出 {len(store)} 条结果到 {os.path.basename(path)}")
+    
+    def load_results(self):
+        """载入结果集文件：直接显示，之后的搜索只在其中筛选"""
+        path = filedialog.askopenfilename(title="载入搜索结果",
+                                          filetypes=[EXPORT_FORMATS[0], ("所有文件", '*.*')])
+        if not path:
+            return
+        try:
+            store, meta = load_result_set(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("错误", f"无法载入结果集：{e}")
+            return
+        
+        self.cancel_search()
+        roots = meta.get('roots')
+        if roots:
+            self.search_directories = roots
+        self.update_scope()
+        
+        self.search_results = store
+        self.ranked_results = None
+        self.result_list.set_store(store)
+        self.result_list.refresh()
+        self.loaded_results = [store.hit(i) for i in range(len(store))]
+        if meta.get('query'):
+            self.search_entry.delete(0, 'end')
+            self.search_entry.insert(0, meta['query'])
+            self.typeahead_text = meta['query']
+        self.update_result_count("载入")
+        self.status_label.config(text=f"已载入 {os.path.basename(path)}，搜索将只在这些结果中筛选；"
+                                      f"重新选择目录可恢复正常搜索")
+    
+    def toggle_stats(self):
+        """展开或折叠统计面板"""
+        if self.stats_frame.winfo_ismapped():
+            self.stats_frame.pack_forget()
+            self.stats_toggle.config(text="统计 ▸")
+        else:
+            self.stats_frame.pack(after=self.status_frame, padx=20, fill='x')
+            self.stats_toggle.config(text="统计 ▾")
+            self.show_stats()
+    
+    def show_stats(self):
+        """在统计面板中显示最近一次搜索的统计（停止时为当时的快照）"""
+        if self.search_stats is not None:
+            self.stats_label.config(text='\n'.join(self.search_stats.summary_lines()))
+    
     def sort_results(self, column):
         """按列排序结果"""
         if not self.search_results:
             return
         
-        # 根据列名确定排序键
-        sort_key_map = {
-            '文件名': 'name',
-            '路径': 'path', 
-            '大小': 'size_bytes',
-            '修改时间': 'modified_timestamp',
-            '类型': 'type'
-        }
-        
-        sort_key = sort_key_map.get(column, 'name')
-        
-        # 排序
-        self.search_results.sort(key=lambda x: x.get(sort_key, ''), reverse=False)
-        
-        # 更新显示
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
-        
-        for result in self.search_results:
-            self.result_tree.insert('', 'end', values=(
-                result['name'],
-                result['path'],
-                result['size'],
-                result['modified'],
-                result['type']
-            ))
+        # 只重排下标，虚拟列表随后改写可见行
+        self.search_results.sort(column)
+        self.result_list.refresh()
     
     def show_context_menu(self, event):
         """显示右键菜单"""
-        selection = self.result_tree.selection()
-        if selection:
+        if self.result_list.selected_row() is not None:
             self.context_menu.post(event.x_root, event.y_root)
     
     def open_selected_file(self, event=None):
         """打开选中的文件"""
-        selection = self.result_tree.selection()
-        if selection:
-            item = self.result_tree.item(selection[0])
-            file_path = item['values'][1]
+        row = self.result_list.selected_row()
+        if row:
+            file_path = row[1]
             self.open_file(file_path)
     
     def open_file_location(self):
         """打开文件所在文件夹"""
-        selection = self.result_tree.selection()
-        if selection:
-            item = self.result_tree.item(selection[0])
-            file_path = item['values'][1]
+        row = self.result_list.selected_row()
+        if row:
+            file_path = row[1]
             folder_path = os.path.dirname(file_path)
             self.open_file(folder_path)
     
     def copy_file_path(self):
         """复制文件路径到剪贴板"""
-        selection = self.result_tree.selection()
-        if selection:
-            item = self.result_tree.item(selection[0])
-            file_path = item['values'][1]
+        row = self.result_list.selected_row()
+        if row:
+            file_path = row[1]
             self.window.clipboard_clear()
             self.window.clipboard_append(file_path)
             self.status_label.config(text="文件路径已复制到剪贴板")
     
     def show_file_properties(self):
         """显示文件属性"""
-        selection = self.result_tree.selection()
-        if selection:
-            item = self.result_tree.item(selection[0])
-            file_path = item['values'][1]
+        row = self.result_list.selected_row()
+        if row:
+            file_path = row[1]
             
             try:
                 stat = os.stat(file_path)
@@ -444,9 +838,9 @@ class SearchWindow:
 
 文件名: {os.path.basename(file_path)}
 完整路径: {file_path}
-文件大小: {item['values'][2]}
-修改时间: {item['values'][3]}
-文件类型: {item['values'][4]}
+文件大小: {row[2]}
+修改时间: {row[3]}
+文件类型: {row[4]}
 创建时间: {time.strftime('%Y-%m-%d %H:%M', time.localtime(stat.st_ctime))}
 访问时间: {time.strftime('%Y-%m-%d %H:%M', time.localtime(stat.st_atime))}"""
                 
@@ -469,4 +863,16 @@ class SearchWindow:
     
     def on_closing(self):
         """窗口关闭处理"""
+        self.cancel_search()
+        if self.refresh_token is not None:
+            self.refresh_token.cancel()
+        for watcher in self.watchers:
+            watcher.stop()
+        if self.index_label_job is not None:
+            self.window.after_cancel(self.index_label_job)
+        if self.drain_job is not None:
+            self.window.after_cancel(self.drain_job)
+        if self.typeahead_job is not None:
+            self.window.after_cancel(self.typeahead_job)
+        self.engine.shutdown()
         self.window.destroy()
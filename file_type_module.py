@@ -0,0 +1,161 @@
+"""
+文件类型识别模块
+负责判断文件是文本还是二进制并识别文本编码：常见二进制扩展名直接判定，
+其余文件读取开头几KB检查 BOM、NUL 字节、UTF-8 和 GBK 合法性。结果按
+(inode, 修改时间, 大小) 缓存在本地SQLite中，文件未变化时重复搜索无需再次读取
+"""
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from file_index_module import get_cache_dir, split_ext
+
+# 不需要读取就能确定为二进制的扩展名
+BINARY_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.webp', '.tif', '.tiff', '.psd',
+    '.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a', '.wma',
+    '.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm',
+    '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz', '.tar', '.tgz', '.zst',
+    '.exe', '.dll', '.so', '.dylib', '.o', '.obj', '.a', '.lib', '.pyc', '.pyd', '.class', '.jar',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.pdf', '.odt', '.ods',
+    '.ttf', '.otf', '.woff', '.woff2', '.iso', '.img', '.dmg', '.bin', '.dat',
+    '.sqlite', '.db', '.mdb', '.pkl', '.npy', '.npz', '.parquet'
+})
+
+# 开头只有 ASCII 字节的文本：其后的内容可能是任意一种常见编码，匹配时都要尝试
+ASCII = 'ascii'
+
+BOMS = ((b'\xef\xbb\xbf', 'utf-8-sig'), (b'\xff\xfe', 'utf-16-le'), (b'\xfe\xff', 'utf-16-be'))
+
+# 文本中允许出现的控制字符：\b \t \n \f \r 和 ESC
+TEXT_CONTROLS = frozenset(b'\x08\t\n\x0c\r\x1b')
+CONTROL_BYTES = bytes(b for b in range(32) if b not in TEXT_CONTROLS) + b'\x7f'
+
+
+def decodes_as(sample, encoding):
+    """采样能否按该编码解码；末尾在多字节字符中间截断不算非法"""
+    try:
+        sample.decode(encoding)
+        return True
+    except UnicodeDecodeError as e:
+        return e.end >= len(sample) and e.start >= len(sample) - 3
+
+
+def sniff(sample):
+    """根据文件开头的字节识别文本编码，二进制文件返回None
+
+    纯 ASCII（包括空文件）无法确定编码，返回 ASCII，例如开头是英文许可证
+    说明的 GBK 文件；不是合法 UTF-8 时依次尝试 GBK（gb2312 是其子集），
+    都不合法但控制字符很少时按 latin-1 处理。
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if b'\0' in sample:
+        return None
+    if sample.isascii():
+        return ASCII
+    if decodes_as(sample, 'utf-8'):
+        return 'utf-8'
+    controls = len(sample) - len(sample.translate(None, CONTROL_BYTES))
+    if controls > len(sample) // 100:
+        return None
+    if decodes_as(sample, 'gbk'):
+        return 'gbk'
+    return 'latin-1'
+
+
+class FileClassifier:
+    """带持久化缓存的文本编码识别
+
+    缓存键优先使用 (设备号, inode)，改名或移动后仍可命中；平台不提供
+    inode 时使用路径。首次使用时把缓存整体读入内存，新的结果在
+    flush() 时批量写回。可在多个线程中同时使用。
+    cache_hits / sniffed 累计缓存命中和实际读取文件识别的次数。
+    """
+
+    SCHEMA = """
+        -- 旧版本只记录是否为文本，或把纯 ASCII 开头的文件记为 utf-8
+        DROP TABLE IF EXISTS kinds;
+        DROP TABLE IF EXISTS encodings;
+        CREATE TABLE IF NOT EXISTS file_encodings (
+            key TEXT PRIMARY KEY,
+            mtime INTEGER,
+            size INTEGER,
+            encoding TEXT
+        ) WITHOUT ROWID;
+    """
+
+    SNIFF_BYTES = 8192
+
+    def __init__(self, cache_dir=None):
+        self.db_path = os.path.join(cache_dir or get_cache_dir(), "file_types.sqlite")
+        self.cache = None
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.cache_hits = 0
+        self.sniffed = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _load(self):
+        with closing(self._connect()) as conn:
+            conn.executescript(self.SCHEMA)
+            return {key: (mtime, size, encoding) for key, mtime, size, encoding
+                    in conn.execute("SELECT key, mtime, size, encoding FROM file_encodings")}
+
+    def is_text(self, path, stat=None):
+        """文件是否为文本"""
+        return self.encoding(path, stat) is not None
+
+    def encoding(self, path, stat=None):
+        """文本文件的编码，二进制或无法读取时返回None
+
+        stat 可传入已有的 stat 结果或返回它的函数（如 DirEntry.stat）。
+        """
+        if split_ext(os.path.basename(path)) in BINARY_EXTENSIONS:
+            return None
+        try:
+            if stat is None:
+                stat = os.stat(path)
+            elif callable(stat):
+                stat = stat()
+        except OSError:
+            return None
+
+        key = f"{stat.st_dev}:{stat.st_ino}" if stat.st_ino else path
+        with self.lock:
+            if self.cache is None:
+                self.cache = self._load()
+            cached = self.cache.get(key)
+            if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                self.cache_hits += 1
+                return cached[2]
+
+        try:
+            with open(path, 'rb') as f:
+                result = sniff(f.read(self.SNIFF_BYTES))
+        except OSError:
+            return None
+        entry = (stat.st_mtime_ns, stat.st_size, result)
+        with self.lock:
+            self.sniffed += 1
+            self.cache[key] = entry
+            self.pending[key] = entry
+        return result
+
+    def flush(self):
+        """把新的判断结果写入缓存数据库"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        with closing(self._connect()) as conn:
+            conn.executemany("INSERT OR REPLACE INTO file_encodings(key, mtime, size, encoding) VALUES (?, ?, ?, ?)",
+                             ((key, mtime, size, encoding)
+                              for key, (mtime, size, encoding) in pending.items()))
+            conn.commit()
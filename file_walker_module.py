@@ -0,0 +1,125 @@
+"""
+目录遍历模块
+基于 os.scandir 的并行目录遍历：子目录分发到有界线程池中并发列举，
+产出的 DirEntry 自带缓存的 stat 结果，调用方无需再次 os.stat。
+传入 search_scope_module.ScanFilter 时，被排除的子树在列举时直接剪掉
+"""
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 遍历是I/O密集型操作，线程数可以明显多于CPU核数
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+_DONE = object()
+
+
+class CancelToken:
+    """协作式取消标记，遍历和读取文件的循环会定期检查它"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+def scan_dir(dir_path, cancel=None, scan_filter=None):
+    """列举单个目录，返回 (文件DirEntry列表, 子目录路径列表)
+
+    scan_filter 不为None时去掉被排除的文件和子目录；是否已进入过该目录
+    由调用方通过 scan_filter.enter() 判断。
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(dir_path) as it:
+            for count, entry in enumerate(it):
+                # 超大目录中途也要能及时响应取消
+                if cancel is not None and count % 1000 == 999 and cancel.cancelled:
+                    break
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if scan_filter is None or scan_filter.keep_dir(entry.path):
+                            subdirs.append(entry.path)
+                    elif entry.is_file():
+                        if scan_filter is None or scan_filter.keep_file(entry.path):
+                            files.append(entry)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+
+def walk_files(root, workers=DEFAULT_WORKERS, cancel=None, scan_filter=None, stats=None):
+    """并行遍历 root 下的所有文件，逐个产出 os.DirEntry
+
+    workers 为并发列举目录的线程数，为1时退化为单线程深度优先遍历。
+    scan_filter 用于剪掉被排除的子树，并跳过从其他路径进入过的目录。
+    stats（search_stats_module.SearchStats）不为None时统计列举的目录数。
+    产出顺序不固定。生成器被提前关闭或 cancel 被取消时，
+    尚未开始的目录任务会被放弃。
+    """
+    if workers <= 1:
+        stack = [root]
+        while stack:
+            if cancel is not None and cancel.cancelled:
+                return
+            dir_path = stack.pop()
+            if scan_filter is not None and not scan_filter.enter(dir_path):
+                continue
+            files, subdirs = scan_dir(dir_path, cancel, scan_filter)
+            if stats is not None:
+                stats.count('dirs')
+            yield from files
+            stack.extend(reversed(subdirs))
+        return
+
+    results = queue.Queue(maxsize=1024)
+    lock = threading.Lock()
+    pending = [1]
+    stopped = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='walker')
+
+    def task(dir_path):
+        try:
+            if (not stopped.is_set() and not (cancel is not None and cancel.cancelled)
+                    and (scan_filter is None or scan_filter.enter(dir_path))):
+                files, subdirs = scan_dir(dir_path, cancel, scan_filter)
+                if stats is not None:
+                    stats.count('dirs')
+                with lock:
+                    pending[0] += len(subdirs)
+                for sub in subdirs:
+                    executor.submit(task, sub)
+                if files:
+                    results.put(files)
+        finally:
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                results.put(_DONE)
+
+    executor.submit(task, root)
+    try:
+        while True:
+            batch = results.get()
+            if batch is _DONE or (cancel is not None and cancel.cancelled):
+                break
+            yield from batch
+    finally:
+        stopped.set()
+        # 清空队列，避免阻塞在 put 上的工作线程无法退出
+        while True:
+            try:
+                results.get_nowait()
+            except queue.Empty:
+                break
+        executor.shutdown(wait=False, cancel_futures=True)
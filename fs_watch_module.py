@@ -0,0 +1,374 @@
+"""
+文件监视模块
+负责监视搜索目录中的文件创建、删除、改名和修改：Linux 上使用 inotify，
+其他平台或 inotify 不可用时退化为轮询比较目录快照
+"""
+import os
+import sys
+import time
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from collections import namedtuple
+from file_walker_module import scan_dir
+
+# kind 为 'created' / 'deleted' / 'modified' / 'moved'，moved 时 dest 为新路径
+FsEvent = namedtuple('FsEvent', 'kind path dest is_dir')
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def coalesce(events):
+    """合并一批事件：同一路径只保留最终状态，按各路径最后一次变化的先后排列
+
+    moved 事件带有新路径，总是保留；先创建后删除的路径恢复为创建之前的状态，
+    批次开始时已存在的文件仍以 deleted 结束。
+    """
+    result = {}
+    replaced = {}  # 路径 -> 被该路径的 created 覆盖的更早事件，此前没有事件时为None
+    for event in events:
+        if event.kind == 'moved':
+            result[('moved', event.path, event.dest)] = event
+            continue
+        previous = result.get(event.path)
+        if event.kind == 'modified' and previous is not None and previous.kind == 'created':
+            continue
+        if event.kind == 'deleted' and previous is not None and previous.kind == 'created':
+            del result[event.path]
+            if replaced.pop(event.path) is not None:
+                result[event.path] = event
+            continue
+        if event.kind == 'created':
+            replaced[event.path] = previous
+        result.pop(event.path, None)
+        result[event.path] = event
+    return list(result.values())
+
+
+def native_watch_available():
+    """当前平台能否使用系统的文件变化通知（inotify），否则只能轮询"""
+    libc_name = ctypes.util.find_library('c')
+    if not sys.platform.startswith('linux') or not libc_name:
+        return False
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        return False
+    os.close(fd)
+    return True
+
+
+class InotifyBackend:
+    """基于 inotify 的递归监视（每个子目录一个 watch），被排除的子树不监视"""
+
+    def __init__(self, root, scope=None):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise OSError("inotify 不可用")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.watches = {}  # wd -> 目录路径
+        self.cookies = {}  # cookie -> 移出的路径
+        self.root = root
+        self.scope = scope
+        try:
+            self.add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, dir_path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            # 超出 max_user_watches 时整体退化为轮询
+            if errno == 28:  # ENOSPC
+                raise OSError(errno, "inotify watch 数量不足")
+            return
+        self.watches[wd] = dir_path
+
+    def add_tree(self, root):
+        """为目录及其所有子目录添加监视，返回其中已有的文件（新目录移入时使用）"""
+        files = []
+        # 目录改名后 inode 不变，每次添加都使用新的去重记录
+        scan_filter = self.scope.filter(self.root) if self.scope is not None else None
+        if scan_filter is not None and not scan_filter.includes(root, True):
+            return files
+        stack = [root]
+        while stack:
+            dir_path = stack.pop()
+            if scan_filter is not None and not scan_filter.enter(dir_path):
+                continue
+            self.add_watch(dir_path)
+            entries, subdirs = scan_dir(dir_path, scan_filter=scan_filter)
+            files.extend(entry.path for entry in entries)
+            stack.extend(subdirs)
+        return files
+
+    def remove_tree(self, dir_path):
+        prefix = dir_path.rstrip(os.sep) + os.sep
+        for wd, path in list(self.watches.items()):
+            if path == dir_path or path.startswith(prefix):
+                del self.watches[wd]
+
+    def read_events(self, timeout):
+        """等待并读取一批事件，转换为 FsEvent 列表"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append(FsEvent('overflow', '', None, True))
+                continue
+            base = self.watches.get(wd)
+            if base is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                continue
+
+            path = os.path.join(base, os.fsdecode(name)) if name else base
+            is_dir = bool(mask & IN_ISDIR)
+            if mask & IN_CREATE:
+                events.append(FsEvent('created', path, None, is_dir))
+                if is_dir:
+                    # 新目录中可能已经有文件（例如 mkdir -p 后立即写入）
+                    for file_path in self.add_tree(path):
+                        events.append(FsEvent('created', file_path, None, False))
+            elif mask & IN_DELETE:
+                events.append(FsEvent('deleted', path, None, is_dir))
+                if is_dir:
+                    self.remove_tree(path)
+            elif mask & IN_MOVED_FROM:
+                self.cookies[cookie] = (path, is_dir)
+            elif mask & IN_MOVED_TO:
+                source = self.cookies.pop(cookie, None)
+                if source is not None:
+                    events.append(FsEvent('moved', source[0], path, is_dir))
+                    if is_dir:
+                        self.remove_tree(source[0])
+                else:
+                    events.append(FsEvent('created', path, None, is_dir))
+                # 移入的目录需要重新监视，其中的文件逐个报告为新建
+                if is_dir:
+                    for file_path in self.add_tree(path):
+                        events.append(FsEvent('created', file_path, None, False))
+            elif mask & (IN_MODIFY | IN_CLOSE_WRITE) and not is_dir:
+                events.append(FsEvent('modified', path, None, False))
+
+        # 没有配对的移出视为删除（移到了监视范围之外）
+        for path, is_dir in self.cookies.values():
+            events.append(FsEvent('deleted', path, None, is_dir))
+            if is_dir:
+                self.remove_tree(path)
+        self.cookies.clear()
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingBackend:
+    """轮询比较文件快照 {路径: (大小, 修改时间)}
+
+    扫描耗时较长的目录树会自动拉长轮询间隔，避免持续占用 I/O。
+    """
+
+    def __init__(self, root, interval=2.0, scope=None):
+        self.root = root
+        self.interval = interval
+        self.scope = scope
+        self.snapshot = self.take_snapshot()
+        self.next_poll = time.monotonic() + self.interval
+
+    def take_snapshot(self):
+        start = time.monotonic()
+        snapshot = {}
+        # 每次快照都是一次新的遍历，使用新的去重记录
+        scan_filter = self.scope.filter(self.root) if self.scope is not None else None
+        stack = [self.root]
+        while stack:
+            dir_path = stack.pop()
+            if scan_filter is not None and not scan_filter.enter(dir_path):
+                continue
+            files, subdirs = scan_dir(dir_path, scan_filter=scan_filter)
+            for entry in files:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+            stack.extend(subdirs)
+        self.interval = max(self.interval, (time.monotonic() - start) * 5)
+        return snapshot
+
+    def read_events(self, timeout):
+        wait = self.next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+
+        current = self.take_snapshot()
+        self.next_poll = time.monotonic() + self.interval
+        previous = self.snapshot
+        self.snapshot = current
+
+        events = []
+        for path, info in current.items():
+            old = previous.get(path)
+            if old is None:
+                events.append(FsEvent('created', path, None, False))
+            elif old != info:
+                events.append(FsEvent('modified', path, None, False))
+        for path in previous.keys() - current.keys():
+            events.append(FsEvent('deleted', path, None, False))
+        return events
+
+    def close(self):
+        pass
+
+
+class DirectoryWatcher:
+    """在后台线程中监视目录树，把合并后的事件批量交给 callback(events)
+
+    callback 在监视线程中调用。inotify 队列溢出时会收到一个
+    kind 为 'overflow' 的事件，调用方应当整体重新扫描。
+    传入 scope（search_scope_module.SearchScope）时，被排除路径上的事件不会报告。
+    运行中 inotify 出错（例如新目录超出 watch 数量上限）时改为轮询，
+    通过 on_status(文字) 告知调用方，并报告一个 'overflow' 事件。
+    """
+
+    BATCH_DELAY = 0.2  # 收到事件后再等待一会儿，合并连续的写入
+
+    def __init__(self, root, callback, poll_interval=2.0, scope=None, on_status=None):
+        self.root = os.path.abspath(root)
+        self.callback = callback
+        self.on_status = on_status
+        self.poll_interval = poll_interval
+        self.scope = scope
+        self.scan_filter = scope.filter(self.root) if scope is not None else None
+        self.backend = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    @property
+    def mode(self):
+        if isinstance(self.backend, InotifyBackend):
+            return 'inotify'
+        return 'polling'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        try:
+            self.backend = InotifyBackend(self.root, self.scope)
+        except OSError:
+            self.backend = PollingBackend(self.root, self.poll_interval, self.scope)
+
+        try:
+            while not self.stopped.is_set():
+                try:
+                    events = self.read_batch()
+                except OSError as e:
+                    if not isinstance(self.backend, InotifyBackend):
+                        self.report(f"文件监视已停止：{e}")
+                        return
+                    self.fall_back_to_polling(e)
+                    continue
+                events = self.filter_events(coalesce(events))
+                if events and not self.stopped.is_set():
+                    self.callback(events)
+        finally:
+            self.backend.close()
+
+    def read_batch(self):
+        """读取一批事件：收到事件后再等待 BATCH_DELAY，合并连续的写入"""
+        events = self.backend.read_events(0.5)
+        if not events:
+            return events
+        deadline = time.monotonic() + self.BATCH_DELAY
+        while not self.stopped.is_set() and time.monotonic() < deadline:
+            events.extend(self.backend.read_events(max(0.0, deadline - time.monotonic())))
+        return events
+
+    def fall_back_to_polling(self, error):
+        """inotify 无法继续工作时改为轮询；期间的事件可能丢失，报告 overflow 让调用方重新扫描"""
+        self.backend.close()
+        self.backend = PollingBackend(self.root, self.poll_interval, self.scope)
+        self.report(f"实时更新改为轮询（{error}）")
+        if not self.stopped.is_set():
+            self.callback([FsEvent('overflow', '', None, True)])
+
+    def report(self, text):
+        if self.on_status is not None:
+            self.on_status(text)
+
+    def filter_events(self, events):
+        """去掉排除范围内的事件；移入或移出排除范围的改名转换为新建或删除"""
+        scan_filter = self.scan_filter
+        if scan_filter is None:
+            return events
+        result = []
+        for event in events:
+            if event.kind == 'overflow':
+                result.append(event)
+                continue
+            inside = scan_filter.includes(event.path, event.is_dir)
+            if event.kind != 'moved':
+                if inside:
+                    result.append(event)
+                continue
+            dest_inside = scan_filter.includes(event.dest, event.is_dir)
+            if inside and dest_inside:
+                result.append(event)
+            elif inside:
+                result.append(FsEvent('deleted', event.path, None, event.is_dir))
+            elif dest_inside:
+                result.append(FsEvent('created', event.dest, None, event.is_dir))
+        return result
@@ -1,6 +1,9 @@
+import multiprocessing
 from floating_ball_module import FloatingBall
 
 def main():
+    # 打包后的程序使用内容搜索进程池时需要
+    multiprocessing.freeze_support()
     app = FloatingBall()
     app.run()
 
@@ -5,7 +5,7 @@ a = Analysis(
     ['main_app.py'],
     pathex=[],
     binaries=[],
-    datas=[('chat_bot_module.py','.'), ('floating_ball_module.py','.'), ('audio_upload_module.py','.'), ('file_search_module.py','.')],
+    datas=[('chat_bot_module.py','.'), ('floating_ball_module.py','.'), ('audio_upload_module.py','.'), ('file_search_module.py','.'), ('file_index_module.py','.'), ('content_index_module.py','.'), ('file_walker_module.py','.'), ('result_view_module.py','.'), ('content_match_module.py','.'), ('fs_watch_module.py','.'), ('query_module.py','.'), ('file_type_module.py','.'), ('document_module.py','.'), ('ranking_module.py','.'), ('search_scope_module.py','.'), ('result_export_module.py','.'), ('search_engine_module.py','.'), ('search_stats_module.py','.'), ('chat_transport_module.py','.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,495 @@
+"""
+查询模块
+负责把搜索框中的查询语句解析并编译为匹配器：支持 AND/OR/NOT、括号、
+"短语"、通配符、/正则/ 以及 name:/content:/ext:/size:/modified: 字段。
+求值按代价分阶段进行：先看文件名和扩展名，再看大小和修改时间，
+最后才读取文件内容，大部分文件无需打开就能排除
+"""
+import os
+import re
+import time
+import fnmatch
+from collections import namedtuple
+from content_match_module import iter_windows, keyword_variants, match_encodings, CHUNK_SIZE
+from file_index_module import split_ext
+
+
+class QueryError(ValueError):
+    """查询语句有误"""
+
+
+# 语法树节点
+And = namedtuple('And', 'children')
+Or = namedtuple('Or', 'children')
+Not = namedtuple('Not', 'child')
+# kind: 'literal' / 'glob' / 'regex'；scope: 'any' / 'name' / 'content'
+Term = namedtuple('Term', 'id kind text scope')
+# ext 的 value 为扩展名集合；size 为字节数；modified 为 ('age', 秒) 或 ('date', 时间戳)
+Field = namedtuple('Field', 'name op value')
+
+# 只有元数据时使用的 stat 替身（例如来自索引的行）
+FileMeta = namedtuple('FileMeta', 'st_size st_mtime')
+
+SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2,
+              'g': 1024 ** 3, 'gb': 1024 ** 3, 't': 1024 ** 4, 'tb': 1024 ** 4}
+DURATION_UNITS = {'s': 1, 'm': 60, 'min': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400,
+                  'mo': 30 * 86400, 'y': 365 * 86400}
+
+REGEX_OVERLAP = 4096  # 正则匹配跨窗口时的重叠字节数，更长的跨窗口匹配可能漏掉
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<lparen>\()
+      | (?P<rparen>\))
+      | (?P<field>[A-Za-z]+:"(?:[^"\\]|\\.)*")
+      | (?P<quoted>"(?:[^"\\]|\\.)*")
+      | (?P<regex>/(?:[^/\\]|\\.)+/)
+      | (?P<word>[^\s()]+)
+    )''', re.VERBOSE)
+
+FIELD_RE = re.compile(r'^(name|content|ext|size|modified|re):(.*)$', re.IGNORECASE | re.DOTALL)
+COMPARE_RE = re.compile(r'^(>=|<=|>|<|=)?(.*)$')
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        if not text[pos:].strip():
+            break
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            raise QueryError(f"无法解析: {text[pos:]}")
+        tokens.append((m.lastgroup, m.group(m.lastgroup)))
+        pos = m.end()
+    return tokens
+
+
+def unquote(text):
+    """去掉两端引号并处理转义"""
+    return re.sub(r'\\(.)', r'\1', text[1:-1])
+
+
+class Parser:
+    """递归下降解析：OR 优先级最低，相邻的条件默认为 AND"""
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.terms = []
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("查询为空")
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise QueryError(f"多余的内容: {self.tokens[self.pos][1]}")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() in (('word', 'OR'), ('word', '|')):
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while True:
+            kind, value = self.peek()
+            if kind is None or kind == 'rparen' or (kind == 'word' and value in ('OR', '|')):
+                break
+            if kind == 'word' and value == 'AND':
+                self.take()
+            children.append(self.parse_unary())
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def parse_unary(self):
+        kind, value = self.peek()
+        if kind is None:
+            raise QueryError("查询不完整")
+        if kind == 'word' and value == 'NOT':
+            self.take()
+            return Not(self.parse_unary())
+        if kind == 'word' and value.startswith('-') and len(value) > 1:
+            self.take()
+            return Not(self.parse_word(value[1:]))
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, value = self.take()
+        if kind == 'lparen':
+            node = self.parse_or()
+            if self.peek()[0] != 'rparen':
+                raise QueryError("缺少右括号")
+            self.take()
+            return node
+        if kind == 'rparen':
+            raise QueryError("多余的右括号")
+        if kind == 'quoted':
+            return self.make_term('literal', unquote(value), 'any')
+        if kind == 'regex':
+            return self.make_term('regex', value[1:-1].replace('\\/', '/'), 'any')
+        if kind == 'field':
+            name, _, quoted = value.partition(':')
+            return self.parse_field(name.lower(), unquote(quoted), quoted=True)
+        return self.parse_word(value)
+
+    def parse_word(self, word):
+        m = FIELD_RE.match(word)
+        if m:
+            return self.parse_field(m.group(1).lower(), m.group(2), quoted=False)
+        return self.make_value_term(word, 'any', quoted=False)
+
+    def make_term(self, kind, text, scope):
+        if not text:
+            raise QueryError("搜索词不能为空")
+        term = Term(len(self.terms), kind, text, scope)
+        self.terms.append(term)
+        return term
+
+    def make_value_term(self, text, scope, quoted):
+        """根据写法判断是普通文字、通配符还是正则"""
+        if not quoted and len(text) > 2 and text.startswith('/') and text.endswith('/'):
+            return self.make_term('regex', text[1:-1], scope)
+        if not quoted and ('*' in text or '?' in text):
+            return self.make_term('glob', text, scope)
+        return self.make_term('literal', text, scope)
+
+    def parse_field(self, name, value, quoted):
+        if name in ('name', 'content'):
+            return self.make_value_term(value, name, quoted)
+        if name == 're':
+            return self.make_term('regex', value, 'any')
+        if name == 'ext':
+            exts = frozenset('.' + ext.strip().lstrip('.').lower()
+                             for ext in value.split(',') if ext.strip())
+            if not exts:
+                raise QueryError("ext: 需要扩展名，例如 ext:py,txt")
+            return Field('ext', '=', exts)
+
+        op, operand = COMPARE_RE.match(value.strip()).groups()
+        op = op or '='
+        if name == 'size':
+            m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([a-zA-Z]*)', operand)
+            if not m or m.group(2).lower() not in SIZE_UNITS:
+                raise QueryError(f"无法识别的大小: {value}（示例 size:>10MB）")
+            return Field('size', op, int(float(m.group(1)) * SIZE_UNITS[m.group(2).lower()]))
+
+        # modified
+        m = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([a-zA-Z]+)', operand)
+        if m and m.group(2).lower() in DURATION_UNITS:
+            return Field('modified', op, ('age', float(m.group(1)) * DURATION_UNITS[m.group(2).lower()]))
+        try:
+            return Field('modified', op, ('date', time.mktime(time.strptime(operand, '%Y-%m-%d'))))
+        except ValueError:
+            raise QueryError(f"无法识别的时间: {value}（示例 modified:<7d 或 modified:>2024-01-01）")
+
+
+def compare(left, op, right):
+    if op == '>':
+        return left > right
+    if op == '>=':
+        return left >= right
+    if op == '<':
+        return left < right
+    if op == '<=':
+        return left <= right
+    return left == right
+
+
+def evaluate(node, term_value, field_value):
+    """三值求值：True / False / None（信息不足，需要读取更多数据）"""
+    if isinstance(node, Term):
+        return term_value(node)
+    if isinstance(node, Field):
+        return field_value(node)
+    if isinstance(node, Not):
+        value = evaluate(node.child, term_value, field_value)
+        return None if value is None else not value
+    if isinstance(node, And):
+        result = True
+        for child in node.children:
+            value = evaluate(child, term_value, field_value)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+    # Or
+    result = False
+    for child in node.children:
+        value = evaluate(child, term_value, field_value)
+        if value is True:
+            return True
+        if value is None:
+            result = None
+    return result
+
+
+class CompiledQuery:
+    """编译好的查询，可在线程或进程之间传递并对大量文件重复使用
+
+    普通搜索词在“搜索文件名”时匹配文件名，在“搜索文件内容”时匹配内容，
+    任一处匹配即为真；name: 和 content: 限定只匹配其中一处。通配符只用于
+    文件名。modified 使用时长时比较文件“年龄”（modified:<7d 表示7天内修改过），
+    使用日期时比较修改时间（modified:>2024-01-01 表示该日期之后修改过）。
+    """
+
+    def __init__(self, text, case_sensitive=False, search_filename=True, search_content=False):
+        self.text = text
+        self.case_sensitive = case_sensitive
+        self.search_filename = search_filename
+        self.search_content = search_content
+
+        parser = Parser(text)
+        self.expr = parser.parse()
+        self.terms = parser.terms
+        self.uses_stat = self._has_stat_field(self.expr)
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self.name_patterns = {}  # 通配符和正则的文件名匹配
+        self.name_literals = {}  # 普通文字（不区分大小写时已转小写）
+        self.content_literals = {}  # 需要在内容中查找的普通文字
+        self.content_regexes = {}  # 需要在内容中查找的正则
+        self.encoded = {}  # 文件编码 -> 该编码下的字节模式，按需生成
+        for term in self.terms:
+            try:
+                if term.kind == 'literal':
+                    self.name_literals[term.id] = term.text if case_sensitive else term.text.lower()
+                elif term.kind == 'glob':
+                    self.name_patterns[term.id] = re.compile(fnmatch.translate(term.text), flags)
+                else:
+                    self.name_patterns[term.id] = re.compile(term.text, flags)
+                if self.content_capable(term):
+                    if term.kind == 'literal':
+                        self.content_literals[term.id] = term.text
+                    else:
+                        self.content_regexes[term.id] = self.name_patterns[term.id]
+            except re.error as e:
+                raise QueryError(f"正则表达式有误: {term.text}（{e}）")
+        self.needs_content = bool(self.content_literals or self.content_regexes)
+        self.meta_reason = "文件名匹配" if any(self.name_capable(t) for t in self.terms) else "属性匹配"
+
+    def _has_stat_field(self, node):
+        if isinstance(node, Field):
+            return node.name in ('size', 'modified')
+        if isinstance(node, Not):
+            return self._has_stat_field(node.child)
+        if isinstance(node, (And, Or)):
+            return any(self._has_stat_field(child) for child in node.children)
+        return False
+
+    def name_capable(self, term):
+        return term.scope == 'name' or (term.scope == 'any' and self.search_filename)
+
+    def content_capable(self, term):
+        if term.kind == 'glob':
+            return False
+        return term.scope == 'content' or (term.scope == 'any' and self.search_content)
+
+    def positive_terms(self, node=None, negated=False):
+        """没有被 NOT 否定的搜索词，用于相关度排序"""
+        node = self.expr if node is None else node
+        if isinstance(node, Term):
+            return [] if negated else [node]
+        if isinstance(node, Not):
+            return self.positive_terms(node.child, not negated)
+        if isinstance(node, (And, Or)):
+            return [term for child in node.children for term in self.positive_terms(child, negated)]
+        return []
+
+    def conjunctive_literals(self):
+        """查询只由肯定的普通文字以 AND 组成时返回这些词，否则返回None"""
+        children = self.expr.children if isinstance(self.expr, And) else (self.expr,)
+        if all(isinstance(child, Term) and child.kind == 'literal' for child in children):
+            return children
+        return None
+
+    def narrows(self, other):
+        """本查询的结果是否一定包含于 other 的结果之中
+
+        两者都只由普通文字以 AND 组成、选项相同，并且 other 的每个词都被
+        本查询中同一范围的某个词包含时成立（例如 "rep" -> "report"、
+        "report" -> "report 2024"），此时可以只在 other 的结果中重新判断。
+        """
+        if (self.case_sensitive, self.search_filename, self.search_content) != \
+                (other.case_sensitive, other.search_filename, other.search_content):
+            return False
+        mine = self.conjunctive_literals()
+        theirs = other.conjunctive_literals()
+        if mine is None or theirs is None:
+            return False
+        fold = (lambda text: text) if self.case_sensitive else str.lower
+        return all(any(a.scope == b.scope and fold(b.text) in fold(a.text) for a in mine)
+                   for b in theirs)
+
+    def required_literal(self):
+        """所有匹配结果都必须在文件名或内容中包含的普通文字，用于索引预筛选"""
+        children = self.expr.children if isinstance(self.expr, And) else (self.expr,)
+        for child in children:
+            if isinstance(child, Term) and child.kind == 'literal':
+                return child
+        return None
+
+    def _evaluate(self, name, stat, content_state):
+        """按已知信息求值；stat 为None表示尚未获取，content_state(term_id) 给出内容匹配状态"""
+        name_cmp = name if self.case_sensitive else name.lower()
+        name_cache = {}
+
+        def term_value(term):
+            if self.name_capable(term):
+                matched = name_cache.get(term.id)
+                if matched is None:
+                    literal = self.name_literals.get(term.id)
+                    if literal is not None:
+                        matched = literal in name_cmp
+                    elif term.kind == 'glob':
+                        matched = self.name_patterns[term.id].match(name) is not None
+                    else:
+                        matched = self.name_patterns[term.id].search(name) is not None
+                    name_cache[term.id] = matched
+                if matched:
+                    return True
+            if not self.content_capable(term):
+                return False
+            return content_state(term.id)
+
+        def field_value(field):
+            if field.name == 'ext':
+                return split_ext(name) in field.value
+            if stat is None:
+                return None
+            if field.name == 'size':
+                return compare(stat.st_size, field.op, field.value)
+            mode, operand = field.value
+            if mode == 'age':
+                return compare(time.time() - stat.st_mtime, field.op, operand)
+            return compare(stat.st_mtime, field.op, operand)
+
+        return evaluate(self.expr, term_value, field_value)
+
+    def match_meta(self, name, get_stat):
+        """只用文件名和元数据判断：True/False，或 None 表示还需要检查内容
+
+        get_stat 只在确实需要大小或修改时间时才调用。
+        """
+        unknown = lambda term_id: None
+        value = self._evaluate(name, None, unknown)
+        if value is not None or not self.uses_stat:
+            return value
+        try:
+            stat = get_stat()
+        except OSError:
+            return False
+        return self._evaluate(name, stat, unknown)
+
+    def search_file(self, path, cancel=None, encoding=None, source=None, scanned=None):
+        """完整判断一个文件是否匹配（需要时读取内容），供执行后端调用
+
+        encoding 为文件的编码时只匹配搜索词在该编码下的字节形式；
+        source 为实际读取内容的文件（例如文档提取出的文本），文件名和
+        元数据仍取自 path。scanned 为单元素列表时把扫描过的字节数累加到其中。
+        """
+        name = os.path.basename(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        value = self._evaluate(name, stat, lambda term_id: None)
+        if value is not None:
+            return value
+        return self._scan_content(source or path, name, stat, cancel, encoding, scanned)
+
+    def _encoded(self, encoding):
+        """某种文件编码下的 (普通文字的字节形式, 解码用的编码, 窗口重叠字节数)
+
+        无法用该编码表示的普通文字不会出现在该编码的文件中，直接略过。
+        正则需要按字符匹配，在解码后的窗口文本上执行。
+        """
+        cached = self.encoded.get(encoding)
+        if cached is not None:
+            return cached
+        encodings = match_encodings(encoding)
+        literals = {}
+        overlap = 0
+        for term_id, text in self.content_literals.items():
+            variants = keyword_variants(text, self.case_sensitive, encodings)
+            if variants:
+                literals[term_id] = variants
+                overlap = max(overlap, max(len(v) for v in variants) - 1)
+        if self.content_regexes:
+            overlap = max(overlap, REGEX_OVERLAP)
+        cached = self.encoded[encoding] = (literals, encodings[0], overlap)
+        return cached
+
+    def _combine(self, literals, term_ids):
+        """把多个普通文字合并为一个带命名分组的字节正则，一遍扫描即可找到其中任意一个"""
+        if not term_ids:
+            return None
+        parts = []
+        for term_id in sorted(term_ids):
+            alternatives = b'|'.join(re.escape(v) for v in literals[term_id])
+            parts.append(b'(?P<t%d>%s)' % (term_id, alternatives))
+        return re.compile(b'|'.join(parts), 0 if self.case_sensitive else re.IGNORECASE)
+
+    def _scan_content(self, path, name, stat, cancel, encoding, scanned=None):
+        """单遍扫描文件内容，结果一旦确定立即停止"""
+        literals, codec, overlap = self._encoded(encoding)
+        found = set()
+        remaining = set(literals)
+        combined = self._combine(literals, remaining)
+
+        def decided(final):
+            state = (lambda term_id: term_id in found) if final else \
+                    (lambda term_id: True if term_id in found else None)
+            return self._evaluate(name, stat, state)
+
+        try:
+            with open(path, 'rb') as f:
+                reached = 0
+                try:
+                    for buffer, start, end in iter_windows(f, CHUNK_SIZE, overlap):
+                        if cancel is not None and cancel.cancelled:
+                            return False
+                        reached = end
+                        pos = start
+                        while combined is not None:
+                            m = combined.search(buffer, pos, end)
+                            if m is None:
+                                break
+                            term_id = int(m.lastgroup[1:])
+                            found.add(term_id)
+                            remaining.discard(term_id)
+                            value = decided(False)
+                            if value is not None:
+                                return value
+                            # 同一位置可能还有其他词，从该位置继续找剩下的词
+                            combined = self._combine(literals, remaining)
+                            pos = m.start()
+                        text = None
+                        for term_id, pattern in self.content_regexes.items():
+                            if term_id in found:
+                                continue
+                            if text is None:
+                                text = buffer[start:end].decode(codec, 'ignore')
+                            if pattern.search(text):
+                                found.add(term_id)
+                                value = decided(False)
+                                if value is not None:
+                                    return value
+                finally:
+                    # mmap 窗口不移动文件位置，按已扫描到的窗口终点计
+                    if scanned is not None:
+                        scanned[0] += max(f.tell(), reached)
+        except OSError:
+            return False
+        return decided(True) is True
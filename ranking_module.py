@@ -0,0 +1,120 @@
+"""
+结果排序模块
+负责为搜索结果计算相关度（文件名完全匹配 > 前缀匹配 > 包含 > 内容匹配，
+再叠加修改时间和目录深度的加权），并在搜索线程中用有界堆只保留前 K 名，
+匹配数量再多，送到界面的结果也只有可能进入前 K 名的那一小部分
+"""
+import os
+import math
+import time
+import heapq
+from result_view_module import Hit
+
+EXACT_SCORE = 100.0
+PREFIX_SCORE = 70.0
+SUBSTRING_SCORE = 40.0
+PATTERN_SCORE = 50.0  # 通配符或正则匹配文件名
+CONTENT_SCORE = 20.0
+OTHER_SCORE = 10.0  # 只由 ext:/size: 等条件匹配
+
+RECENCY_SCORE = 15.0  # 刚修改的文件最多加的分数
+RECENCY_DAYS = 30.0  # 加分随文件年龄按此时间常数衰减
+DEPTH_PENALTY = 1.5  # 每深一层目录扣的分数
+MAX_DEPTH_PENALTY = 15.0
+
+
+class Scorer:
+    """按查询中的肯定搜索词给结果打分，编译一次后对所有结果重复使用
+
+    roots 为搜索的根目录列表，目录深度从结果所在的根目录算起。
+    """
+
+    def __init__(self, query, roots):
+        # 较长的根目录在前，嵌套时按最近的根目录计算深度
+        self.roots = sorted((os.path.abspath(root).rstrip(os.sep) for root in roots),
+                            key=len, reverse=True)
+        self.now = time.time()
+        self.case_sensitive = query.case_sensitive
+        self.literals = []
+        self.patterns = []
+        for term in query.positive_terms():
+            if not query.name_capable(term):
+                continue
+            if term.kind == 'literal':
+                self.literals.append(query.name_literals[term.id])
+            else:
+                self.patterns.append((term.kind, query.name_patterns[term.id]))
+
+    def name_score(self, name):
+        name_cmp = name if self.case_sensitive else name.lower()
+        stem = name_cmp.rsplit('.', 1)[0] if '.' in name_cmp[1:] else name_cmp
+        best = 0.0
+        for text in self.literals:
+            if name_cmp == text or stem == text:
+                return EXACT_SCORE
+            if name_cmp.startswith(text):
+                best = max(best, PREFIX_SCORE)
+            elif text in name_cmp:
+                best = max(best, SUBSTRING_SCORE)
+        if best < PATTERN_SCORE:
+            for kind, pattern in self.patterns:
+                found = pattern.match(name) if kind == 'glob' else pattern.search(name)
+                if found:
+                    best = PATTERN_SCORE
+                    break
+        return best
+
+    def __call__(self, hit):
+        if hit.reason == "内容匹配":
+            score = CONTENT_SCORE
+        else:
+            score = self.name_score(hit.path.rpartition(os.sep)[2]) or OTHER_SCORE
+        if hit.mtime >= 0:
+            age_days = max(0.0, self.now - hit.mtime) / 86400
+            score += RECENCY_SCORE * math.exp(-age_days / RECENCY_DAYS)
+        score -= min(MAX_DEPTH_PENALTY, DEPTH_PENALTY * self.depth(hit.path))
+        return score
+
+    def depth(self, path):
+        for root in self.roots:
+            if path.startswith(root) and path[len(root):len(root) + 1] == os.sep:
+                return path.count(os.sep, len(root) + 1)
+        return 0
+
+
+class RankedResults:
+    """搜索线程一侧的结果出口
+
+    put() 接收结果和控制消息：结果打分后只有能进入当前前 limit 名的才放入
+    队列（界面一侧的 ResultStore 按同样的规则淘汰），total 记录全部匹配数。
+    全部匹配结果不超过 keep 条时另外完整保留在 matched 中，供下一次更严格的
+    查询直接在其中筛选；超过时 matched 为None。
+    """
+
+    def __init__(self, queue, scorer, limit, keep=0):
+        self.queue = queue
+        self.scorer = scorer
+        self.limit = limit
+        self.keep = keep
+        self.heap = []
+        self.total = 0
+        self.matched = [] if keep else None
+
+    def put(self, item):
+        if not isinstance(item, Hit):
+            self.queue.put(item)
+            return
+        self.total += 1
+        if self.matched is not None:
+            if len(self.matched) < self.keep:
+                self.matched.append(item)
+            else:
+                self.matched = None
+        score = self.scorer(item)
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, score)
+        elif score > self.heap[0]:
+            heapq.heapreplace(self.heap, score)
+        else:
+            return
+        self.queue.put(item._replace(score=score))
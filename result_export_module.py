@@ -0,0 +1,146 @@
+"""
+结果导出模块
+负责把 ResultStore 中的搜索结果导出为 CSV、JSONL 或紧凑的列式结果集文件（.fsr），
+结果集文件直接保存各列的数组，载入时无需解析逐行文本，也不需要重新遍历目录
+"""
+import os
+import sys
+import csv
+import json
+import time
+import zlib
+import struct
+from array import array
+from result_view_module import ResultStore, format_time, file_type
+
+RESULT_SET_EXT = '.fsr'
+MAGIC = b'FSRS'
+VERSION = 1
+# 文件头：魔数、版本、元数据长度、各列压缩后的长度
+HEADER = struct.Struct('<4sHI5Q')
+
+EXPORT_FORMATS = (
+    ("结果集", '*' + RESULT_SET_EXT),
+    ("CSV 表格", '*.csv'),
+    ("JSON Lines", '*.jsonl'),
+)
+
+
+def display_order(store):
+    """按当前显示顺序产出存储下标"""
+    for display_index in range(len(store)):
+        yield store.index(display_index)
+
+
+def export_csv(store, path):
+    """导出为 CSV；使用带 BOM 的 UTF-8，Excel 可以直接打开中文"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['文件名', '路径', '大小(字节)', '修改时间', '类型', '相关度', '匹配方式'])
+        for i in display_order(store):
+            path_i = store.paths[i]
+            writer.writerow([os.path.basename(path_i), path_i, store.sizes[i],
+                             format_time(store.mtimes[i]), file_type(path_i),
+                             f"{store.scores[i]:.1f}", store.reason_names[store.reasons[i]]])
+
+
+def export_jsonl(store, path):
+    """导出为 JSON Lines，每行一条结果"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in display_order(store):
+            f.write(json.dumps({'path': store.paths[i], 'size': store.sizes[i],
+                                'mtime': store.mtimes[i], 'score': store.scores[i],
+                                'reason': store.reason_names[store.reasons[i]]},
+                               ensure_ascii=False))
+            f.write('\n')
+
+
+def _column_bytes(values):
+    """数组按小端序取字节"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _column_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def save_result_set(store, path, meta=None):
+    """保存为列式结果集文件
+
+    路径列以 NUL 分隔，数值列直接保存数组内容，各列分别用 zlib 压缩。
+    meta 为附带保存的搜索信息（查询语句、根目录等），载入时原样返回。
+    """
+    meta = dict(meta or {})
+    meta['saved_at'] = time.time()
+    meta['reasons'] = store.reason_names
+    meta['count'] = len(store)
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    columns = [
+        '\0'.join(store.paths).encode('utf-8', 'surrogateescape'),
+        _column_bytes(store.sizes),
+        _column_bytes(store.mtimes),
+        store.reasons.tobytes(),
+        _column_bytes(store.scores),
+    ]
+    columns = [zlib.compress(data, 6) for data in columns]
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(meta_bytes), *(len(data) for data in columns)))
+        f.write(meta_bytes)
+        for data in columns:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def load_result_set(path):
+    """载入结果集文件，返回 (ResultStore, meta)，格式不符时抛出 ValueError"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("不是有效的结果集文件")
+        magic, version, meta_len, *lengths = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("不是有效的结果集文件")
+        if version > VERSION:
+            raise ValueError(f"结果集文件版本 {version} 过新")
+        meta = json.loads(f.read(meta_len).decode('utf-8'))
+        try:
+            columns = [zlib.decompress(f.read(length)) for length in lengths]
+        except zlib.error as e:
+            raise ValueError(f"结果集文件已损坏: {e}") from None
+
+    count = meta.get('count', 0)
+    store = ResultStore()
+    store.paths = columns[0].decode('utf-8', 'surrogateescape').split('\0') if count else []
+    store.sizes = _column_array('q', columns[1])
+    store.mtimes = _column_array('d', columns[2])
+    store.reasons = _column_array('B', columns[3])
+    store.scores = _column_array('d', columns[4])
+    lengths = {len(store.paths), len(store.sizes), len(store.mtimes), len(store.reasons), len(store.scores)}
+    if lengths != {count}:
+        raise ValueError("结果集文件已损坏: 各列长度不一致")
+    store.reason_names = list(meta.get('reasons', []))
+    store.reason_codes = {name: code for code, name in enumerate(store.reason_names)}
+    store.total = count
+    store.sort_column = '相关度'
+    store.stale = True
+    return store, meta
+
+
+def export_results(store, path, meta=None):
+    """按扩展名选择导出格式"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        export_csv(store, path)
+    elif ext == '.jsonl':
+        export_jsonl(store, path)
+    else:
+        save_result_set(store, path, meta)
@@ -0,0 +1,352 @@
+"""
+结果列表模块
+负责以列式结构保存搜索结果，并提供只为可见行创建控件的虚拟结果列表
+"""
+import tkinter as tk
+from tkinter import ttk
+import os
+import time
+import heapq
+from array import array
+from collections import namedtuple
+
+# 搜索线程产出的单条结果；大小或时间未知时为 -1，score 为相关度
+Hit = namedtuple('Hit', 'path size mtime reason score', defaults=(0.0,))
+
+
+def format_size(size_bytes):
+    """格式化文件大小"""
+    if size_bytes < 0:
+        return "未知"
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    elif size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    elif size_bytes < 1024 * 1024 * 1024:
+        return f"{size_bytes / (1024 * 1024):.1f} MB"
+    else:
+        return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+
+
+def format_time(timestamp):
+    """格式化修改时间"""
+    if timestamp < 0:
+        return "未知"
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def file_type(path):
+    """显示用的文件类型（大写扩展名）"""
+    return os.path.splitext(path)[1].upper().lstrip('.')
+
+
+class ResultStore:
+    """列式结果存储
+
+    每条结果只占用一个路径字符串和几个定长数值，文件名、格式化的大小
+    和时间等显示字段在真正显示时才计算。排序只重排下标数组。
+
+    设置 limit 时只保留相关度最高的 limit 条：用按相关度的最小堆找出
+    最低分的一条，新结果分数更高时原地替换它。total 为收到的结果总数。
+    """
+
+    def __init__(self, limit=None):
+        self.paths = []
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.reasons = array('B')
+        self.scores = array('d')
+        self.reason_names = []
+        self.reason_codes = {}
+        self.order = None  # 排序后的显示顺序，None 表示按添加顺序
+        self.positions = None  # 路径 -> 存储下标，按需建立
+        self.limit = limit
+        self.heap = []  # (相关度, 存储下标)，只在设置 limit 时维护
+        self.total = 0
+        self.sort_column = '相关度' if limit is not None else None
+        self.stale = False  # 内容变化后显示顺序需要重新排序
+
+    def __len__(self):
+        return len(self.paths)
+
+    def reason_code(self, reason):
+        code = self.reason_codes.get(reason)
+        if code is None:
+            code = self.reason_codes[reason] = len(self.reason_names)
+            self.reason_names.append(reason)
+        return code
+
+    def append(self, hit):
+        """添加一条结果；已满且分数不高于最低分时丢弃，返回是否保留"""
+        self.total += 1
+        if self.limit is not None and len(self.paths) >= self.limit:
+            if not self.heap or hit.score <= self.heap[0][0]:
+                return False
+            _, i = heapq.heapreplace(self.heap, (hit.score, self.heap[0][1]))
+            if self.positions is not None:
+                self.positions.pop(self.paths[i], None)
+                self.positions[hit.path] = i
+            self._set(i, hit)
+            self.stale = True
+            return True
+
+        if self.limit is not None:
+            heapq.heappush(self.heap, (hit.score, len(self.paths)))
+        if self.sort_column is not None:
+            self.stale = True
+        elif self.order is not None:
+            self.order.append(len(self.paths))
+        if self.positions is not None:
+            self.positions[hit.path] = len(self.paths)
+        self.paths.append(hit.path)
+        self.sizes.append(hit.size)
+        self.mtimes.append(hit.mtime)
+        self.reasons.append(self.reason_code(hit.reason))
+        self.scores.append(hit.score)
+        return True
+
+    def _set(self, i, hit):
+        self.paths[i] = hit.path
+        self.sizes[i] = hit.size
+        self.mtimes[i] = hit.mtime
+        self.reasons[i] = self.reason_code(hit.reason)
+        self.scores[i] = hit.score
+
+    def _rebuild_heap(self):
+        if self.limit is not None:
+            self.heap = [(score, i) for i, score in enumerate(self.scores)]
+            heapq.heapify(self.heap)
+
+    def position(self, path):
+        """路径对应的存储下标，不存在时返回None"""
+        if self.positions is None:
+            self.positions = {p: i for i, p in enumerate(self.paths)}
+        return self.positions.get(path)
+
+    def upsert(self, hit):
+        """已存在的结果就地更新，否则追加"""
+        i = self.position(hit.path)
+        if i is None:
+            self.append(hit)
+            return
+        self._set(i, hit)
+        self._rebuild_heap()
+        self.stale = self.sort_column is not None
+
+    def remove(self, paths, dir_prefixes=()):
+        """删除指定路径以及指定目录下的结果，返回删除的条数"""
+        prefixes = tuple(p.rstrip(os.sep) + os.sep for p in dir_prefixes)
+        keep = [i for i, p in enumerate(self.paths)
+                if p not in paths and not (prefixes and p.startswith(prefixes))]
+        removed = len(self.paths) - len(keep)
+        if not removed:
+            return 0
+
+        new_index = {old: new for new, old in enumerate(keep)}
+        self.paths = [self.paths[i] for i in keep]
+        self.sizes = array('q', (self.sizes[i] for i in keep))
+        self.mtimes = array('d', (self.mtimes[i] for i in keep))
+        self.reasons = array('B', (self.reasons[i] for i in keep))
+        self.scores = array('d', (self.scores[i] for i in keep))
+        if self.order is not None:
+            self.order = array('L', (new_index[i] for i in self.order if i in new_index))
+        self.positions = None
+        self.total -= removed
+        self._rebuild_heap()
+        return removed
+
+    def clear(self):
+        self.__init__(self.limit)
+
+    def index(self, display_index):
+        """显示位置对应的存储下标"""
+        if self.stale:
+            self.sort(self.sort_column)
+        if self.order is None:
+            return display_index
+        return self.order[display_index]
+
+    def hit(self, display_index):
+        i = self.index(display_index)
+        return Hit(self.paths[i], self.sizes[i], self.mtimes[i],
+                   self.reason_names[self.reasons[i]], self.scores[i])
+
+    def row(self, display_index):
+        """显示位置对应的一行显示值"""
+        i = self.index(display_index)
+        path = self.paths[i]
+        return (os.path.basename(path), path, format_size(self.sizes[i]),
+                format_time(self.mtimes[i]), file_type(path), f"{self.scores[i]:.0f}")
+
+    def sort(self, column):
+        """按列排序（相关度降序，其余列升序），之后新增的结果也按此排序"""
+        paths = self.paths
+        scores = self.scores
+        sort_keys = {
+            '相关度': lambda i: -scores[i],
+            '文件名': lambda i: os.path.basename(paths[i]),
+            '路径': paths.__getitem__,
+            '大小': self.sizes.__getitem__,
+            '修改时间': self.mtimes.__getitem__,
+            '类型': lambda i: file_type(paths[i])
+        }
+        self.sort_column = column if column in sort_keys else '文件名'
+        self.order = array('L', sorted(range(len(paths)), key=sort_keys[self.sort_column]))
+        self.stale = False
+
+
+class VirtualResultList(tk.Frame):
+    """虚拟结果列表
+
+    内部的 Treeview 只保留可见数量的行，滚动时复用这些行并改写其内容，
+    所以控件数量和内存占用与结果总数无关。
+    """
+
+    def __init__(self, master, columns, column_widths, on_sort=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.store = ResultStore()
+        self.offset = 0
+        self.visible_rows = 15
+        self.row_items = []
+        self.selected = None
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings',
+                                 height=self.visible_rows, selectmode='browse')
+        for col in columns:
+            if on_sort:
+                self.tree.heading(col, text=col, command=lambda c=col: on_sort(c))
+            else:
+                self.tree.heading(col, text=col)
+            self.tree.column(col, width=column_widths[col])
+
+        # 纵向滚动条由本类根据 offset 自行维护
+        self.v_scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.h_scrollbar = ttk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.h_scrollbar.set)
+
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.v_scrollbar.grid(row=0, column=1, sticky='ns')
+        self.h_scrollbar.grid(row=1, column=0, sticky='ew')
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<MouseWheel>', self.on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self.move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self.move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self.move_selection(self.visible_rows))
+
+    def row_height(self):
+        style = ttk.Style(self)
+        try:
+            return int(style.lookup('Treeview', 'rowheight') or 20)
+        except (tk.TclError, ValueError):
+            return 20
+
+    def on_resize(self, event):
+        """窗口大小变化时重新计算可见行数"""
+        row_height = self.row_height()
+        header = row_height + 4
+        if self.row_items:
+            bbox = self.tree.bbox(self.row_items[0])
+            if bbox:
+                header = bbox[1]
+        rows = max(1, (event.height - header) // row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+
+    def set_store(self, store):
+        self.store = store
+        self.offset = 0
+        self.selected = None
+        self.refresh()
+
+    def clear(self):
+        self.set_store(ResultStore())
+
+    def refresh(self):
+        """按当前 offset 改写可见行的内容"""
+        total = len(self.store)
+        rows = self.visible_rows
+        self.offset = max(0, min(self.offset, total - rows))
+        needed = min(rows, total - self.offset)
+
+        while len(self.row_items) < needed:
+            self.row_items.append(self.tree.insert('', 'end'))
+        while len(self.row_items) > needed:
+            self.tree.delete(self.row_items.pop())
+
+        for k, item in enumerate(self.row_items):
+            self.tree.item(item, values=self.store.row(self.offset + k))
+
+        if self.selected is not None and self.offset <= self.selected < self.offset + needed:
+            item = self.row_items[self.selected - self.offset]
+            if self.tree.selection() != (item,):
+                self.tree.selection_set(item)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        if total:
+            self.v_scrollbar.set(self.offset / total, (self.offset + needed) / total)
+        else:
+            self.v_scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """纵向滚动条回调"""
+        total = len(self.store)
+        if args[0] == 'moveto':
+            self.offset = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.visible_rows
+            self.offset += step
+        self.refresh()
+
+    def scroll(self, units):
+        self.offset += units
+        self.refresh()
+        return 'break'
+
+    def on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        # 滚出可见范围时清除的控件选择不影响逻辑上的选中项
+        if selection and selection[0] in self.row_items:
+            self.selected = self.offset + self.row_items.index(selection[0])
+
+    def move_selection(self, step):
+        """键盘移动选中项，必要时滚动"""
+        total = len(self.store)
+        if not total:
+            return 'break'
+        if self.selected is None:
+            self.selected = self.offset
+        else:
+            self.selected = max(0, min(total - 1, self.selected + step))
+        if self.selected < self.offset:
+            self.offset = self.selected
+        elif self.selected >= self.offset + self.visible_rows:
+            self.offset = self.selected - self.visible_rows + 1
+        self.refresh()
+        return 'break'
+
+    def selected_index(self):
+        """当前选中结果的显示位置，未选中时返回None"""
+        if self.selected is None or self.selected >= len(self.store):
+            return None
+        return self.selected
+
+    def selected_row(self):
+        """当前选中结果的显示值，未选中时返回None"""
+        index = self.selected_index()
+        if index is None:
+            return None
+        return self.store.row(index)
@@ -0,0 +1,665 @@
+"""
+搜索引擎模块
+负责不依赖界面的文件搜索：目录遍历、索引查询、内容匹配和索引维护都在这里完成，
+检索窗口只是它的一个客户端。提供生成器接口 search() 和输出 JSON 的命令行入口:
+
+    python search_engine_module.py ~/projects -q "config AND ext:py" --limit 20
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import itertools
+from collections import namedtuple
+from result_view_module import Hit
+from file_index_module import FileIndex, split_ext
+from content_index_module import ContentIndex
+from file_walker_module import walk_files, CancelToken, DEFAULT_WORKERS
+from content_match_module import ContentSearchExecutor
+from query_module import CompiledQuery, QueryError, FileMeta
+from file_type_module import FileClassifier
+from document_module import DocumentExtractor, EXTRACTORS
+from ranking_module import Scorer, RankedResults
+from search_scope_module import SearchScope, DEFAULT_EXCLUDES
+from search_stats_module import SearchStats, MeteredSink
+
+# 文件类型下拉框选项 -> 扩展名集合，None 表示不过滤
+FILE_TYPES = {
+    "所有文件": None,
+    "文本文件(.txt)": frozenset({'.txt'}),
+    "文档文件(.doc,.docx,.pdf)": frozenset({'.doc', '.docx', '.pdf', '.rtf'}),
+    "图片文件(.jpg,.png,.gif)": frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp'}),
+    "音频文件(.mp3,.wav)": frozenset({'.mp3', '.wav', '.flac', '.aac'}),
+    "视频文件(.mp4,.avi)": frozenset({'.mp4', '.avi', '.mov', '.mkv'})
+}
+
+CONTENT_MODES = ('process', 'thread', 'inline')
+STATUS_INTERVAL = 0.1  # 遍历时报告进度的最短间隔（秒）
+
+
+class SearchError(Exception):
+    """搜索过程中出现的错误（索引正在建立、读取失败等）"""
+
+
+class SearchPlan(namedtuple('SearchPlan', 'scope query extensions workers classifier extractor')):
+    """搜索开始时确定的全部设置
+
+    后台线程只读取这份不可变的快照，不再访问 Tk 变量；逐个文件的类型
+    判断只是对文件名取扩展名后查一次 frozenset。
+    """
+
+    __slots__ = ()
+
+    def match_type(self, name):
+        """文件名是否符合类型过滤"""
+        return self.extensions is None or split_ext(name) in self.extensions
+
+    def content_encoding(self, path, stat=None):
+        """查询仍需内容才能确定时使用：文本文件返回其编码，二进制文件返回None"""
+        return self.classifier.encoding(path, stat)
+
+    def is_document(self, name):
+        """是否为需要先提取文本的文档（docx、pdf 等）"""
+        return self.extractor.can_extract(name)
+
+    def document_extensions(self):
+        """参与搜索的文档扩展名"""
+        extensions = frozenset(EXTRACTORS)
+        return extensions if self.extensions is None else extensions & self.extensions
+
+    def narrows(self, other):
+        """本次搜索的结果是否一定包含于 other 的结果之中"""
+        return (self.scope == other.scope and self.extensions == other.extensions
+                and self.query.narrows(other.query))
+
+    def document_items(self, paths, cancel=None):
+        """提取（或从缓存读取）文档文本，产出交给执行后端的 (路径, 编码, 文本文件)"""
+        for path, text_path in self.extractor.run(paths, cancel):
+            yield path, 'utf-8', text_path
+
+
+# search() 的选项；extensions 为小写含点的扩展名集合，None 表示不过滤；
+# max_index_age 见 SearchEngine.run()，默认每次搜索前都增量刷新索引
+SearchOptions = namedtuple('SearchOptions',
+                           'search_filename search_content case_sensitive extensions use_index '
+                           'workers content_mode exclude_text skip_network max_index_age',
+                           defaults=(True, False, False, None, True,
+                                     DEFAULT_WORKERS, 'process', DEFAULT_EXCLUDES, True, 0.0))
+
+
+def stat_hit(file_path, reason):
+    """获取文件信息，构造一条搜索结果"""
+    try:
+        stat = os.stat(file_path)
+        return Hit(file_path, stat.st_size, stat.st_mtime, reason)
+    except OSError:
+        return Hit(file_path, -1, -1.0, reason)
+
+
+def entry_hit(entry, reason):
+    """根据遍历得到的 DirEntry 构造搜索结果，复用其缓存的 stat 结果"""
+    try:
+        stat = entry.stat()
+        return Hit(entry.path, stat.st_size, stat.st_mtime, reason)
+    except OSError:
+        return stat_hit(entry.path, reason)
+
+
+class SearchEngine:
+    """搜索引擎：持有各根目录的索引、文本识别缓存、文档提取进程池和内容匹配后端
+
+    run() 在调用它的线程中同步执行一次搜索，把 Hit 和控制消息
+    ('done', 扫描文件数) / ('error', 说明) 逐个交给 sink.put()；
+    status(文字) 用于报告进度，统计数据记录在 SearchStats 中。
+    同一个引擎可以被多个线程先后使用。
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.classifier = FileClassifier(cache_dir)
+        self.extractor = DocumentExtractor(cache_dir)
+        self.file_indexes = {}  # 根目录 -> FileIndex
+        self.content_indexes = {}  # 根目录 -> ContentIndex
+        self.content_executor = None
+        self.index_refreshing = False
+        self.refresh_lock = threading.Lock()  # 同一时间只有一个线程刷新索引
+        self.lock = threading.Lock()
+
+    def plan(self, scope, query, extensions=None, workers=DEFAULT_WORKERS):
+        return SearchPlan(scope, query, extensions, workers, self.classifier, self.extractor)
+
+    def get_index(self, root):
+        """获取根目录对应的文件索引"""
+        with self.lock:
+            index = self.file_indexes.get(root)
+            if index is None:
+                index = self.file_indexes[root] = FileIndex(root, self.cache_dir)
+            return index
+
+    def get_content_index(self, root):
+        """获取根目录对应的内容索引"""
+        with self.lock:
+            content_index = self.content_indexes.get(root)
+            if content_index is None:
+                content_index = self.content_indexes[root] = ContentIndex(root, self.cache_dir)
+            return content_index
+
+    def get_content_executor(self, mode='process'):
+        """获取内容匹配执行后端，切换方式时重建"""
+        with self.lock:
+            if self.content_executor is None or self.content_executor.mode != mode:
+                if self.content_executor is not None:
+                    self.content_executor.shutdown()
+                self.content_executor = ContentSearchExecutor(mode)
+            return self.content_executor
+
+    def index_age(self, scope):
+        """各根目录中最旧的索引年龄（秒），有未建立的索引时返回None"""
+        ages = [self.get_index(root).age() for root in scope.roots]
+        return None if None in ages else max(ages)
+
+    def build_index(self, scope, token, status=None):
+        """依次增量刷新各根目录的文件名索引
+
+        各根目录共用一份已进入目录的记录，绑定挂载等重复的目录只收录一次。
+        其他线程正在刷新时（例如被新的按键取消、尚未退出的上一次搜索）
+        先等它结束再接着刷新；等待中被取消时直接返回。
+        返回 (检查目录数, 重新扫描目录数) 的合计。
+        """
+        done = [0, 0]
+        while not self.refresh_lock.acquire(timeout=0.05):
+            if token.cancelled:
+                return 0, 0
+
+        def progress(checked, rescanned):
+            if status is not None:
+                status(f"正在更新索引: 已检查 {checked + done[0]} 个目录，"
+                       f"重新扫描 {rescanned + done[1]} 个...")
+
+        self.index_refreshing = True
+        try:
+            for root, scan_filter in scope.filters():
+                if token.cancelled:
+                    break
+                checked, rescanned = self.get_index(root).refresh(
+                    progress=progress, cancel=token, scan_filter=scan_filter)
+                done[0] += checked
+                done[1] += rescanned
+            return done[0], done[1]
+        finally:
+            self.index_refreshing = False
+            self.refresh_lock.release()
+
+    def build_content_index(self, scope, token, status=None):
+        """根据各根目录文件名索引中的文本文件增量更新内容索引"""
+        def progress(checked, total):
+            if status is not None:
+                status(f"正在建立内容索引: {checked}/{total} 个文件...")
+
+        for root in scope.roots:
+            if token.cancelled:
+                return
+            paths = [path for path in self.get_index(root).paths() if self.classifier.is_text(path)]
+            self.classifier.flush()
+            self.get_content_index(root).update(paths, progress=progress, cancel=token,
+                                                encoding_of=self.classifier.encoding)
+
+    def content_index_built(self, scope):
+        return any(self.get_content_index(root).is_built() for root in scope.roots)
+
+    def apply_events(self, scope, root, events):
+        """把某个根目录的文件监视事件增量应用到它的索引（正在刷新时跳过）"""
+        if self.index_refreshing:
+            return
+        index = self.file_indexes.get(root)
+        if index is not None and index.is_built():
+            index.apply_events(events, scope.filter(root))
+        content_index = self.content_indexes.get(root)
+        if content_index is not None and content_index.is_built():
+            content_index.apply_events(events, self.classifier.encoding)
+
+    def evaluate(self, plan, path):
+        """按搜索条件判断单个文件，匹配时返回 Hit，否则返回None"""
+        name = os.path.basename(path)
+        if not plan.match_type(name):
+            return None
+
+        query = plan.query
+        matched = query.match_meta(name, lambda: os.stat(path))
+        if matched:
+            return stat_hit(path, query.meta_reason)
+        if matched is None:
+            if plan.is_document(name):
+                for _, encoding, text_path in plan.document_items([path]):
+                    if query.search_file(path, encoding=encoding, source=text_path):
+                        return stat_hit(path, "内容匹配")
+                return None
+            encoding = plan.content_encoding(path)
+            if encoding is not None and query.search_file(path, encoding=encoding):
+                return stat_hit(path, "内容匹配")
+        return None
+
+    def run(self, plan, sink, token, use_index=True, content_mode='process', candidates=None,
+            status=None, stats=None, stats_log=None, preview=None, max_index_age=None):
+        """执行一次搜索，返回其 SearchStats
+
+        candidates 为 Hit 列表时只在其中重新判断（缩小范围、载入的结果集），
+        否则使用索引或遍历目录。stats 为None时新建；stats_log 为日志文件路径时
+        搜索结束（包括取消和出错）后把统计追加到其中。统计在发出 done 之前完成。
+        preview 为行数时（边输入边搜索），缩小范围和索引查询判断完这么多行后
+        先发出 ('preview', 估计的匹配数)，其余的行随后继续判断。
+        使用索引时，未建立或排除规则变化的索引总是先增量刷新；max_index_age 为
+        秒数时，早于这一时间的索引也先按目录修改时间增量刷新（0 表示每次都刷新）。
+        根目录不存在时报告错误。
+        """
+        if candidates is not None:
+            mode = 'narrow'
+        else:
+            mode = 'index' if use_index else 'walk'
+        if stats is None:
+            stats = SearchStats()
+        stats.info.update(mode=mode, roots=list(plan.scope.roots), query=plan.query.text,
+                          extensions=None if plan.extensions is None else sorted(plan.extensions),
+                          workers=plan.workers, content_mode=content_mode)
+        classifier_before = (plan.classifier.cache_hits, plan.classifier.sniffed)
+        extractor_before = (plan.extractor.cache_hits, plan.extractor.extracted)
+        metered = MeteredSink(sink, stats)
+        outcome = 'error'
+        try:
+            missing = [root for root in plan.scope.roots if not os.path.isdir(root)]
+            if missing:
+                raise SearchError(f"目录不存在: {', '.join(missing)}")
+            executor = self.get_content_executor(content_mode)
+            if mode == 'narrow':
+                scanned = self.search_candidates(plan, candidates, metered, token, executor, stats,
+                                                 preview)
+            elif mode == 'index':
+                scanned = self.search_with_index(plan, metered, token, executor, status, stats,
+                                                 preview, max_index_age)
+            else:
+                scanned = self.search_walk(plan, metered, token, executor, status, stats)
+            plan.classifier.flush()
+            outcome = 'cancelled' if token.cancelled else 'done'
+        except Exception as e:
+            if not token.cancelled:
+                outcome = 'error'
+                stats.info['error'] = str(e)
+            else:
+                outcome = 'cancelled'
+        finally:
+            stats.sniff_hits = plan.classifier.cache_hits - classifier_before[0]
+            stats.sniff_misses = plan.classifier.sniffed - classifier_before[1]
+            stats.extract_hits = plan.extractor.cache_hits - extractor_before[0]
+            stats.extract_misses = plan.extractor.extracted - extractor_before[1]
+            stats.finish(outcome)
+            if stats_log:
+                try:
+                    stats.append_to_log(stats_log)
+                except OSError:
+                    pass
+
+        if outcome == 'done':
+            sink.put(('done', scanned))
+        elif outcome == 'error':
+            sink.put(('error', stats.info['error']))
+        return stats
+
+    def search_walk(self, plan, sink, token, executor, status, stats):
+        """遍历目录：文件名匹配的直接产出结果，需要检查内容的文件交给执行后端
+
+        文档在遍历结束后统一提取文本（已缓存的直接使用）再交给执行后端。
+        遍历所花的时间计入 walk_time，其余等待内容匹配的时间计入 content_time。
+        """
+        query = plan.query
+        file_count = 0
+
+        def content_candidates():
+            nonlocal file_count
+            documents = []
+            match_type = plan.match_type
+            content_encoding = plan.content_encoding
+            match_meta = query.match_meta
+            next_status = time.perf_counter() + STATUS_INTERVAL
+            entries = itertools.chain.from_iterable(
+                walk_files(root, workers=plan.workers, cancel=token, scan_filter=scan_filter, stats=stats)
+                for root, scan_filter in plan.scope.filters())
+            for entry in entries:
+                if token.cancelled:
+                    return
+                file_count += 1
+                # 每100个文件检查一次时间，进度最多每 STATUS_INTERVAL 秒报告一次
+                if status is not None and file_count % 100 == 0 and time.perf_counter() >= next_status:
+                    status(f"已扫描 {file_count} 个文件...")
+                    next_status = time.perf_counter() + STATUS_INTERVAL
+
+                # 文件类型过滤
+                name = entry.name
+                if not match_type(name):
+                    continue
+
+                # 先用文件名和元数据判断，无法确定时才检查文件内容
+                def get_stat(entry=entry):
+                    stats.stat_calls += 1
+                    return entry.stat()
+
+                matched = match_meta(name, get_stat)
+                if matched:
+                    sink.put(entry_hit(entry, query.meta_reason))
+                elif matched is None:
+                    if plan.is_document(name):
+                        documents.append(entry.path)
+                        continue
+                    encoding = content_encoding(entry.path, get_stat)
+                    if encoding is not None:
+                        stats.content_files += 1
+                        yield entry.path, encoding
+
+            stats.content_files += len(documents)
+            yield from plan.document_items(documents, token)
+
+        start = time.perf_counter()
+        for path in executor.run(query, stats.timed(content_candidates(), 'walk_time'), token, stats):
+            sink.put(stat_hit(path, "内容匹配"))
+        stats.files = file_count
+        stats.content_time = max(0.0, time.perf_counter() - start - stats.walk_time)
+        return file_count
+
+    def search_candidates(self, plan, hits, sink, token, executor, stats, preview=None):
+        """在给定的结果中按新查询重新判断，不再遍历目录或查询索引"""
+        query = plan.query
+        content_paths = []
+        documents = []
+        start = time.perf_counter()
+        stats.files = len(hits)
+        found = 0
+        for examined, hit in enumerate(hits, 1):
+            if token.cancelled:
+                return len(hits)
+            if examined == preview:
+                sink.put(('preview', round(found * len(hits) / examined)))
+            name = os.path.basename(hit.path)
+            matched = query.match_meta(name, lambda: FileMeta(hit.size, hit.mtime))
+            if matched:
+                found += 1
+                sink.put(Hit(hit.path, hit.size, hit.mtime, query.meta_reason))
+            elif matched is None:
+                if plan.is_document(name):
+                    documents.append(hit.path)
+                    continue
+                encoding = plan.content_encoding(hit.path)
+                if encoding is not None:
+                    content_paths.append((hit.path, encoding))
+        stats.walk_time = time.perf_counter() - start
+        self.match_contents(plan, sink, token, executor, stats, content_paths, documents)
+        return len(hits)
+
+    def match_contents(self, plan, sink, token, executor, stats, content_paths, documents):
+        """检查已收集的文本文件和文档的内容，耗时计入 content_time"""
+        start = time.perf_counter()
+        stats.content_files += len(content_paths) + len(documents)
+        content_items = itertools.chain(content_paths, plan.document_items(documents, token))
+        for path in executor.run(plan.query, content_items, token, stats):
+            sink.put(stat_hit(path, "内容匹配"))
+        stats.content_time += time.perf_counter() - start
+
+    def search_with_index(self, plan, sink, token, executor, status, stats, preview=None,
+                          max_index_age=None):
+        """通过持久化索引执行搜索
+
+        查询中必须出现的普通文字用于预筛选：文件名候选来自文件索引，
+        内容候选来自倒排索引；没有这样的文字时逐个判断索引中的全部文件。
+        文件类型过滤直接下推到索引查询中。
+        """
+        query = plan.query
+        scope = plan.scope
+        indexes = [(self.get_index(root), self.get_content_index(root)) for root in scope.roots]
+        literal = query.required_literal()
+        start = time.perf_counter()
+
+        def query_all(keyword, case_sensitive, extensions):
+            """依次查询各根目录的文件名索引"""
+            return itertools.chain.from_iterable(
+                index.query(keyword, case_sensitive, extensions) for index, _ in indexes)
+
+        def stale(index):
+            if not index.is_built() or not index.scope_matches(scope.fingerprint):
+                return True
+            return max_index_age is not None and index.age() >= max_index_age
+
+        # 未建立、排除规则已变化或过旧的索引先增量刷新（只重新列举修改过的目录）
+        rebuilt = False
+        if any(stale(index) for index, _ in indexes):
+            checked, _ = self.build_index(scope, token, status)
+            stats.count('dirs', checked)
+            rebuilt = True
+        if ((query.needs_content and not all(content_index.is_built() for _, content_index in indexes))
+                or (rebuilt and self.content_index_built(scope))):
+            self.build_content_index(scope, token, status)
+
+        if literal is None:
+            keyword, case_sensitive = '', False
+        elif query.name_capable(literal):
+            keyword, case_sensitive = literal.text, query.case_sensitive
+        else:
+            keyword = None
+        rows = [] if keyword is None else query_all(keyword, case_sensitive, plan.extensions)
+
+        seen = set()
+        content_paths = []
+        documents = []
+        found = 0
+        for name, path, size, mtime in rows:
+            if token.cancelled:
+                return 0
+            stats.files += 1
+            if stats.files == preview:
+                # 结果行数按抽样估计，已判断的行中的匹配比例推及其余的行
+                estimate = sum(index.estimate(keyword, case_sensitive, plan.extensions)
+                               for index, _ in indexes)
+                sink.put(('preview', max(found, round(found * estimate / preview))))
+            seen.add(path)
+            matched = query.match_meta(name, lambda: FileMeta(size, mtime))
+            if matched:
+                found += 1
+                sink.put(Hit(path, size, mtime, query.meta_reason))
+            elif matched is None:
+                if plan.is_document(name):
+                    documents.append(path)
+                    continue
+                encoding = plan.content_encoding(path)
+                if encoding is not None:
+                    content_paths.append((path, encoding))
+
+        # 文件名中没有该文字的文件只能在内容中包含它
+        if literal is not None and query.content_capable(literal):
+            candidates = itertools.chain.from_iterable(
+                content_index.candidates(literal.text) for _, content_index in indexes)
+            for path in candidates:
+                if token.cancelled:
+                    return 0
+                name = os.path.basename(path)
+                if path in seen or not plan.match_type(name) or plan.is_document(name):
+                    continue
+                stats.files += 1
+                # 这些文件大多要读取内容，直接取一次 stat 供判断和统计共用
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                stats.stat_calls += 1
+                matched = query.match_meta(name, lambda: st)
+                if matched:
+                    sink.put(Hit(path, st.st_size, st.st_mtime, query.meta_reason))
+                elif matched is None:
+                    encoding = plan.content_encoding(path, st)
+                    if encoding is not None:
+                        content_paths.append((path, encoding))
+
+            # 文档不在内容索引中，文件名不含该文字的文档都要检查
+            for name, path, size, mtime in query_all('', False, plan.document_extensions()):
+                if path in seen:
+                    continue
+                matched = query.match_meta(name, lambda: FileMeta(size, mtime))
+                if matched:
+                    sink.put(Hit(path, size, mtime, query.meta_reason))
+                elif matched is None:
+                    documents.append(path)
+        plan.classifier.flush()
+        stats.walk_time = time.perf_counter() - start
+
+        self.match_contents(plan, sink, token, executor, stats, content_paths, documents)
+        return sum(index.file_count() for index, _ in indexes)
+
+    def shutdown(self, wait=False):
+        """关闭内容匹配和文档提取的进程池；wait 为True时等待工作进程退出"""
+        if self.content_executor is not None:
+            self.content_executor.shutdown(wait)
+            self.content_executor = None
+        self.extractor.shutdown(wait)
+
+
+def search(roots, query, options=None, engine=None, cancel=None, stats=None, stats_log=None):
+    """在 roots 下搜索，逐个产出 Hit（未排序，score 为0）
+
+    query 为查询语句或已编译的 CompiledQuery；语句有误时抛出 QueryError，
+    搜索出错时抛出 SearchError。未传入 engine 时使用临时引擎并在结束时关闭。
+    生成器被提前关闭时后台搜索随之取消。传入 stats（SearchStats）可在
+    结束后读取统计，stats_log 见 SearchEngine.run()。
+    """
+    options = options or SearchOptions()
+    if not isinstance(query, CompiledQuery):
+        query = CompiledQuery(query, case_sensitive=options.case_sensitive,
+                              search_filename=options.search_filename,
+                              search_content=options.search_content)
+    scope = SearchScope(roots, options.exclude_text, options.skip_network)
+    own_engine = engine is None
+    if own_engine:
+        engine = SearchEngine()
+    plan = engine.plan(scope, query, options.extensions, options.workers)
+    token = cancel or CancelToken()
+    results = queue.Queue(maxsize=4096)
+    thread = threading.Thread(target=engine.run, args=(plan, results, token),
+                              kwargs={'use_index': options.use_index, 'content_mode': options.content_mode,
+                                      'stats': stats, 'stats_log': stats_log,
+                                      'max_index_age': options.max_index_age},
+                              daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if isinstance(item, Hit):
+                yield item
+                continue
+            kind, value = item
+            if kind == 'error':
+                raise SearchError(value)
+            return
+    finally:
+        token.cancel()
+        # 取出残留结果，让阻塞在 put 上的搜索线程能够退出
+        while thread.is_alive():
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if own_engine:
+            # 临时引擎通常在程序退出前关闭，等待工作进程退出，
+            # 否则解释器退出时进程池的管理线程可能访问已关闭的管道
+            engine.shutdown(wait=True)
+
+
+def hit_record(hit):
+    return {'path': hit.path, 'size': hit.size, 'mtime': hit.mtime,
+            'reason': hit.reason, 'score': round(hit.score, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在一个或多个目录中搜索文件，以 JSON 输出结果")
+    parser.add_argument('roots', nargs='+', help="搜索的根目录")
+    parser.add_argument('-q', '--query', required=True, help="查询语句，语法与检索窗口相同")
+    parser.add_argument('--content', action='store_true', help="同时搜索文件内容")
+    parser.add_argument('--no-filename', action='store_true', help="不搜索文件名")
+    parser.add_argument('--case-sensitive', action='store_true')
+    parser.add_argument('--ext', action='append', default=[], help="只搜索该扩展名（可重复），如 --ext .py")
+    parser.add_argument('--no-index', action='store_true', help="不使用索引，直接遍历目录")
+    parser.add_argument('--max-index-age', type=float, default=0.0, metavar='SECONDS',
+                        help="索引早于此秒数时先按目录修改时间增量刷新（默认0，每次搜索前都刷新）")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--content-mode', choices=CONTENT_MODES, default='process')
+    parser.add_argument('--exclude', action='append', default=[], help="追加一条 gitignore 风格的排除规则")
+    parser.add_argument('--no-default-excludes', action='store_true')
+    parser.add_argument('--include-network', action='store_true', help="不跳过网络文件系统挂载点")
+    parser.add_argument('--limit', type=int, default=0, help="只输出相关度最高的 N 条（按相关度排序）")
+    parser.add_argument('--format', choices=('jsonl', 'json'), default='jsonl')
+    parser.add_argument('--stats', action='store_true', help="结束后把统计数据以 JSON 输出到标准错误")
+    parser.add_argument('--stats-log', metavar='PATH', help="把统计数据追加到 JSONL 日志文件")
+    args = parser.parse_args(argv)
+
+    extensions = None
+    if args.ext:
+        extensions = frozenset(('.' + ext.lstrip('.')).lower() for ext in args.ext)
+    exclude_text = '' if args.no_default_excludes else DEFAULT_EXCLUDES
+    exclude_text += ''.join(rule + '\n' for rule in args.exclude)
+    options = SearchOptions(search_filename=not args.no_filename, search_content=args.content,
+                            case_sensitive=args.case_sensitive, extensions=extensions,
+                            use_index=not args.no_index, workers=max(1, args.workers),
+                            content_mode=args.content_mode, exclude_text=exclude_text,
+                            skip_network=not args.include_network,
+                            max_index_age=max(0.0, args.max_index_age))
+    try:
+        query = CompiledQuery(args.query, case_sensitive=options.case_sensitive,
+                              search_filename=options.search_filename,
+                              search_content=options.search_content)
+    except QueryError as e:
+        print(f"查询语句有误: {e}", file=sys.stderr)
+        return 2
+
+    roots = [os.path.abspath(os.path.expanduser(root)) for root in args.roots]
+    scorer = Scorer(query, roots)
+    stats = SearchStats()
+    start = time.perf_counter()
+    count = 0
+    hits = []
+    try:
+        if args.limit > 0:
+            # 与检索窗口相同：搜索时只保留可能进入前 limit 名的结果
+            sink = queue.SimpleQueue()
+            ranked = RankedResults(sink, scorer, args.limit)
+            for hit in search(roots, query, options, stats=stats, stats_log=args.stats_log):
+                ranked.put(hit)
+            count = ranked.total
+            while not sink.empty():
+                hits.append(sink.get())
+            hits = sorted(hits, key=lambda hit: -hit.score)[:args.limit]
+        else:
+            for hit in search(roots, query, options, stats=stats, stats_log=args.stats_log):
+                hit = hit._replace(score=scorer(hit))
+                count += 1
+                if args.format == 'jsonl':
+                    print(json.dumps(hit_record(hit), ensure_ascii=False))
+                else:
+                    hits.append(hit)
+    except SearchError as e:
+        print(f"搜索出错: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    if args.format == 'json':
+        json.dump([hit_record(hit) for hit in hits], sys.stdout, ensure_ascii=False, indent=1)
+        print()
+    elif args.limit > 0:
+        for hit in hits:
+            print(json.dumps(hit_record(hit), ensure_ascii=False))
+    elapsed = time.perf_counter() - start
+    print(f"{count} 个匹配，用时 {elapsed:.2f}s", file=sys.stderr)
+    if args.stats:
+        print(json.dumps(stats.as_dict(), ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
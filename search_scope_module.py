@@ -0,0 +1,277 @@
+"""
+搜索范围模块
+负责多个搜索根目录的整理和遍历时的剪枝：gitignore 风格的排除规则在目录一级
+生效，被排除的子树不会被列举；网络文件系统的挂载点默认跳过；按 (设备号, inode)
+记录已进入过的目录，绑定挂载和互相包含的根目录都只扫描一次
+"""
+import os
+import re
+import hashlib
+import threading
+
+DEFAULT_EXCLUDES = """\
+# 每行一条规则，语法同 .gitignore：以 / 结尾只匹配目录，含 / 时相对根目录，
+# 支持 * ? ** [abc]，以 ! 开头表示重新包含
+.git/
+.svn/
+.hg/
+node_modules/
+__pycache__/
+.venv/
+.tox/
+.mypy_cache/
+.pytest_cache/
+"""
+
+# /proc/self/mounts 中视为网络文件系统的类型
+NETWORK_FS_TYPES = frozenset({
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'davfs',
+    'fuse.sshfs', 'sshfs', 'fuse.rclone', 'fuse.s3fs', 'glusterfs', 'ceph', 'lustre'
+})
+
+# Windows 的路径不区分大小写，规则也按不区分大小写匹配
+RULE_FLAGS = re.IGNORECASE if os.name == 'nt' else 0
+
+
+def translate(pattern):
+    """把一条 gitignore 风格的模式转换为正则，匹配以 / 分隔的相对路径"""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**/', i):
+                parts.append('(?:.*/)?')  # 零或多层目录
+                i += 3
+                continue
+            if pattern.startswith('**', i):
+                parts.append('.*')
+                i += 2
+                continue
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                parts.append(re.escape(c))
+            else:
+                chars = pattern[i + 1:end].replace('\\', '\\\\')
+                if chars.startswith('!'):
+                    chars = '^' + chars[1:]
+                parts.append(f'[{chars}]')
+                i = end + 1
+                continue
+        elif c == '\\' and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    body = ''.join(parts)
+    return body if anchored else '(?:.*/)?' + body
+
+
+class ExcludeRules:
+    """一组 gitignore 风格的排除规则，后出现的规则优先
+
+    没有 ! 规则时所有规则合并为一个正则，每个目录只需匹配一次。
+    """
+
+    def __init__(self, text=DEFAULT_EXCLUDES):
+        self.rules = []  # (是否重新包含, 是否只匹配目录, 正则)
+        lines = []
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith('#'):
+                continue
+            lines.append(line)
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if line:
+                self.rules.append((negate, dir_only, re.compile(translate(line), RULE_FLAGS)))
+        self.fingerprint = hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()[:16]
+
+        self.combined = not any(negate for negate, _, _ in self.rules)
+        if self.combined:
+            self.dir_regex = self._join(self.rules)
+            self.file_regex = self._join([rule for rule in self.rules if not rule[1]])
+
+    @staticmethod
+    def _join(rules):
+        if not rules:
+            return None
+        return re.compile('|'.join(f'(?:{regex.pattern})' for _, _, regex in rules), RULE_FLAGS)
+
+    @property
+    def has_file_rules(self):
+        """是否有规则可能排除单个文件（否则只需检查目录）"""
+        return any(not dir_only for _, dir_only, _ in self.rules)
+
+    def excluded(self, rel, is_dir):
+        """rel 为相对根目录、以 / 分隔的路径"""
+        if self.combined:
+            regex = self.dir_regex if is_dir else self.file_regex
+            return regex is not None and regex.fullmatch(rel) is not None
+        result = False
+        for negate, dir_only, regex in self.rules:
+            if (is_dir or not dir_only) and regex.fullmatch(rel):
+                result = not negate
+        return result
+
+
+def network_mounts():
+    """网络文件系统的挂载点路径集合，无法读取挂载表的平台返回空集合"""
+    mounts = set()
+    try:
+        with open('/proc/self/mounts', 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3 and fields[2] in NETWORK_FS_TYPES:
+                    # 挂载表中的空格等字符以八进制转义
+                    mounts.add(re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1]))
+    except OSError:
+        pass
+    return frozenset(mounts)
+
+
+def normalize_roots(roots):
+    """去掉重复和被其他根目录包含的根目录，保持原有顺序
+
+    比较时使用解析符号链接后的真实路径，符号链接形式的根目录不会重复扫描。
+    """
+    candidates = []
+    for root in roots:
+        if not root:
+            continue
+        root = os.path.abspath(root)
+        real = os.path.normcase(os.path.realpath(root))
+        candidates.append((root, real))
+
+    kept = []
+    for root, real in candidates:
+        covered = False
+        for _, other in kept:
+            if real == other or real.startswith(other.rstrip(os.sep) + os.sep):
+                covered = True
+                break
+        if covered:
+            continue
+        # 后出现的根目录包含先前的根目录时取代它们
+        kept = [(r, other) for r, other in kept
+                if not other.startswith(real.rstrip(os.sep) + os.sep)]
+        kept.append((root, real))
+    return tuple(root for root, _ in kept)
+
+
+class VisitedDirs:
+    """一次遍历中已经进入过的目录，可在多个线程和多个根目录之间共用"""
+
+    def __init__(self):
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def enter(self, st):
+        """首次遇到该目录时返回True；平台不提供 inode 时总是返回True"""
+        if not st.st_ino:
+            return True
+        key = (st.st_dev, st.st_ino)
+        with self.lock:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+            return True
+
+
+class ScanFilter:
+    """某个根目录下遍历时的剪枝条件，由 SearchScope.filter() 创建"""
+
+    def __init__(self, root, rules, skip_mounts, visited, fingerprint=''):
+        self.root = root
+        self.rules = rules
+        self.skip_mounts = skip_mounts
+        self.visited = visited
+        self.prefix_len = len(root.rstrip(os.sep)) + 1
+        self.check_files = rules.has_file_rules
+        self.fingerprint = fingerprint  # 规则变化后索引需要重新检查全部目录
+
+    def _rel(self, path):
+        rel = path[self.prefix_len:]
+        return rel.replace(os.sep, '/') if os.sep != '/' else rel
+
+    def enter(self, dir_path, st=None):
+        """即将列举 dir_path：同一目录（绑定挂载、硬链接目录）只进入一次"""
+        if self.visited is None:
+            return True
+        if st is None:
+            try:
+                st = os.stat(dir_path)
+            except OSError:
+                return False
+        return self.visited.enter(st)
+
+    def keep_dir(self, path):
+        """子目录是否需要向下遍历"""
+        return path not in self.skip_mounts and not self.rules.excluded(self._rel(path), True)
+
+    def keep_file(self, path):
+        return not self.check_files or not self.rules.excluded(self._rel(path), False)
+
+    def includes(self, path, is_dir):
+        """根目录下的任意路径是否在搜索范围内（用于文件监视事件）"""
+        if path == self.root:
+            return True
+        if not path.startswith(self.root.rstrip(os.sep) + os.sep):
+            return False
+        parts = self._rel(path).split('/')
+        current = self.root
+        for depth, part in enumerate(parts[:-1], 1):
+            current = os.path.join(current, part)
+            if current in self.skip_mounts or self.rules.excluded('/'.join(parts[:depth]), True):
+                return False
+        if is_dir:
+            return self.keep_dir(path)
+        return self.keep_file(path)
+
+
+class SearchScope:
+    """一次搜索的范围：若干根目录加上排除规则，创建后不再修改"""
+
+    def __init__(self, roots, exclude_text=DEFAULT_EXCLUDES, skip_network=True):
+        self.roots = normalize_roots(roots)
+        self.exclude_text = exclude_text
+        self.skip_network = skip_network
+        self.rules = ExcludeRules(exclude_text)
+        self.skip_mounts = network_mounts() if skip_network else frozenset()
+        self.fingerprint = f"{self.rules.fingerprint}:{int(skip_network)}"
+        self.key = (self.roots, self.fingerprint)
+
+    def __bool__(self):
+        return bool(self.roots)
+
+    def __eq__(self, other):
+        return isinstance(other, SearchScope) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def filter(self, root, visited=None):
+        """root 下遍历使用的剪枝条件；visited 为None时使用独立的去重记录"""
+        # 根目录本身即使是网络挂载点也要扫描
+        skip_mounts = self.skip_mounts - {root}
+        return ScanFilter(root, self.rules, skip_mounts, visited or VisitedDirs(), self.fingerprint)
+
+    def filters(self):
+        """一次完整遍历使用的 [(根目录, ScanFilter)]，各根目录共用去重记录"""
+        visited = VisitedDirs()
+        return [(root, self.filter(root, visited)) for root in self.roots]
+
+    def label(self):
+        return '; '.join(self.roots) if self.roots else "未选择目录"
@@ -0,0 +1,138 @@
+"""
+搜索统计模块
+负责记录单次搜索的性能数据：遍历目录数和文件数、stat 次数、内容检查的文件和字节数、
+遍历与内容匹配各自的耗时、文本识别和文档提取缓存的命中率、首个结果的时间等，
+可以格式化显示，也可以按行追加到 JSONL 日志中，便于找出慢的根目录和过滤条件
+"""
+import os
+import json
+import time
+import threading
+from file_index_module import get_cache_dir
+from result_view_module import Hit
+
+DEFAULT_LOG_NAME = "search_stats.jsonl"
+
+
+def default_log_path():
+    return os.path.join(get_cache_dir(), DEFAULT_LOG_NAME)
+
+
+def rate(count, seconds):
+    return count / seconds if seconds > 0 else 0.0
+
+
+def ratio(part, total):
+    return part / total if total else None
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class SearchStats:
+    """一次搜索的统计数据
+
+    计数器由搜索线程和遍历线程更新，count() 加锁保证多线程下不丢失；
+    阶段耗时通过 timed() 包装的迭代器累计。
+    """
+
+    COUNTERS = ('dirs', 'files', 'stat_calls', 'content_files', 'content_bytes',
+                'matches', 'sniff_hits', 'sniff_misses', 'extract_hits', 'extract_misses')
+
+    def __init__(self, **info):
+        self.info = info  # 根目录、查询语句、模式等描述信息
+        self.lock = threading.Lock()
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.first_result = None  # 首个结果距开始的秒数
+        self.elapsed = None
+        self.walk_time = 0.0  # 遍历目录或查询索引的时间
+        self.content_time = 0.0  # 等待内容匹配的时间
+        self.outcome = None
+
+    def count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def result(self):
+        """记录一条结果"""
+        if self.first_result is None:
+            self.first_result = time.perf_counter() - self.started
+        self.matches += 1
+
+    def timed(self, iterable, phase):
+        """包装迭代器，把每次取下一项所花的时间累计到 phase（'walk_time' 或 'content_time'）"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                setattr(self, phase, getattr(self, phase) + time.perf_counter() - start)
+                return
+            setattr(self, phase, getattr(self, phase) + time.perf_counter() - start)
+            yield item
+
+    def finish(self, outcome):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+            self.outcome = outcome
+
+    def as_dict(self):
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        record = {'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+                  'outcome': self.outcome, 'elapsed': round(elapsed, 4)}
+        record.update(self.info)
+        for name in self.COUNTERS:
+            record[name] = getattr(self, name)
+        record.update({
+            'first_result': None if self.first_result is None else round(self.first_result, 4),
+            'walk_time': round(self.walk_time, 4),
+            'content_time': round(self.content_time, 4),
+            'dirs_per_sec': round(rate(self.dirs, self.walk_time or elapsed), 1),
+            'files_per_sec': round(rate(self.files, self.walk_time or elapsed), 1),
+            'sniff_hit_rate': ratio(self.sniff_hits, self.sniff_hits + self.sniff_misses),
+            'extract_hit_rate': ratio(self.extract_hits, self.extract_hits + self.extract_misses),
+        })
+        return record
+
+    def summary_lines(self):
+        """统计面板中显示的文字"""
+        d = self.as_dict()
+
+        def percent(value):
+            return "-" if value is None else f"{value * 100:.0f}%"
+
+        first = "-" if d['first_result'] is None else f"{d['first_result'] * 1000:.0f} ms"
+        return [
+            f"模式 {d.get('mode', '-')}  总耗时 {d['elapsed']:.2f}s  首个结果 {first}  匹配 {d['matches']}",
+            f"目录 {d['dirs']} ({d['dirs_per_sec']:.0f}/s)  文件 {d['files']} ({d['files_per_sec']:.0f}/s)  "
+            f"stat {d['stat_calls']}",
+            f"遍历/索引 {d['walk_time']:.2f}s  内容匹配 {d['content_time']:.2f}s  "
+            f"内容检查 {d['content_files']} 个文件 / {format_bytes(d['content_bytes'])}",
+            f"编码识别缓存命中 {percent(d['sniff_hit_rate'])}  文档文本缓存命中 {percent(d['extract_hit_rate'])}",
+        ]
+
+    def append_to_log(self, path=None):
+        """把统计数据作为一行 JSON 追加到日志文件"""
+        with open(path or default_log_path(), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.as_dict(), ensure_ascii=False) + '\n')
+
+
+class MeteredSink:
+    """包装结果出口：记录首个结果时间和结果数，其余原样转交"""
+
+    def __init__(self, sink, stats):
+        self.sink = sink
+        self.stats = stats
+
+    def put(self, item):
+        if isinstance(item, Hit):
+            self.stats.result()
+        self.sink.put(item)